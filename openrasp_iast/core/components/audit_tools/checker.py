@@ -18,6 +18,7 @@ limitations under the License.
 """
 
 import os
+import bisect
 
 from core.components import exceptions
 from core.components.logger import Logger
@@ -41,9 +42,7 @@ class Checker(object):
         Returns:
             boolean
         """
-        hook_info = rasp_result_ins.get_hook_info()
-        hook_list = [
-            hook_item for hook_item in hook_info if hook_item["hook_type"] == hook_type]
+        hook_list = rasp_result_ins.get_hook_list(hook_type)
 
         token_check_item = {
             "sql": "query",
@@ -62,8 +61,9 @@ class Checker(object):
             "eval": "code",
         }
         if hook_type in token_check_item:
-            for hook_item in hook_list:
-                if self._is_token_injected(hook_item[token_check_item[hook_type]], feature, hook_item["tokens"]):
+            stops_list = rasp_result_ins.get_cached("token_stops_" + hook_type, self._get_token_stops_factory(hook_type))
+            for hook_item, stops in zip(hook_list, stops_list):
+                if self._is_token_injected(hook_item[token_check_item[hook_type]], feature, hook_item["tokens"], stops):
                     rasp_result_ins.set_vuln_hook(hook_item)
                     return True
                 if "env" in hook_item:
@@ -91,42 +91,50 @@ class Checker(object):
                     return True
         return False
 
-    def _is_token_injected(self, code, feature, tokens):
+    @staticmethod
+    def _get_token_stops_factory(hook_type):
         """
-        基于词法分析的token检测代码是否被注入
+        生成RaspResult.get_cached使用的factory, 计算指定类型每个hook点的token结束位置数组
+
+        Parameters:
+            hook_type - str, hook点类型
+
+        Returns:
+            callable, 返回list, 每个item为对应hook点tokens的stop组成的list
+        """
+        def factory(rasp_result_ins):
+            return [[token["stop"] for token in hook_item["tokens"]]
+                    for hook_item in rasp_result_ins.get_hook_list(hook_type)]
+        return factory
+
+    def _is_token_injected(self, code, feature, tokens, stops=None):
+        """
+        基于词法分析的token检测代码是否被注入, feature在code中任意一次出现跨越多个token即判定为注入
 
         Parameters:
             code - str, 待检测的原始代码
             feature - str, 预期被注入的内容
             tokens - list, hook信息中解析产生的tokens
+            stops - list, tokens中每个token的stop组成的递增数组, 为None时由tokens计算
 
         Returns:
             boolean
         """
-        feature_index = code.find(feature)
-        if feature_index == -1:
+        if len(feature) == 0:
             return False
+        if stops is None:
+            stops = [token["stop"] for token in tokens]
 
-        distance = 1
         feature_len = len(feature)
-        end = len(tokens)
-        start = 0
-
-        for i in range(end):
-            if tokens[i]["stop"] > feature_index:
-                start = i
-                break
-
-        if start + distance > end:
-            return False
-
-        for i in range(start, start + distance):
-            if tokens[i]["stop"] > feature_index + feature_len:
-                end = i
-        if end - start > distance:
-            return True
-        else:
-            return False
+        feature_index = code.find(feature)
+        while feature_index != -1:
+            # 包含feature起始位置的token
+            start = bisect.bisect_right(stops, feature_index)
+            # feature未完全包含在该token内, 且其后仍有token
+            if start < len(stops) and stops[start] <= feature_index + feature_len and len(stops) - start > 1:
+                return True
+            feature_index = code.find(feature, feature_index + 1)
+        return False
 
     def check_write_webroot(self, rasp_result_ins, feature):
         """
@@ -140,9 +148,7 @@ class Checker(object):
             boolean
         """
         web_root = rasp_result_ins.get_app_base_path()
-        hook_info = rasp_result_ins.get_hook_info()
-        hook_list = [
-            hook_item for hook_item in hook_info if hook_item["hook_type"] == "writeFile"]
+        hook_list = rasp_result_ins.get_hook_list("writeFile")
         for hook_item in hook_list:
             if (hook_item["realpath"].find(feature) != -1 and hook_item["realpath"].startswith(web_root)):
                 rasp_result_ins.set_vuln_hook(hook_item)
@@ -160,9 +166,7 @@ class Checker(object):
             boolean
         """
         web_root = rasp_result_ins.get_app_base_path()
-        hook_info = rasp_result_ins.get_hook_info()
-        hook_list = [
-            hook_item for hook_item in hook_info if hook_item["hook_type"] == "fileUpload"]
+        hook_list = rasp_result_ins.get_hook_list("fileUpload")
         for hook_item in hook_list:
             if (hook_item["dest_realpath"].endswith(feature) != -1 and hook_item["dest_realpath"].startswith(web_root)):
                 rasp_result_ins.set_vuln_hook(hook_item)
@@ -179,9 +183,8 @@ class Checker(object):
         Returns:
             boolean
         """
-        if rasp_result_ins.has_hook_type("xxe"):
-            for hook_item in rasp_result_ins.get_hook_info():
-                if hook_item["hook_type"] == "xxe" and hook_item["entity"] == feature:
-                    rasp_result_ins.set_vuln_hook(hook_item)
-                    return True
+        for hook_item in rasp_result_ins.get_hook_list("xxe"):
+            if hook_item["entity"] == feature:
+                rasp_result_ins.set_vuln_hook(hook_item)
+                return True
         return False
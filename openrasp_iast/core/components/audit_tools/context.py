@@ -16,14 +16,90 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import time
 import asyncio
+import collections
 
+from core.components.config import Config
 from core.components.communicator import Communicator
 
 
+class TokenBucket(object):
+    """
+    异步令牌桶, 按rate(个/s)生成令牌, 最多积累burst个
+
+    使用GCRA算法, 每次获取时直接预约下一个可用令牌的时间, 等待者按获取顺序依次放行, 不需要唤醒
+    """
+
+    def __init__(self, rate=0, burst=1):
+        """
+        初始化
+
+        Parameters:
+            rate - float, 每秒生成的令牌数, 小于等于0时不限制
+            burst - int, 令牌桶容量
+        """
+        # 理论上下一个令牌的到达时间
+        self._tat = 0
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst):
+        """
+        修改令牌生成速率和令牌桶容量
+
+        Parameters:
+            rate - float, 每秒生成的令牌数, 小于等于0时不限制
+            burst - int, 令牌桶容量
+        """
+        self.rate = rate
+        self.burst = max(int(burst), 1)
+
+    def reserve(self):
+        """
+        预约一个令牌
+
+        Returns:
+            float, 需要等待的时间(s)
+        """
+        if self.rate <= 0:
+            return 0
+        now = asyncio.get_event_loop().time()
+        interval = 1 / self.rate
+        tat = max(self._tat, now)
+        self._tat = tat + interval
+        return max(tat - (self.burst - 1) * interval - now, 0)
+
+    async def acquire(self):
+        """
+        获取一个令牌, 没有可用令牌时等待
+        """
+        wait_time = self.reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+
+class RequestSlot(object):
+    """
+    单个扫描插件发送请求时使用的上下文, 同时受插件和扫描目标的速率限制
+    """
+
+    def __init__(self, context, plugin_name):
+        self._context = context
+        self._plugin_name = plugin_name
+
+    async def __aenter__(self):
+        await self._context.acquire(self._plugin_name)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._context.release(exc_type)
+
+
 class Context(object):
     """
     HTTP请求上下文，用于统计和控制请求发送
+
+    请求需先从插件和扫描目标的令牌桶获取令牌, 再等待并发数低于max_concurrent_request;
+    扫描目标的速率由max_concurrent_request和request_interval换算, 每个并发每request_interval毫秒发送一个请求
     """
     def __new__(cls):
         """
@@ -32,13 +108,31 @@ class Context(object):
         if not hasattr(cls, "instance"):
             cls.instance = super(Context, cls).__new__(cls)
             cls.instance.current_requests_num = 0
+            # 最近请求的响应时间(us), 用于Monitor依据延迟调整扫描速率
+            cls.instance.latency_samples = collections.deque(maxlen=256)
+            cls.instance.latency_publish_time = 0
+            cls.instance.target_bucket = TokenBucket()
+            cls.instance.plugin_buckets = {}
+            cls.instance.plugin_rate = Config().get_config("scanner.plugin_max_request_rate")
         return cls.instance
 
     async def async_init(self):
         """
         事件循环内的初始化，仅需要调用一次
         """
-        self.request_end_event = asyncio.Event()
+        self.request_end_cond = asyncio.Condition()
+
+    def slot(self, plugin_name=None):
+        """
+        获取指定插件发送请求使用的上下文
+
+        Parameters:
+            plugin_name - str, 插件名, 为None时仅受扫描目标的速率限制
+
+        Returns:
+            RequestSlot实例, 使用async with进入
+        """
+        return RequestSlot(self, plugin_name)
 
     def _is_req_reach_limit(self):
         """
@@ -53,21 +147,92 @@ class Context(object):
         else:
             return False
 
-    async def __aenter__(self):
-        while self._is_req_reach_limit():
-            Communicator().increase_value("waiting_rasp_request")
-            self.request_end_event.clear()
-            await self.request_end_event.wait()
-            self.request_end_event.clear()
-            Communicator().decrease_value("waiting_rasp_request")
-        self.current_requests_num += 1
+    def _get_plugin_bucket(self, plugin_name):
+        """
+        获取插件的令牌桶, 未配置插件速率时返回None
+        """
+        if plugin_name is None or self.plugin_rate <= 0:
+            return None
+        if plugin_name not in self.plugin_buckets:
+            self.plugin_buckets[plugin_name] = TokenBucket(self.plugin_rate, self.plugin_rate)
+        return self.plugin_buckets[plugin_name]
+
+    def _refresh_target_rate(self):
+        """
+        依据Monitor调整后的并发数和请求间隔更新扫描目标的令牌桶
+        """
+        max_req = Communicator().get_value("max_concurrent_request")
+        request_interval = Communicator().get_value("request_interval")
+        if request_interval > 0:
+            rate = max_req * 1000 / request_interval
+        else:
+            rate = 0
+        if rate != self.target_bucket.rate:
+            self.target_bucket.set_rate(rate, max_req)
+
+    def record_latency(self, latency):
+        """
+        记录一次请求的响应时间, 每秒将最近请求响应时间的分位数写入共享内存
+
+        Parameters:
+            latency - float, 响应时间(s)
+        """
+        self.latency_samples.append(int(latency * 1000000))
+        now = time.time()
+        if now - self.latency_publish_time < 1:
+            return
+        self.latency_publish_time = now
+        samples = sorted(self.latency_samples)
+        Communicator().set_value("latency_p50", samples[len(samples) // 2])
+        Communicator().set_value("latency_p95", samples[len(samples) * 95 // 100])
+
+    async def acquire(self, plugin_name=None):
+        """
+        等待获取令牌和并发数, 之后可以发送一个请求
+
+        Parameters:
+            plugin_name - str, 发送请求的插件名, 为None时仅受扫描目标的速率限制
+        """
+        plugin_bucket = self._get_plugin_bucket(plugin_name)
+        if plugin_bucket is not None:
+            await plugin_bucket.acquire()
+        self._refresh_target_rate()
+        await self.target_bucket.acquire()
+
+        async with self.request_end_cond:
+            if self._is_req_reach_limit():
+                Communicator().increase_value("waiting_rasp_request")
+                try:
+                    while self._is_req_reach_limit():
+                        await self.request_end_cond.wait()
+                except asyncio.CancelledError as e:
+                    # 被取消的等待者可能已收到唤醒, 转交给下一个等待者
+                    if not self._is_req_reach_limit():
+                        self.request_end_cond.notify(1)
+                    raise e
+                finally:
+                    Communicator().decrease_value("waiting_rasp_request")
+            self.current_requests_num += 1
+            # 并发上限被调高时, 依次唤醒其他等待者
+            if not self._is_req_reach_limit():
+                self.request_end_cond.notify(1)
         Communicator().increase_value("send_request")
 
-    async def __aexit__(self, exc_type, exc, tb):
+    async def release(self, exc_type=None):
+        """
+        请求结束, 释放并发数并唤醒一个等待者
+
+        Parameters:
+            exc_type - 请求过程中引发的异常类型, 无异常为None
+        """
         if exc_type is not None:
             Communicator().increase_value("failed_request")
-        request_interval = Communicator().get_value("request_interval")
-        if request_interval > 0:
-            await asyncio.sleep(request_interval / 1000)
-        self.request_end_event.set()
-        self.current_requests_num -= 1
+        async with self.request_end_cond:
+            self.current_requests_num -= 1
+            self.request_end_cond.notify(1)
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release(exc_type)
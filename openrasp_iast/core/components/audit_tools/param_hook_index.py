@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import urllib.parse
+
+from core.components import str_match
+from core.components.logger import Logger
+
+
+class ParamHookIndex(object):
+    """
+    参数值与hook点的关联索引, 每个扫描任务(RaspResult)只构建一次, 由所有扫描插件共享
+
+    构建时基于RaspResult的hook类型索引, 按hook类型预处理hook点中用于比较的字段(token、url分段、env等),
+    token的4字符子串集合在首次比较时计算并缓存; 参数值与hook类型的判断结果同样缓存,
+    多个插件或多次查询同一参数时不再重复遍历hook_info
+    """
+
+    # hook类型中用于判断参数拼接的字段
+    hook_item_map = {
+        "webdav": ["source", "dest"],
+        "fileUpload": ["filename"],
+        "rename": ["source", "dest"],
+        "xxe": ["entity"],
+        "ognl": ["expression"],
+        "deserialization": ["clazz"],
+        "eval": ["code"]
+    }
+
+    def __init__(self, rasp_result_ins):
+        """
+        初始化
+
+        Parameters:
+            rasp_result_ins - RaspResult实例
+        """
+        # hook_type为key, value为预处理后的hook点列表
+        self._hooks = {}
+        # (hook_type, 参数值)为key, value为判断结果
+        self._result_cache = {}
+        for hook_type in rasp_result_ins.get_hook_types():
+            if hook_type not in ("command", "sql", "ssrf", "include", "directory", "readFile", "writeFile") and \
+                    hook_type not in self.hook_item_map:
+                continue
+            self._hooks[hook_type] = [
+                self._prepare(hook_type, hook_item) for hook_item in rasp_result_ins.get_hook_list(hook_type)]
+
+    def _prepare(self, hook_type, hook_item):
+        if hook_type in ("command", "sql"):
+            prepared = {
+                "tokens": self.prepare_tokens(hook_item["tokens"]),
+                "env_parts": []
+            }
+            for env_item in hook_item.get("env", []):
+                prepared["env_parts"].extend(str(part) for part in env_item.split("="))
+        elif hook_type in ("ssrf", "include"):
+            prepared = self.prepare_url(hook_item["url"])
+        elif hook_type in ("directory", "readFile", "writeFile"):
+            prepared = self.prepare_url(hook_item["path"])
+        else:
+            prepared = [hook_item[key] for key in self.hook_item_map[hook_type]]
+        return prepared
+
+    def is_concat(self, hook_type, param_value):
+        """
+        判断参数值与指定类型的hook点参数是否存在相似部分
+
+        Parameters:
+            hook_type - str, 检查的hook点类型
+            param_value - str, 参数值
+
+        Returns:
+            Boolean
+        """
+        key = (hook_type, param_value)
+        try:
+            return self._result_cache[key]
+        except KeyError:
+            result = self._check(hook_type, param_value)
+            self._result_cache[key] = result
+            return result
+
+    def get_concat_hook_types(self, param_value):
+        """
+        获取参数值流入的所有hook类型
+
+        Parameters:
+            param_value - str, 参数值
+
+        Returns:
+            set, item为hook类型
+        """
+        return {hook_type for hook_type in self._hooks if self.is_concat(hook_type, param_value)}
+
+    def _check(self, hook_type, param_value):
+        if len(param_value) == 0:
+            return False
+
+        for prepared in self._hooks.get(hook_type, ()):
+            if hook_type in ("command", "sql"):
+                if self.is_token_concat(param_value, prepared["tokens"]):
+                    return True
+                for part in prepared["env_parts"]:
+                    if str(param_value).find(part) >= 0:
+                        return True
+            elif hook_type in ("ssrf", "include", "directory", "readFile", "writeFile"):
+                if self.is_url_concat(param_value, prepared):
+                    return True
+            else:
+                for value in prepared:
+                    if value.find(str(param_value)) >= 0:
+                        return True
+        return False
+
+    @staticmethod
+    def prepare_tokens(tokens):
+        """
+        预处理sql/command hook点的token列表
+
+        Parameters:
+            tokens - token列表，由iast.js的tokenize获取
+
+        Returns:
+            list, item为[token文本, 4字符子串集合(首次使用时计算)]
+        """
+        return [[token["text"], None] for token in tokens]
+
+    @staticmethod
+    def prepare_url(url):
+        """
+        预处理ssrf/include/directory等hook点的url或路径
+
+        Parameters:
+            url - str, url或文件路径
+
+        Returns:
+            dict, url各部分及其按"/"分割后的列表, url不合法时为None
+        """
+        try:
+            parse_result = urllib.parse.urlparse(url)
+            url_items = {
+                "scheme": parse_result.scheme,
+                "netloc": parse_result.netloc,
+                "path": parse_result.path,
+                "query": parse_result.query
+            }
+        except Exception as e:
+            Logger().warning("Invalid url found in url concat, url: {}".format(url))
+            return None
+
+        path_parts = {}
+        for key, value in url_items.items():
+            path_parts[key] = value.replace("\\", "/").split("/")
+        return {
+            "url_items": url_items,
+            "path_parts": path_parts
+        }
+
+    @staticmethod
+    def is_token_concat(param_value, token_entries):
+        """
+        判断token是否被参数影响
+
+        Parameters:
+            param_value - str, 参数值
+            token_entries - list, prepare_tokens的返回值
+
+        Returns:
+            Boolean
+        """
+        param_value = param_value.strip()
+        for text, _ in token_entries:
+            if len(text) >= len(param_value) and text.find(param_value) != -1:
+                return True
+
+        if len(param_value) > 3:
+            split_value = str_match.split_word(param_value)
+            # 存在长度大于3的公共子串等价于存在相同的4字符子串
+            split_ngrams = [str_match.get_ngrams(item, 4) for item in split_value]
+            for entry in token_entries:
+                text = entry[0]
+                for item, item_ngrams in zip(split_value, split_ngrams):
+                    if len(text) * len(item) < 10000:
+                        if len(text) <= 3:
+                            if param_value.find(text) != -1:
+                                return True
+                        else:
+                            if entry[1] is None:
+                                entry[1] = str_match.get_ngrams(text, 4)
+                            if not entry[1].isdisjoint(item_ngrams):
+                                return True
+                    elif len(text) >= len(item) and text.find(item) != -1:
+                        return True
+        return False
+
+    @staticmethod
+    def is_url_concat(param_value, prepared_url):
+        """
+        判断url是否被参数影响
+
+        Parameters:
+            param_value - str, 参数值
+            prepared_url - dict, prepare_url的返回值
+
+        Returns:
+            Boolean
+        """
+        if prepared_url is None:
+            return False
+
+        for key, value in prepared_url["url_items"].items():
+            if len(value) == 0:
+                continue
+            if len(value) >= len(param_value) and value.find(param_value) != -1:
+                return True
+            if len(value) < len(param_value) and param_value.find(value) != -1:
+                return True
+
+        if len(param_value) > 3:
+            split_value = str_match.split_word(param_value)
+            for path_part in prepared_url["path_parts"].values():
+                for item in split_value:
+                    for part in path_part:
+                        if len(part) * len(item) < 10000:
+                            if str_match.has_common_substr(part, item, 4):
+                                return True
+                        elif len(part) >= len(item) and part.find(item) != -1:
+                            return True
+        return False
@@ -17,7 +17,6 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-import re
 import copy
 import json
 import base64
@@ -27,9 +26,11 @@ import urllib.parse
 import http.cookies
 
 from core.components import common
+from core.components import str_match
 from core.components import exceptions
 from core.components.logger import Logger
 from core.components.communicator import Communicator
+from core.components.audit_tools.param_hook_index import ParamHookIndex
 
 
 class RequestData(object):
@@ -44,16 +45,53 @@ class RequestData(object):
         """
         初始化
 
+        基于同一RaspResult构造的RequestData共享一份只读的原始请求数据, 修改参数时仅复制被修改的部分(写时复制)
+
         Parameters:
             rasp_result_ins - RaspResult实例，使用其中的信息构造原始http请求
             payload_seq - string, 随机字符序列，用于区分当前请求正在被测试的参数防止多次报警
             payload_feature - 用于检测payload是否成功投放的特征
         """
         self.rasp_result_ins = rasp_result_ins
-        self.method = rasp_result_ins.get_method().lower()
-        if not self._is_valid_method(self.method):
-            Logger().error("Found invalid http method {}".format(self.method))
-            self.method = "post"
+        base = rasp_result_ins.get_cached("request_data_base", self._build_base)
+        self.method = base["method"]
+        self.content_type = base["content_type"]
+        self.http_data = dict(base["http_data"])
+        # 已从共享数据复制, 可以直接修改的http_data字段
+        self._owned_keys = set()
+
+        try:
+            self.queue_id = Communicator().get_module_id()
+        except TypeError:
+            self.queue_id = "1"
+
+        self.payload_info = {
+            # payload序列号, 同一测试点相同类型payload序列号应相同，保证报警不重复
+            "seq": payload_seq,
+            # 用于检测payload是否生效的特征
+            "feature": payload_feature
+        }
+
+        # 请求返回的HTTP结果
+        self.response = {}
+        # 请求对应的rasp_result
+        self.rasp_result = None
+
+    @classmethod
+    def _build_base(cls, rasp_result_ins):
+        """
+        解析RaspResult中的原始请求数据, 结果由同一RaspResult构造的所有RequestData共享, 不可修改
+
+        Parameters:
+            rasp_result_ins - RaspResult实例
+
+        Returns:
+            dict, 包含method, content_type, http_data三个key
+        """
+        method = rasp_result_ins.get_method().lower()
+        if not cls._is_valid_method(method):
+            Logger().error("Found invalid http method {}".format(method))
+            method = "post"
             # raise exceptions.UnsupportedHttpData
 
         data = {}
@@ -61,12 +99,12 @@ class RequestData(object):
         cookies = None
         body = None
         files = []
-        self.content_type = rasp_result_ins.get_content_type()
-        if self.content_type.startswith("application/x-www-form-urlencoded"):
+        content_type = rasp_result_ins.get_content_type()
+        if content_type.startswith("application/x-www-form-urlencoded"):
             data = rasp_result_ins.get_post_data_dict()
-        elif self.content_type.startswith("application/json"):
+        elif content_type.startswith("application/json"):
             json = copy.deepcopy(rasp_result_ins.get_json())
-        elif self.content_type.startswith("multipart/form-data"):
+        elif content_type.startswith("multipart/form-data"):
             data = rasp_result_ins.get_post_data_dict()
             files = rasp_result_ins.get_upload_files()
         else:
@@ -83,45 +121,45 @@ class RequestData(object):
             except Exception:
                 Logger().warning("Found illegal cookie {} in request with id: {}".format(raw_cookie, rasp_result_ins.get_request_id()))
 
-        headers = copy.deepcopy(rasp_result_ins.get_headers())
-        del_keys = []
-        for key in headers:
-            lkey = key.lower()
-            if lkey in ("cookie", "content-length"):
-                del_keys.append(key)
-
-        for key in del_keys:
-            del headers[key]
-
-        self.http_data = {
-            "url": rasp_result_ins.get_scan_url(),
-            "headers": headers,
-            "params": rasp_result_ins.get_query_param_dict(),
-            "data": data,
-            "cookies": cookies,
-            "json": json,
-            "body": body,
-            "files": files
+        headers = {}
+        for key, value in rasp_result_ins.get_headers().items():
+            if key.lower() not in ("cookie", "content-length"):
+                headers[key] = value
+
+        return {
+            "method": method,
+            "content_type": content_type,
+            "http_data": {
+                "url": rasp_result_ins.get_scan_url(),
+                "headers": headers,
+                "params": rasp_result_ins.get_query_param_dict(),
+                "data": data,
+                "cookies": cookies,
+                "json": json,
+                "body": body,
+                "files": files
+            }
         }
 
-        try:
-            self.queue_id = Communicator().get_module_id()
-        except TypeError:
-            self.queue_id = "1"
+    def _get_writable(self, key):
+        """
+        获取可修改的http_data字段, 首次修改时浅复制共享的原始数据
 
-        self.payload_info = {
-            # payload序列号, 同一测试点相同类型payload序列号应相同，保证报警不重复
-            "seq": payload_seq,
-            # 用于检测payload是否生效的特征
-            "feature": payload_feature
-        }
+        Parameters:
+            key - str, http_data的key
 
-        # 请求返回的HTTP结果
-        self.response = {}
-        # 请求对应的rasp_result
-        self.rasp_result = None
+        Returns:
+            http_data[key]
+        """
+        if key not in self._owned_keys:
+            value = self.http_data[key]
+            if isinstance(value, (dict, list)):
+                self.http_data[key] = copy.copy(value)
+            self._owned_keys.add(key)
+        return self.http_data[key]
 
-    def _is_valid_method(self, method):
+    @classmethod
+    def _is_valid_method(cls, method):
         """
         判定http方法是否支持
 
@@ -131,7 +169,7 @@ class RequestData(object):
         Returns:
             boolean
         """
-        if method in self.http_methods:
+        if method in cls.http_methods:
             return True
         else:
             return False
@@ -181,35 +219,47 @@ class RequestData(object):
             exceptions.DataParamError - 参数错误引发此异常
         """
         if para_type == "cookies":
-            self.http_data["cookies"][para_name] = urllib.parse.quote(value)
+            self._get_writable("cookies")[para_name] = urllib.parse.quote(value)
         elif para_type == "get":
-            self.http_data["params"][para_name] = value
+            self._get_writable("params")[para_name] = value
         elif para_type == "post":
-            self.http_data["data"][para_name] = value
+            self._get_writable("data")[para_name] = value
         elif para_type == "headers":
-            self.http_data["headers"][para_name] = value
+            self._get_writable("headers")[para_name] = value
         elif para_type == "json":
             # 如果para_name为空，将root节点为设为value
             if len(para_name) == 0:
                 self.http_data["json"] = value
+                self._owned_keys.add("json")
                 return
-            json_target = self.http_data["json"]
+            # 仅复制json path经过的节点, 其余节点与原始数据共享
+            json_target = self._get_writable("json")
             for i in range(len(para_name)):
                 name = para_name[i]
-                obj = json_target.get(name, None)
                 if len(para_name) == i + 1:
                     json_target[name] = value
-                elif obj is None:
-                    if type(para_name[i]) is int:
-                        json_target[name] = []
+                    break
+                if isinstance(json_target, list):
+                    obj = json_target[name] if name < len(json_target) else None
+                else:
+                    obj = json_target.get(name, None)
+                if obj is None:
+                    if type(para_name[i + 1]) is int:
+                        obj = []
                     else:
-                        json_target[name] = {}
+                        obj = {}
+                else:
+                    obj = copy.copy(obj)
+                json_target[name] = obj
+                json_target = obj
         elif para_type == "files":
             if para_name[1] == "content" and type(value) is not bytes:
                 Logger().error("RequestData files content must set with bytes type!")
                 raise exceptions.DataParamError
             else:
-                self.http_data["files"][para_name[0]][para_name[1]] = value
+                files = self._get_writable("files")
+                files[para_name[0]] = dict(files[para_name[0]])
+                files[para_name[0]][para_name[1]] = value
         elif para_type == "body":
             self.http_data["body"] = value
         else:
@@ -227,13 +277,13 @@ class RequestData(object):
             exceptions.DataParamError - 参数错误引发此异常
         """
         if para_type == "cookies" and para_name in self.http_data["cookies"]:
-            del self.http_data["cookies"][para_name]
+            del self._get_writable("cookies")[para_name]
         elif para_type == "get" and para_name in self.http_data["params"]:
-            del self.http_data["params"][para_name]
+            del self._get_writable("params")[para_name]
         elif para_type == "post" and para_name in self.http_data["data"]:
-            del self.http_data["data"][para_name]
+            del self._get_writable("data")[para_name]
         elif para_type == "headers" and para_name in self.http_data["headers"]:
-            del self.http_data["headers"][para_name]
+            del self._get_writable("headers")[para_name]
         else:
             Logger().error("Use an invalid para_type in set_param method!")
             raise exceptions.DataParamError
@@ -259,7 +309,7 @@ class RequestData(object):
             ]
         """
         value = base64.b64encode(json.dumps(hook_filter).encode("utf-8"))
-        self.http_data["headers"]["x-iast-filter"] = value.decode("utf-8")
+        self._get_writable("headers")["x-iast-filter"] = value.decode("utf-8")
 
     def get_content_type(self):
         """
@@ -329,7 +379,7 @@ class RequestData(object):
         if "post" in param_type_list:
             result["post"] = self.http_data["data"]
         if "headers" in param_type_list:
-            result["headers"] = copy.deepcopy(self.http_data["headers"])
+            result["headers"] = dict(self.http_data["headers"])
             del_keys = []
             for key in result["headers"]:
                 if key.lower() in (
@@ -398,7 +448,8 @@ class RequestData(object):
         elif self.content_type.startswith("multipart/form-data"):
             result["data"] = self._make_multipart()
             if self.http_data["headers"].get("content-type", None) is not None:
-                del result["headers"]["content-type"]
+                del self._get_writable("headers")["content-type"]
+                result["headers"] = self.http_data["headers"]
         elif self.http_data["body"] is not None:
             result["data"] = self.http_data["body"]
         else:
@@ -502,12 +553,12 @@ class RequestData(object):
         """
         uuid = common.generate_uuid()
         scan_id = self.queue_id + "-" + uuid
-        self.http_data["headers"]["scan-request-id"] = scan_id
+        self._get_writable("headers")["scan-request-id"] = scan_id
         return scan_id
 
     def is_param_concat_in_hook(self, hook_type, param_value):
         """
-        判断参数值与hook点参数是否存在相似部分
+        判断参数值与hook点参数是否存在相似部分, 使用同一扫描任务的所有RequestData共享的ParamHookIndex
 
         Parameters:
             hook_type - str, 检查的hook点类型
@@ -516,42 +567,8 @@ class RequestData(object):
         Returns:
             Boolean
         """
-        if len(param_value) == 0:
-            return False
-
-        hook_info = self.rasp_result_ins.get_hook_info()
-
-        for hook_item in hook_info:
-            if hook_item["hook_type"] == hook_type:
-                if hook_type in ("command", "sql"):
-                    if self._is_token_concat(param_value, hook_item["tokens"]):
-                        return True
-                    if "env" in hook_item:
-                        for env_item in hook_item["env"]:
-                            env_part = env_item.split("=")
-                            for part in env_part:
-                                if str(param_value).find(str(part)) >= 0:
-                                    return True
-                elif hook_type in ("ssrf", "include"):
-                    if self._is_url_concat(param_value, hook_item["url"]):
-                        return True
-                elif hook_type in ("directory", "readFile", "writeFile"):
-                    if self._is_url_concat(param_value, hook_item["path"]):
-                        return True
-                else:
-                    hook_item_map = {
-                        "webdav": ["source", "dest"],
-                        "fileUpload": ["filename"],
-                        "rename": ["source", "dest"],
-                        "xxe": ["entity"],
-                        "ognl": ["expression"],
-                        "deserialization": ["clazz"],
-                        "eval": ["code"]
-                    }
-                    for key in hook_item_map[hook_type]:
-                        if hook_item[key].find(str(param_value)) >= 0:
-                            return True
-        return False
+        index = self.rasp_result_ins.get_cached("param_hook_index", ParamHookIndex)
+        return index.is_concat(hook_type, param_value)
 
     def _split_str_word(self, input_str):
         """
@@ -563,29 +580,7 @@ class RequestData(object):
         Returns:
             list - 分割后的字符串
         """
-        split_value = []
-        char = input_str[0]
-        if char > '\xff' or re.search(r'[a-zA-Z0-9_]', char):
-            word = True
-        else:
-            word = False
-        start = 0
-        index = 0
-        for char in input_str:
-            if char > '\xff' or re.search(r'[a-zA-Z0-9_]', char):
-                word_char = True
-            else:
-                word_char = False
-
-            if word != word_char:
-                split_value.append(input_str[start:index])
-                word = not word
-                start = index
-            index += 1
-        if index - start >= 3:
-            split_value.append(input_str[start:])
-
-        return split_value
+        return str_match.split_word(input_str)
 
     def _is_token_concat(self, param_value, tokens):
         """
@@ -598,26 +593,7 @@ class RequestData(object):
         Returns:
             Boolean
         """
-        param_value = param_value.strip()
-        for token in tokens:
-            if len(token["text"]) >= len(param_value) and token["text"].find(param_value) != -1:
-                return True
-
-        split_value = self._split_str_word(param_value)
-        if len(param_value) > 3:
-            for token in tokens:
-                for item in split_value:
-                    if len(token["text"]) * len(item) < 10000:
-                        if len(token["text"]) <= 3:
-                            if param_value.find(token["text"]) != -1:
-                                return True
-                        else:
-                            cs = common.lcs(token["text"], item)
-                            if len(cs) > 3:
-                                return True
-                    elif len(token["text"]) >= len(item) and token["text"].find(item) != -1:
-                        return True
-        return False
+        return ParamHookIndex.is_token_concat(param_value, ParamHookIndex.prepare_tokens(tokens))
 
     def _is_url_concat(self, param_value, url):
         """
@@ -630,39 +606,7 @@ class RequestData(object):
         Returns:
             Boolean
         """
-        try:
-            parse_result = urllib.parse.urlparse(url)
-            url_items = {
-                "scheme": parse_result.scheme,
-                "netloc": parse_result.netloc,
-                "path": parse_result.path,
-                "query": parse_result.query
-            }
-        except Exception as e:
-            Logger().warning("Invalid url found in url concat, url: {}".format(url))
-            return False
-
-        for key, value in url_items.items():
-            if len(value) == 0:
-                continue
-            if len(value) >= len(param_value) and value.find(param_value) != -1:
-                return True
-            if len(value) < len(param_value) and param_value.find(value) != -1:
-                return True
-
-        if len(param_value) > 3:
-            for key in url_items:
-                path_part = url_items[key].replace("\\", "/").split("/")
-                split_value = self._split_str_word(param_value)
-                for item in split_value:
-                    for part in path_part:
-                        if len(part) * len(item) < 10000:
-                            cs = common.lcs(part, item)
-                            if len(cs) > 3:
-                                return True
-                        elif len(part) >= len(item) and part.find(item) != -1:
-                            return True
-        return False
+        return ParamHookIndex.is_url_concat(param_value, ParamHookIndex.prepare_url(url))
 
     def get_payload_info(self):
         """
@@ -17,39 +17,141 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import time
+import random
 import aiohttp
 import asyncio
 
 from core.components import exceptions
 from core.components.logger import Logger
 from core.components.config import Config
+from core.components.communicator import Communicator
 from core.components.audit_tools import context
 
 
 class Session(object):
     """
-    用于发送http请求的session，一个扫描模块所有协程共用一个session
+    用于发送http请求的session，一个扫描进程(扫描目标)的所有插件共用同一个aiohttp.ClientSession及其连接池
     """
 
-    async def async_init(self):
+    # 响应body读取策略
+    # BODY_HEADERS: 仅保留响应头, body读取后丢弃, 超过body_limit时中断连接
+    # BODY_PARTIAL: 保留body的前body_limit字节, 超出部分不再读取并中断连接
+    # BODY_FULL: 读取完整body
+    BODY_HEADERS = "headers"
+    BODY_PARTIAL = "partial"
+    BODY_FULL = "full"
+
+    _shared_session = None
+    _ref_count = 0
+
+    def __init__(self, plugin_name=None, body_policy=BODY_FULL, body_limit=None):
         """
         初始化
+
+        Parameters:
+            plugin_name - str, 使用session的插件名, 用于按插件限制请求速率
+            body_policy - str, 响应body读取策略, Session.BODY_HEADERS/BODY_PARTIAL/BODY_FULL
+            body_limit - int, BODY_HEADERS/BODY_PARTIAL策略最多读取的body字节数, 为None时使用配置scanner.response_body_limit
+        """
+        self.plugin_name = plugin_name
+        self.body_policy = body_policy
+        if body_limit is None:
+            body_limit = Config().get_config("scanner.response_body_limit")
+        self.body_limit = body_limit
+        self.retry_backoff_base = Config().get_config("scanner.retry_backoff_base")
+        self.retry_backoff_max = Config().get_config("scanner.retry_backoff_max")
+
+    @staticmethod
+    async def _on_connection_reuseconn(session, trace_config_ctx, params):
+        """
+        从连接池获取到可复用的连接, 记录连接池命中
+        """
+        Communicator().increase_value("conn_pool_hit")
+
+    @staticmethod
+    async def _on_connection_create_end(session, trace_config_ctx, params):
+        """
+        连接池中没有可复用的连接, 新建连接后记录连接池未命中
+        """
+        Communicator().increase_value("conn_pool_miss")
+
+    async def async_init(self):
+        """
+        初始化, 首个调用的插件创建共享的ClientSession
         """
-        cookie_jar = aiohttp.DummyCookieJar()
-        conn = aiohttp.TCPConnector(limit=0)
-        timeout = aiohttp.ClientTimeout(
-            total=Config().get_config("scanner.request_timeout"))
-        self.session = aiohttp.ClientSession(
-            cookie_jar=cookie_jar,
-            connector=conn,
-            timeout=timeout
-        )
+        if Session._shared_session is None or Session._shared_session.closed:
+            cookie_jar = aiohttp.DummyCookieJar()
+            # 通过aiohttp的请求跟踪统计连接池命中情况
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_reuseconn.append(Session._on_connection_reuseconn)
+            trace_config.on_connection_create_end.append(Session._on_connection_create_end)
+            conn = aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=Config().get_config("scanner.conn_limit_per_host"),
+                keepalive_timeout=Config().get_config("scanner.keepalive_timeout"),
+                use_dns_cache=True,
+                ttl_dns_cache=Config().get_config("scanner.dns_cache_ttl")
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=Config().get_config("scanner.request_timeout"))
+            Session._shared_session = aiohttp.ClientSession(
+                cookie_jar=cookie_jar,
+                connector=conn,
+                timeout=timeout,
+                trace_configs=[trace_config]
+            )
+            Session._ref_count = 0
+        Session._ref_count += 1
+        self.session = Session._shared_session
 
     async def close(self):
         """
-        关闭session
+        关闭session, 最后一个使用者关闭时关闭共享的ClientSession
         """
-        await self.session.close()
+        Session._ref_count -= 1
+        if Session._ref_count <= 0 and not self.session.closed:
+            await self.session.close()
+
+    def _get_retry_delay(self, retry_count):
+        """
+        计算第retry_count次重试前的等待时间, 指数退避并加入随机抖动, 避免大量请求同时重试
+
+        Parameters:
+            retry_count - int, 重试次数, 从0开始
+
+        Returns:
+            float, 等待时间(s)
+        """
+        delay = min(self.retry_backoff_base * (2 ** retry_count), self.retry_backoff_max)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _read_body(self, response):
+        """
+        按body读取策略流式读取响应body, 超出body_limit时中断连接, 避免超大响应或无限长的响应占用内存
+
+        Parameters:
+            response - aiohttp.ClientResponse
+
+        Returns:
+            bytes, boolean - 读取到的body, body是否被截断
+        """
+        if self.body_policy == self.BODY_FULL:
+            return await response.read(), False
+
+        keep_body = self.body_policy == self.BODY_PARTIAL
+        chunks = []
+        size = 0
+        while True:
+            chunk = await response.content.read(65536)
+            if len(chunk) == 0:
+                return b"".join(chunks), False
+            if keep_body:
+                chunks.append(chunk[:self.body_limit - size])
+            size += len(chunk)
+            if size > self.body_limit:
+                response.close()
+                return b"".join(chunks), True
 
     async def send_request(self, request_data_ins, proxy_url=None):
         """
@@ -65,7 +167,8 @@ class Session(object):
                 "raw_request": 完整的raw http请求包
                 "status": http响应码,
                 "headers": http响应头的dict,
-                "body": http响应body, bytes
+                "body": http响应body, bytes, 按body读取策略可能为空或被截断
+                "truncated": boolean, body是否被截断
             }
 
         Raises:
@@ -74,25 +177,32 @@ class Session(object):
         http_func = getattr(self.session, request_data_ins.get_method())
         request_params_dict = request_data_ins.get_aiohttp_param()
         retry_times = Config().get_config("scanner.retry_times")
+        retry_count = 0
         while retry_times >= 0:
             try:
-                async with context.Context():
+                async with context.Context().slot(self.plugin_name):
+                    start_time = time.perf_counter()
                     async with http_func(**request_params_dict, proxy=proxy_url, allow_redirects=False, ssl=False) as response:
+                        body, truncated = await self._read_body(response)
                         response = {
                             "status": response.status,
                             "headers": response.headers,
-                            "body": await response.read()
+                            "body": body,
+                            "truncated": truncated
                         }
-                        break
+                    context.Context().record_latency(time.perf_counter() - start_time)
+                    break
             except (asyncio.TimeoutError, aiohttp.client_exceptions.ClientError) as e:
                 Logger().warning("Send scan request timeout, retrying! request params:{}".format(request_params_dict))
-                await asyncio.sleep(1)
+                await asyncio.sleep(self._get_retry_delay(retry_count))
+                retry_count += 1
                 retry_times -= 1
             except asyncio.CancelledError as e:
                 raise e
             except Exception as e:
                 Logger().error("Send scan request failed!", exc_info=e)
-                await asyncio.sleep(1)
+                await asyncio.sleep(self._get_retry_delay(retry_count))
+                retry_count += 1
                 retry_times -= 1
         if retry_times >= 0:
             return response
@@ -18,10 +18,13 @@ limitations under the License.
 """
 
 import os
+import mmap
 import time
+import ctypes
+import struct
+import threading
 import multiprocessing
 
-from core.components import common
 from core.components import exceptions
 from core.components.config import Config
 
@@ -33,6 +36,7 @@ class Communicator(object):
             cls.instance = super(Communicator, cls).__new__(cls)
             cls.instance.scanner_num = Config().get_config("scanner.max_module_instance")
             cls.instance.pre_http_num = Config().get_config("preprocessor.process_num")
+            cls.instance.result_queue_size = Config().get_config("scanner.result_queue_size")
             cls.instance._init_queues()
             cls.instance._init_shared_mem()
             cls.instance._init_shared_setting()
@@ -78,7 +82,11 @@ class Communicator(object):
             "dropped_rasp_result",
             "send_request",
             "failed_request",
-            "config_version"
+            "config_version",
+            "latency_p50",  # 最近请求响应时间中位数(us)
+            "latency_p95",  # 最近请求响应时间95分位数(us)
+            "conn_pool_hit",  # 复用连接池中已有连接的次数
+            "conn_pool_miss"  # 需要新建连接的次数
         ]
 
         data_struct = {
@@ -88,7 +96,9 @@ class Communicator(object):
         for i in range(self.scanner_num):
             data_struct["Scanner_" + str(i)] = dict.fromkeys(scanner_keys)
 
-        self.shared_mem = SharedMem(data_struct)
+        # 写入计数的进程: MainProcess、Monitor、Preprocessor主进程及其http子进程、各Scanner, 另预留部分槽位
+        shard_num = 3 + self.pre_http_num + self.scanner_num + 4
+        self.shared_mem = SharedMem(data_struct, shard_num)
 
     def _is_pid_exists(self, pid):
         try:
@@ -122,7 +132,7 @@ class Communicator(object):
     def _init_queues(self):
         self.queues = {}
         for i in range(self.scanner_num):
-            self.queues["rasp_result_queue_" + str(i)] = OriQueue()
+            self.queues["rasp_result_queue_" + str(i)] = OriRingQueue(self.result_queue_size)
 
     def _init_shared_setting(self):
         self.shared_setting_obj = OriSharedObj()
@@ -358,74 +368,196 @@ class Communicator(object):
             module_name = self.module_name
         self.shared_mem.reset_all_value(module_name)
 
-    def send_data(self, queue_name, data):
+    def send_data(self, queue_name, key, data, flag=0):
         """
         向指定队列发送数据，不产生阻塞
 
         Parameters:
             queue_name - 目标队列名
-            data - 发送的数据
+            key - str, 数据的标识, 接收方可以仅根据key决定是否处理数据
+            data - bytes, 发送的数据
+            flag - int, 0-255, 数据的附加标记
+
+        Raises:
+            exceptions.QueueNotExist - 目标队列不存在
+            exceptions.QueueValueError - 数据超出队列容量
+            exceptions.QueueFull - 队列剩余空间不足
         """
         if queue_name in self.queues:
-            self.queues[queue_name].put(data)
+            self.queues[queue_name].put(key, data, flag)
         else:
             raise exceptions.QueueNotExist
 
-    def get_data(self, queue_name):
+    def get_data_nowait(self, queue_name):
         """
-        从指定队列获取数据，阻塞模式
+        从指定队列获取数据，非阻塞模式
 
         Parameters:
             queue_name - 目标队列名
 
         Returns:
-            返回获取到的数据
+            tuple, (key, data, flag)
+
+        Raises:
+            目标队列为空则产生exceptions.QueueEmpty异常
         """
-        return self.queues[queue_name].get()
+        return self.queues[queue_name].get_nowait()
 
-    def get_data_nowait(self, queue_name):
+    def get_many_data(self, queue_name):
         """
-        从指定队列获取数据，非阻塞模式
+        获取指定队列中当前所有的数据，非阻塞模式, 可配合get_queue_fd使用
 
         Parameters:
             queue_name - 目标队列名
 
         Returns:
-            返回获取到的数据
+            list, item为tuple (key, data, flag), 队列为空时返回空list
+        """
+        return self.queues[queue_name].get_many()
 
-        Raises:
-            目标队列为空则产生exceptions.QueueEmpty异常
+    def get_queue_fd(self, queue_name):
         """
-        return self.queues[queue_name].get_nowait()
+        获取指定队列的可读通知文件描述符, 队列写入数据后该fd可读, 可用于loop.add_reader
 
+        Parameters:
+            queue_name - 目标队列名
 
-class OriQueue(object):
+        Returns:
+            int, 文件描述符
+        """
+        return self.queues[queue_name].fileno()
 
-    def __init__(self):
-        self.uuid = common.generate_uuid()
-        self.read_lock = multiprocessing.Lock()
+
+class OriRingQueue(object):
+    """
+    基于共享内存环形缓冲区的多写单读队列, 直接传输bytes数据, 无需pickle序列化
+    每条记录结构为: 记录长度(4 bytes) + flag(1 byte) + key长度(2 bytes) + key + data
+    共享内存起始的16字节为读位置和写位置, 均为单调递增的计数, 对容量取模得到实际偏移
+    每次写入后向通知管道写入1字节, 读取方可通过管道的可读事件等待数据
+    """
+
+    header_format = struct.Struct("<IBH")
+    index_size = 16
+
+    def __init__(self, capacity):
+        """
+        初始化, 需要在fork子进程前创建
+
+        Parameters:
+            capacity - int, 缓冲区大小(Bytes)
+        """
+        self.capacity = capacity
         self.write_lock = multiprocessing.Lock()
-        self.pipe_receiver, self.pip_sender = multiprocessing.Pipe(False)
+        # 匿名共享内存, fork后的子进程共享同一块内存
+        self.buffer = mmap.mmap(-1, self.index_size + capacity)
+        self.head = ctypes.c_int64.from_buffer(self.buffer, 0)
+        self.tail = ctypes.c_int64.from_buffer(self.buffer, 8)
+        self.notify_receiver, self.notify_sender = os.pipe()
+        os.set_blocking(self.notify_receiver, False)
+        os.set_blocking(self.notify_sender, False)
 
-    def get(self):
-        with self.read_lock:
-            data = self.pipe_receiver.recv()
-            return data
+    def fileno(self):
+        """
+        获取通知管道的读取端, 有数据写入时可读
+        """
+        return self.notify_receiver
 
-    def get_nowait(self):
-        with self.read_lock:
-            if self.pipe_receiver.poll():
-                data = self.pipe_receiver.recv()
-                return data
-            else:
-                raise exceptions.QueueEmpty
+    def _write(self, position, data):
+        """
+        从环形缓冲区的position位置写入data, 超出末尾时从头部继续写入
+        """
+        offset = position % self.capacity
+        first = min(len(data), self.capacity - offset)
+        start = self.index_size + offset
+        self.buffer[start:start + first] = data[:first]
+        if first < len(data):
+            rest = len(data) - first
+            self.buffer[self.index_size:self.index_size + rest] = data[first:]
+
+    def _read(self, position, length):
+        """
+        从环形缓冲区的position位置读取length长度的数据, 超出末尾时从头部继续读取
+        """
+        offset = position % self.capacity
+        first = min(length, self.capacity - offset)
+        start = self.index_size + offset
+        data = self.buffer[start:start + first]
+        if first < length:
+            data += self.buffer[self.index_size:self.index_size + length - first]
+        return data
+
+    def put(self, key, data, flag=0):
+        """
+        写入一条记录
+
+        Parameters:
+            key - str, 记录的标识
+            data - bytes, 记录的数据
+            flag - int, 0-255, 记录的附加标记
+
+        Raises:
+            exceptions.QueueValueError - 记录超出队列容量
+            exceptions.QueueFull - 队列剩余空间不足
+        """
+        key = key.encode("utf-8")
+        length = self.header_format.size + len(key) + len(data)
+        if length > self.capacity or len(key) > 0xffff:
+            raise exceptions.QueueValueError
 
-    def put(self, data):
         with self.write_lock:
+            head = self.head.value
+            tail = self.tail.value
+            if tail + length - head > self.capacity:
+                raise exceptions.QueueFull
+            self._write(tail, self.header_format.pack(length, flag, len(key)) + key)
+            self._write(tail + self.header_format.size + len(key), data)
+            # 数据写入完成后再更新写位置, 读取方不会读到未写完的记录
+            self.tail.value = tail + length
+
+        try:
+            os.write(self.notify_sender, b"\x00")
+        except BlockingIOError:
+            # 管道已满, 读取方必然会被唤醒
+            pass
+
+    def get_nowait(self):
+        """
+        读取一条记录, 仅允许单个进程读取
+
+        Returns:
+            tuple, (key, data, flag)
+
+        Raises:
+            exceptions.QueueEmpty - 队列为空
+        """
+        head = self.head.value
+        if head == self.tail.value:
+            raise exceptions.QueueEmpty
+        length, flag, key_len = self.header_format.unpack(
+            self._read(head, self.header_format.size))
+        record = self._read(head + self.header_format.size, length - self.header_format.size)
+        self.head.value = head + length
+        return record[:key_len].decode("utf-8"), record[key_len:], flag
+
+    def get_many(self):
+        """
+        清空通知管道并读取当前所有记录, 仅允许单个进程读取
+
+        Returns:
+            list, item为tuple (key, data, flag)
+        """
+        try:
+            while len(os.read(self.notify_receiver, 65536)) == 65536:
+                pass
+        except BlockingIOError:
+            pass
+
+        result = []
+        while True:
             try:
-                self.pip_sender.send(data)
-            except ValueError as e:
-                raise exceptions.QueueValueError
+                result.append(self.get_nowait())
+            except exceptions.QueueEmpty:
+                return result
 
 
 class OriSharedObj(object):
@@ -454,41 +586,115 @@ class OriSharedObj(object):
 
 
 class SharedMem(object):
+    """
+    多进程共享的计数器, 每个key按写入进程分片存储, 读取时对所有分片求和
 
-    def __init__(self, data_struct):
+    每个写入进程首次写入时占用一个分片槽位, 之后只修改自己的槽位, add_value不需要跨进程加锁,
+    同一进程的多个线程共用槽位, 使用进程内的线程锁保护;
+    槽位0为基准值, 仅由set_value和reset_all_value在模块锁内修改
+    """
+
+    def __init__(self, data_struct, shard_num):
+        """
+        初始化, 需要在fork子进程前创建
+
+        Parameters:
+            data_struct - dict, {module_name: {key: None}} 形式的2层字典
+            shard_num - int, 写入进程槽位数量, 超出后的写入进程共用加锁的基准槽位
+        """
         self._data_index = data_struct
+        # 每个key占用 基准槽位 + shard_num 个写入进程槽位
+        self._stride = shard_num + 1
         data_index = 0
         self._module_locks = {}
         for module in self._data_index:
             self._module_locks[module] = multiprocessing.Lock()
             for key in self._data_index[module]:
                 self._data_index[module][key] = data_index
-                data_index += 1
-        self.shared_array = multiprocessing.Array('l', data_index)
+                data_index += self._stride
+        self.shared_array = multiprocessing.RawArray('l', data_index)
+        # 各槽位所属进程的pid, 0为未占用
+        self._slot_owner = multiprocessing.RawArray('l', self._stride)
+        self._slot_lock = multiprocessing.Lock()
+        self._slot_pid = None
+        self._slot = 0
+        # 保护当前进程槽位的线程锁, 在进程首次写入时创建
+        self._thread_lock = None
+
+    def _get_slot(self):
+        """
+        获取当前进程的槽位, fork后的子进程首次调用时占用一个空闲或所属进程已退出的槽位
+
+        Returns:
+            int, 槽位编号, 0表示没有空闲槽位, 需要加锁写入基准槽位
+        """
+        pid = os.getpid()
+        if self._slot_pid == pid:
+            return self._slot
+
+        with self._slot_lock:
+            # 同一进程的多个线程可能同时首次写入, 加锁后再次检查
+            if self._slot_pid != pid:
+                slot = 0
+                for i in range(1, self._stride):
+                    owner = self._slot_owner[i]
+                    if owner == 0 or owner == pid or not self._is_pid_exists(owner):
+                        # 已退出进程留在槽位中的计数保持不变, 由新进程继续累加
+                        self._slot_owner[i] = pid
+                        slot = i
+                        break
+                self._thread_lock = threading.Lock()
+                self._slot = slot
+                self._slot_pid = pid
+        return self._slot
+
+    @staticmethod
+    def _is_pid_exists(pid):
+        try:
+            os.kill(pid, 0)
+        except OSError:
+            return False
+        else:
+            return True
+
+    def _sum(self, index):
+        return sum(self.shared_array[index:index + self._stride])
+
+    def _set_base(self, index, value):
+        """
+        调整基准槽位使key的总和等于value, 不修改其他进程的槽位, 调用方需持有模块锁
+        """
+        others = sum(self.shared_array[index + 1:index + self._stride])
+        self.shared_array[index] = value - others
 
     def get_all_module_name(self):
         return self._data_index.keys()
 
     def reset_all_value(self, module):
-        module = self._data_index[module]
-        for key in module:
-            self.shared_array[module[key]] = 0
+        with self._module_locks[module]:
+            for index in self._data_index[module].values():
+                self._set_base(index, 0)
 
     def get_all_value(self, module):
         result = {}
-        for key in self._data_index[module]:
-            with self._module_locks[module]:
-                result[key] = self.shared_array[self._data_index[module][key]]
+        for key, index in self._data_index[module].items():
+            result[key] = self._sum(index)
         return result
 
     def add_value(self, module, key, value=1):
-        with self._module_locks[module]:
-            self.shared_array[self._data_index[module][key]] += value
+        index = self._data_index[module][key]
+        slot = self._get_slot()
+        if slot == 0:
+            with self._module_locks[module]:
+                self.shared_array[index] += value
+        else:
+            # 槽位只由当前进程写入, 无需跨进程加锁, 仅需与同进程的其他线程互斥
+            with self._thread_lock:
+                self.shared_array[index + slot] += value
 
     def get_value(self, module, key):
-        value = self.shared_array[self._data_index[module][key]]
-        return value
+        return self._sum(self._data_index[module][key])
 
     def set_value(self, module, key, value):
         with self._module_locks[module]:
-            self.shared_array[self._data_index[module][key]] = value
+            self._set_base(self._data_index[module][key], value)
@@ -54,6 +54,12 @@ class AppIdExist(MonitorException, OriExpectedException):
         super().__init__(message)
 
 
+class UnknownRateController(MonitorException, OriExpectedException):
+    def __init__(self):
+        message = "Scan rate controller not exist!"
+        super().__init__(message)
+
+
 # RaspResultException
 class RaspResultException(OriException):
     pass
@@ -106,6 +112,12 @@ class QueueValueError(CommunicatorException, OriExpectedException):
         super().__init__(message)
 
 
+class QueueFull(CommunicatorException, OriExpectedException):
+    def __init__(self):
+        message = "OriQueue which put in communicator is full"
+        super().__init__(message)
+
+
 class QueueNotExist(CommunicatorException, OriFatalError):
     def __init__(self):
         message = "OriQueue which put in communicator is not exist"
@@ -159,6 +171,12 @@ class GetRaspResultFailed(ScannerException, OriExpectedException):
         super().__init__(message)
 
 
+class TaskNotExist(ScannerException, OriFatalError):
+    def __init__(self):
+        message = "Try to ack a scan task that does not exist!"
+        super().__init__(message)
+
+
 class UnsupportedHttpData(ScannerException, OriExpectedException):
     def __init__(self):
         message = "Try make an unsupported http request data!"
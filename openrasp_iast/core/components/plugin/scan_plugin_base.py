@@ -20,7 +20,6 @@ limitations under the License.
 import re
 import sys
 import copy
-import queue
 import types
 import asyncio
 import aiohttp
@@ -42,8 +41,17 @@ class ScanPluginBase(object):
         "description": "No description"  # 插件描述
     }
 
+    # 插件检测所需的hook点类型, 任务总线仅分发包含其中任一类型的任务, 为None时接收所有任务
+    hook_types = None
+
     audit_tools = audit_tools
 
+    # 测试请求的响应body读取策略, 可选 audit_tools.Session.BODY_HEADERS/BODY_PARTIAL/BODY_FULL
+    # 需要检测响应内容的插件应使用BODY_FULL, 或设置足够大的response_body_limit
+    response_body_policy = audit_tools.Session.BODY_PARTIAL
+    # BODY_HEADERS/BODY_PARTIAL策略最多读取的body字节数, 为None时使用配置scanner.response_body_limit
+    response_body_limit = None
+
     def __init__(self):
         """
         初始化
@@ -58,12 +66,13 @@ class ScanPluginBase(object):
         self._enable = True  # 插件是否启用
         self._white_reg = None  # 扫描url白名单
         self._proxy_url = None  # 扫描使用的代理
-        self._scan_queue = queue.Queue()  # 任务队列
-        self._last_scan_id = 0  # 最近扫描完成的任务在数据库中的id
-        self._scan_num = 0  # 当前已扫描url数量
-        self._has_failed_reuqest = False  # 标记扫描中存在连接失败的请求
+        self._task_bus = None  # 扫描任务总线
+        self._scan_queue = None  # 任务队列, 订阅任务总线后获得
         self._request_timeout = Config().get_config("scanner.request_timeout")
         self._max_concurrent_task = Config().get_config("scanner.max_concurrent_request")
+        self._worker_num = Config().get_config("scanner.plugin_worker_num")
+        # 仅在debug日志级别生成测试请求的raw request/response日志
+        self._debug_log = Config().get_config("log.level").upper() == "DEBUG"
 
         # 共享的report_model 和 failed_task_set 需要在实例化ScanPluginBase类之前设置
         try:
@@ -73,7 +82,8 @@ class ScanPluginBase(object):
             Logger().error("Try to init scan_plugin before set internal shared key in Communicator! Check 'error.log' for more information.")
             sys.exit(1)
 
-        self._request_session = audit_tools.Session()
+        self._request_session = audit_tools.Session(
+            self.plugin_info["name"], self.response_body_policy, self.response_body_limit)
         self._request_data = audit_tools.RequestData
 
         self.mutant_helper = audit_tools.MutantHelper()
@@ -83,14 +93,15 @@ class ScanPluginBase(object):
             self.logger.info("Scanner plugin {} init success!".format(
                 self.plugin_info["name"]))
 
-    def get_scan_progress(self):
+    def set_task_bus(self, task_bus):
         """
-        获取当前扫描进度
+        订阅扫描任务总线, 需要在async_run之前调用
 
-        Returns:
-            扫描请求数，最近一个扫描完成的请求在数据库中的id
+        Parameters:
+            task_bus - core.components.task_bus.TaskBus 实例
         """
-        return self._scan_num, self._last_scan_id
+        self._task_bus = task_bus
+        self._scan_queue = task_bus.subscribe(self.plugin_info["name"], self.hook_types)
 
     def get_max_concureent_task(self):
         """
@@ -137,43 +148,32 @@ class ScanPluginBase(object):
         主函数，执行扫描任务
         """
         await self._request_session.async_init()
-        self._scan_queue_event = asyncio.Event()
-        while True:
-            if not self._scan_queue.empty():
-                self._has_failed_reuqest = False
-                self._task = self._scan_queue.get_nowait()
-                if self._enable:
-                    rasp_result_ins = self._task["data"]
-                    try:
-                        await self._scan(self._task["id"], rasp_result_ins)
-                    except asyncio.CancelledError as e:
-                        raise e
-                    except Exception as e:
-                        self.logger.error("scanner plugin: [{}] error:".format(
-                            self.plugin_info["name"]), exc_info=e)
-
-                    if self._has_failed_reuqest:
-                        self._failed_set.add(self._task["id"])
-
-                self._last_scan_id = self._task["id"]
-                self._scan_num += 1
-            else:
-                self._scan_queue_event.clear()
-                await self._scan_queue_event.wait()
+        workers = []
+        for i in range(max(self._worker_num, 1)):
+            workers.append(self._scan_worker())
+        await asyncio.gather(*workers)
         # if break but not exit, do close
         await self._request_session.close()
 
-    def add_task(self, task):
+    async def _scan_worker(self):
         """
-        向扫描插件添加任务的接口
-
-        Parameters:
-            task - RaspResult实例，要添加的任务
+        扫描任务协程, 从任务队列获取任务并扫描, 多个协程并行扫描不同的任务
         """
-        self.logger.debug(
-            "Add task with id: {} to scan list.".format(task["id"]))
-        self._scan_queue.put(task)
-        self._scan_queue_event.set()
+        while True:
+            task = await self._scan_queue.get()
+            self.logger.debug(
+                "Get task with id: {} from task bus.".format(task["id"]))
+            if self._enable:
+                try:
+                    if not await self._scan(task["id"], task["data"]):
+                        self._failed_set.add(task["id"])
+                except asyncio.CancelledError as e:
+                    raise e
+                except Exception as e:
+                    self.logger.error("scanner plugin: [{}] error:".format(
+                        self.plugin_info["name"]), exc_info=e)
+            # 向任务总线确认完成, 扫描进度由任务总线的水位线统计
+            self._task_bus.ack(self.plugin_info["name"], task["id"])
 
     def mutant(self, rasp_result_ins):
         """
@@ -264,8 +264,7 @@ class ScanPluginBase(object):
                 rasp_result_ins = await self._wait_result(request_id)
                 # self.logger.debug("Request with id: {} get rasp_result: {}".format(request_id, rasp_result_ins))
         except (exceptions.ScanRequestFailed, exceptions.GetRaspResultFailed) as e:
-            self._has_failed_reuqest = True
-            self.logger.debug("Request with id {} of task id {} failed, skip task!".format(request_id, self._task["id"]))
+            self.logger.debug("Request with id {} failed, skip task!".format(request_id))
             raise e
 
         ret = {
@@ -282,6 +281,9 @@ class ScanPluginBase(object):
         Parameters:
             task_id - int, 扫描task对应的id
             rasp_result_ins - RaspResult实例
+
+        Returns:
+            bool, 扫描中存在连接失败的请求时返回False
         """
         if self._white_reg is not None:
             qs = rasp_result_ins.get_query_string()
@@ -294,7 +296,7 @@ class ScanPluginBase(object):
                     rasp_result_ins.get_request_id(),
                     rasp_result_ins.get_url()
                 ))
-                return
+                return True
 
         mutant_generator = self.mutant(rasp_result_ins)
         self.logger.info("Start task with task_id: {}, request_id:{}, url:{}".format(
@@ -307,28 +309,32 @@ class ScanPluginBase(object):
         if not isinstance(mutant_generator, types.GeneratorType):
             self.logger.error(
                 "Scan plugin error, the mutant method should return a Generator!")
-            return
+            return True
 
+        # 同一任务的测试协程共享的扫描状态, failed标记扫描中存在连接失败的请求
+        scan_state = {"failed": False}
         max_task = self.get_max_concureent_task()
         tasks = []
         loop = asyncio.get_event_loop()
         for i in range(max_task):
             tasks.append(loop.create_task(
-                self._test_mutant_task(mutant_generator)))
+                self._test_mutant_task(mutant_generator, scan_state)))
         for task in tasks:
             await task
         self.logger.info("Finish task with request_id:{}".format(
             rasp_result_ins.get_request_id()))
+        return not scan_state["failed"]
 
-    async def _test_mutant_task(self, mutant_generator):
+    async def _test_mutant_task(self, mutant_generator, scan_state):
         """
         test_in_coroutine 方法使用的协程任务函数
 
         Parameters:
             mutant_generator - 测试请求序列生成器
+            scan_state - dict, 同一任务的测试协程共享的扫描状态
         """
         while True:
-            if self._has_failed_reuqest:
+            if scan_state["failed"]:
                 break
             try:
                 request_data_list = mutant_generator.__next__()
@@ -339,34 +345,22 @@ class ScanPluginBase(object):
                 for req_data in request_data_list:
                     ret = await self.send_request(req_data)
                     req_data.set_response(ret["response"])
-                    raw_request = await req_data.get_aiohttp_raw()
-                    self.logger.debug("Send scan request: \n{}\n".format(raw_request))
-
-                    raw_response = []
-                    raw_response.append("HTTP Code:" + str(ret["response"]["status"]))
-                    for key, value in ret["response"]["headers"].items():
-                        raw_response.append(key + ": " + value)
-
-                    raw_response.append("")
-                    try:
-                        body = ret["response"]["body"].decode("utf-8")
-                    except UnicodeDecodeError:
-                        body = ret["response"]["body"].decode("latin-1")
-
-                    raw_response.append(body)
-                    raw_response = "\r\n".join(raw_response)
-                    self.logger.debug("Scan request with id: {}, got response:\n {}\n".format(ret["scan_req_id"], raw_response))
-
                     if ret["rasp_result"] is not None:
-                        self.logger.debug("Scan request with id: {}, got rasp_result: {}".format(ret["scan_req_id"], ret["rasp_result"]))
-                        ret["rasp_result"].set_request(raw_request)
-                        ret["rasp_result"].set_response(raw_response)
                         req_data.set_rasp_result(ret["rasp_result"])
+                    if self._debug_log:
+                        raw_request, raw_response = await self._render_raw(req_data)
+                        self.logger.debug("Send scan request: \n{}\n".format(raw_request))
+                        self.logger.debug("Scan request with id: {}, got response:\n {}\n".format(ret["scan_req_id"], raw_response))
+                        if ret["rasp_result"] is not None:
+                            self.logger.debug("Scan request with id: {}, got rasp_result: {}".format(ret["scan_req_id"], ret["rasp_result"]))
             except (exceptions.ScanRequestFailed, exceptions.GetRaspResultFailed):
+                scan_state["failed"] = True
                 break
 
             message = self.check(request_data_list)
             if type(message) is str:
+                for req_data in request_data_list:
+                    await self._render_raw(req_data)
                 if await self.report(request_data_list, message):
                     url_list = []
                     for request in request_data_list:
@@ -374,6 +368,42 @@ class ScanPluginBase(object):
                     urls = ",".join(url_list)
                     self.logger.info("Plugin find vuln with request {}".format(urls))
 
+    async def _render_raw(self, req_data):
+        """
+        生成测试请求的raw request和raw response字符串, 并记录到请求对应的RaspResult中
+        仅在需要上报漏洞或输出debug日志时调用, 其余情况只保留响应的引用
+
+        Parameters:
+            req_data - RequestData实例, 需要已设置response
+
+        Returns:
+            str, str - raw request, raw response
+        """
+        rasp_result_ins = req_data.get_rasp_result()
+        if rasp_result_ins is not None and rasp_result_ins.has_raw_data():
+            return rasp_result_ins.get_request(), rasp_result_ins.get_response()
+
+        response = req_data.get_response()
+        raw_request = await req_data.get_aiohttp_raw()
+        raw_response = []
+        raw_response.append("HTTP Code:" + str(response["status"]))
+        for key, value in response["headers"].items():
+            raw_response.append(key + ": " + value)
+
+        raw_response.append("")
+        try:
+            body = response["body"].decode("utf-8")
+        except UnicodeDecodeError:
+            body = response["body"].decode("latin-1")
+
+        raw_response.append(body)
+        raw_response = "\r\n".join(raw_response)
+
+        if rasp_result_ins is not None:
+            rasp_result_ins.set_request(raw_request)
+            rasp_result_ins.set_response(raw_response)
+        return raw_request, raw_response
+
     async def report(self, request_data_list, message=""):
         """
         向扫描结果中添加一条漏洞信息
@@ -20,6 +20,7 @@ limitations under the License.
 import re
 import json
 import copy
+import zlib
 import pickle
 import hashlib
 import binascii
@@ -30,11 +31,76 @@ from core.components import common
 from core.components import exceptions
 from core.components.logger import Logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data):
+    """
+    json反序列化, 安装了orjson时优先使用orjson
+
+    Parameters:
+        data - str或bytes, json字符串
+
+    Returns:
+        反序列化后的对象
+
+    Raises:
+        ValueError - json格式错误
+        TypeError - data类型错误
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            # orjson不支持超出64位的整数等情况，交由json模块处理
+            pass
+    return json.loads(data)
+
+
+def compile_schema(schema):
+    """
+    将jsonschema中type、required、properties三种关键字编译为校验函数, 用于替代jsonschema完成常规校验
+
+    Parameters:
+        schema - dict, jsonschema
+
+    Returns:
+        function, 参数为待校验的对象, 返回boolean
+    """
+    type_map = {
+        "object": dict,
+        "array": list,
+        "string": str
+    }
+    expect_type = type_map.get(schema.get("type"), object)
+    required = tuple(schema.get("required", ()))
+    properties = tuple(
+        (key, compile_schema(sub_schema)) for key, sub_schema in schema.get("properties", {}).items()
+    )
+
+    def validate(obj):
+        if not isinstance(obj, expect_type):
+            return False
+        for key in required:
+            if key not in obj:
+                return False
+        for key, sub_validate in properties:
+            if key in obj and not sub_validate(obj[key]):
+                return False
+        return True
+
+    return validate
+
 
 class RaspResult(object):
     """
     用于表示一个http请求的rasp_result
     """
+    __slots__ = ("hash_str", "rasp_result_dict", "_cache", "_hook_info", "_no_stack_hook_info")
+
     schema = {
         "type": "object",
         "required": ["context", "hook_info"],
@@ -62,23 +128,31 @@ class RaspResult(object):
         }
     }
     rasp_result_validtor = jsonschema.Draft7Validator(schema)
+    rasp_result_fast_validtor = staticmethod(compile_schema(schema))
 
     host_reg = re.compile(r'^[a-zA-Z0-9.\-]+$')
 
-    def __init__(self, rasp_result_json):
+    def __init__(self, rasp_result_json, validate=True):
         """
         初始化
 
         Parameters:
             rasp_result_json - 接收自rasp agent的rasp_result json字符串 或 其反序列化后的dict
+            validate - 是否校验数据格式, 使用已校验过的数据(如从数据库读取)初始化时可设置为False
         """
         self.hash_str = ""
+        # 缓存由rasp_result_dict计算得到的数据, 避免扫描插件重复调用时重复计算
+        self._cache = {}
         try:
             if type(rasp_result_json) is dict:
                 self.rasp_result_dict = rasp_result_json
             else:
-                self.rasp_result_dict = json.loads(rasp_result_json)
-            self.rasp_result_validtor.validate(self.rasp_result_dict)
+                self.rasp_result_dict = json_loads(rasp_result_json)
+            if not validate:
+                return
+            # 快速校验失败时, 使用jsonschema校验以获取详细的错误信息
+            if not self.rasp_result_fast_validtor(self.rasp_result_dict):
+                self.rasp_result_validtor.validate(self.rasp_result_dict)
         except (UnicodeDecodeError, ValueError, TypeError) as e:
             Logger().warning(
                 "RaspResult init with non-json data:{}".format(rasp_result_json), exc_info=e)
@@ -143,6 +217,15 @@ class RaspResult(object):
         """
         return json.dumps(self.rasp_result_dict)
 
+    def dump_compressed(self):
+        """
+        用于压缩存储, 返回zlib压缩的序列化结果
+
+        Returns:
+            bytes
+        """
+        return zlib.compress(self.dump().encode("utf-8"))
+
     def get_hash(self):
         """
         获取当前请求hash
@@ -332,6 +415,24 @@ class RaspResult(object):
         """
         return self.rasp_result_dict["context"]["url"]
 
+    def get_cached(self, key, factory):
+        """
+        获取由factory基于当前实例计算并缓存的数据, 用于基于同一RaspResult构造多个对象时复用计算结果
+
+        Parameters:
+            key - str, 缓存的key
+            factory - callable, 参数为当前RaspResult实例, 返回需要缓存的数据
+
+        Returns:
+            factory的返回值
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            result = factory(self)
+            self._cache[key] = result
+            return result
+
     def get_scan_url(self):
         """
         获取重放当前请求使用的url
@@ -390,7 +491,12 @@ class RaspResult(object):
         Returns:
             dict, 每个参数字段对应一个key-value, value为list，包含所有同名参数
         """
-        return urllib.parse.parse_qs(self.rasp_result_dict["context"]["querystring"], keep_blank_values=True)
+        try:
+            result = self._cache["query_parameters"]
+        except KeyError:
+            result = urllib.parse.parse_qs(self.rasp_result_dict["context"]["querystring"], keep_blank_values=True)
+            self._cache["query_parameters"] = result
+        return {key: list(value) for key, value in result.items()}
 
     def get_query_param_dict(self):
         """
@@ -399,18 +505,22 @@ class RaspResult(object):
         Returns:
             dict, 每个参数字段对应一个key-value
         """
-        result = {}
-        params = urllib.parse.parse_qsl(
-            self.rasp_result_dict["context"]["querystring"], keep_blank_values=True)
-        rasp_params = self.get_parameters()
-        for item in params:
-            if item[0] not in result:
-                result[item[0]] = item[1]
-            else:
-                rasp_para_value = rasp_params.get(item[0], [None])
-                if type(rasp_para_value[0]) == str:
-                    result[item[0]] = rasp_para_value[0]
-        return result
+        try:
+            result = self._cache["query_param_dict"]
+        except KeyError:
+            result = {}
+            params = urllib.parse.parse_qsl(
+                self.rasp_result_dict["context"]["querystring"], keep_blank_values=True)
+            rasp_params = self.get_parameters()
+            for item in params:
+                if item[0] not in result:
+                    result[item[0]] = item[1]
+                else:
+                    rasp_para_value = rasp_params.get(item[0], [None])
+                    if type(rasp_para_value[0]) == str:
+                        result[item[0]] = rasp_para_value[0]
+            self._cache["query_param_dict"] = result
+        return dict(result)
 
     def get_post_data_dict(self):
         """
@@ -419,15 +529,19 @@ class RaspResult(object):
         Returns:
             dict, 每个参数字段对应一个key-value
         """
-        all_params = self.get_parameters()
-        get_params = self.get_query_parameters().keys()
-        result = {}
-        for para_name in all_params:
-            if para_name not in get_params and type(all_params[para_name][0]) == str:
-                result[para_name] = all_params[para_name][0]
-            elif len(all_params[para_name]) == 2 and type(all_params[para_name][1]) == str:
-                result[para_name] = all_params[para_name][1]
-        return result
+        try:
+            result = self._cache["post_data_dict"]
+        except KeyError:
+            all_params = self.get_parameters()
+            get_params = self.get_query_parameters().keys()
+            result = {}
+            for para_name in all_params:
+                if para_name not in get_params and type(all_params[para_name][0]) == str:
+                    result[para_name] = all_params[para_name][0]
+                elif len(all_params[para_name]) == 2 and type(all_params[para_name][1]) == str:
+                    result[para_name] = all_params[para_name][1]
+            self._cache["post_data_dict"] = result
+        return dict(result)
 
     def get_cookies(self):
         """
@@ -436,11 +550,16 @@ class RaspResult(object):
         Returns:
             str, cookie字段
         """
-        for header_name in self.rasp_result_dict["context"]["header"]:
-            if header_name.lower() == "cookie":
-                result = self.rasp_result_dict["context"]["header"][header_name]
-                return result
-        return None
+        try:
+            return self._cache["cookies"]
+        except KeyError:
+            result = None
+            for header_name in self.rasp_result_dict["context"]["header"]:
+                if header_name.lower() == "cookie":
+                    result = self.rasp_result_dict["context"]["header"][header_name]
+                    break
+            self._cache["cookies"] = result
+            return result
 
     def get_content_type(self):
         """
@@ -449,11 +568,15 @@ class RaspResult(object):
         Returns:
             str, content-type, 不存在时为空
         """
-        result = ""
-        for header_name in self.rasp_result_dict["context"]["header"]:
-            if header_name.lower() == "content-type":
-                result = self.rasp_result_dict["context"]["header"][header_name]
-        return result
+        try:
+            return self._cache["content_type"]
+        except KeyError:
+            result = ""
+            for header_name in self.rasp_result_dict["context"]["header"]:
+                if header_name.lower() == "content-type":
+                    result = self.rasp_result_dict["context"]["header"][header_name]
+            self._cache["content_type"] = result
+            return result
 
     def get_content_length(self):
         """
@@ -499,6 +622,34 @@ class RaspResult(object):
         """
         return self.rasp_result_dict["hook_info"]
 
+    def _get_hook_index(self):
+        """
+        获取hook点类型到hook点列表的索引, 首次调用时遍历一次hook_info构建
+
+        Returns:
+            dict, key为hook点类型, value为该类型的hook点dict组成的list, 保持hook_info中的顺序
+        """
+        try:
+            return self._cache["hook_index"]
+        except KeyError:
+            hook_index = {}
+            for item in self.rasp_result_dict["hook_info"]:
+                hook_index.setdefault(item["hook_type"], []).append(item)
+            self._cache["hook_index"] = hook_index
+            return hook_index
+
+    def get_hook_list(self, hook_type):
+        """
+        获取当前请求的hook信息中某一类型的hook点
+
+        Parameters:
+            hook_type - string, hook点类型
+
+        Returns:
+            list, 每个item为一个hook点的dict，没有时为空, 调用方不应修改该list
+        """
+        return self._get_hook_index().get(hook_type, [])
+
     def has_hook_type(self, hook_type):
         """
         判断当前请求的hook信息中，是否包含某一类型的hook点
@@ -509,10 +660,18 @@ class RaspResult(object):
         Returns:
             boolean
         """
-        for item in self.rasp_result_dict["hook_info"]:
-            if item["hook_type"] == hook_type:
-                return True
-        return False
+        return hook_type in self._get_hook_index()
+
+    def get_hook_types(self):
+        """
+        获取当前请求包含的hook点类型
+
+        Returns:
+            list, item为hook点类型字符串, 按字母排序且不重复
+        """
+        if "hook_types" not in self._cache:
+            self._cache["hook_types"] = sorted(self._get_hook_index().keys())
+        return self._cache["hook_types"]
 
     def get_upload_files(self):
         """
@@ -526,16 +685,19 @@ class RaspResult(object):
                 "content": "xxxxx"
             }
         """
-        result = []
-        for item in self.rasp_result_dict["hook_info"]:
-            if item["hook_type"] == "fileUpload":
+        try:
+            result = self._cache["upload_files"]
+        except KeyError:
+            result = []
+            for item in self.get_hook_list("fileUpload"):
                 upfile = {
                     "name": item["name"],
                     "filename": item["filename"],
                     "content": item["content"].encode("utf-8")
                 }
                 result.append(upfile)
-        return result
+            self._cache["upload_files"] = result
+        return [dict(item) for item in result]
 
     def get_json_struct(self):
         """
@@ -544,6 +706,10 @@ class RaspResult(object):
         Returns:
             string, json结构字符串
         """
+        try:
+            return self._cache["json_struct"]
+        except KeyError:
+            pass
         json_data = self.rasp_result_dict["context"]["json"]
         result = []
         parse_stack = [json_data]
@@ -566,7 +732,8 @@ class RaspResult(object):
                     key_list.append(key.replace(",", "\\,"))
                     parse_stack.append(cur_obj[key])
                 result.append("D:" + ",".join(key_list) + ",|")
-        return "".join(result)
+        self._cache["json_struct"] = "".join(result)
+        return self._cache["json_struct"]
 
     def get_all_stack_hash(self):
         """
@@ -656,3 +823,72 @@ class RaspResult(object):
             return self.rasp_result_dict["raw_response"]
         except AttributeError:
             return ""
+
+    def has_raw_data(self):
+        """
+        判断是否已设置raw_request和raw_response
+
+        Returns:
+            boolean
+        """
+        return "raw_request" in self.rasp_result_dict and "raw_response" in self.rasp_result_dict
+
+
+class LazyRaspResult(RaspResult):
+    """
+    延迟解析的RaspResult, 用于从数据库等可信来源读取的已校验数据
+    初始化时仅保存原始json, 首次访问数据时才进行解压和反序列化, 未访问过数据时dump直接返回原始json
+    """
+    __slots__ = ("_raw_json", "_compressed")
+
+    def __init__(self, rasp_result_json, compressed=False):
+        """
+        初始化
+
+        Parameters:
+            rasp_result_json - 已校验过的rasp_result json字符串或bytes
+            compressed - bool, rasp_result_json是否为dump_compressed方法的压缩结果
+        """
+        self.hash_str = ""
+        self._cache = {}
+        self._raw_json = rasp_result_json
+        self._compressed = compressed
+
+    def __getattr__(self, attr):
+        """
+        rasp_result_dict未初始化时, 反序列化原始json并释放原始json
+        """
+        if attr != "rasp_result_dict" or self._raw_json is None:
+            raise AttributeError(attr)
+        try:
+            if self._compressed:
+                self._raw_json = zlib.decompress(self._raw_json)
+                self._compressed = False
+            self.rasp_result_dict = json_loads(self._raw_json)
+        except (zlib.error, UnicodeDecodeError, ValueError, TypeError) as e:
+            Logger().warning(
+                "LazyRaspResult init with non-json data:{}".format(self._raw_json), exc_info=e)
+            raise exceptions.ResultJsonError
+        self._raw_json = None
+        return self.rasp_result_dict
+
+    def dump(self):
+        """
+        用于序列化
+        """
+        if self._raw_json is None:
+            return super().dump()
+        elif self._compressed:
+            return zlib.decompress(self._raw_json).decode("utf-8")
+        elif isinstance(self._raw_json, bytes):
+            return self._raw_json.decode("utf-8")
+        else:
+            return self._raw_json
+
+    def dump_compressed(self):
+        """
+        用于压缩存储, 未访问过数据时直接返回原始压缩数据
+        """
+        if self._raw_json is not None and self._compressed:
+            return self._raw_json
+        return super().dump_compressed()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import math
+
+from core.components import exceptions
+
+
+class RateControllerBase(object):
+    """
+    扫描速率控制器基类, 由Monitor的ScannerScheduler按schedule_interval周期调用
+
+    每次调用传入的统计数据stats格式:
+    {
+        "congested": bool, 本周期内出现请求失败/rasp_result超时或cpu负载过高,
+        "cpu_idle": bool, cpu是否空闲,
+        "full_concurrency": bool, 本周期发送的请求数是否已达到当前速率上限,
+        "sample_num": int, 本周期发送的请求数,
+        "latency_p50": int, 最近请求响应时间的中位数(us), 无数据时为0,
+        "latency_p95": int, 最近请求响应时间的95分位数(us), 无数据时为0
+    }
+
+    边界值boundary格式:
+    {
+        "max_concurrent_request": int, 最大并发数,
+        "max_request_interval": int, 请求最大间隔(ms),
+        "min_request_interval": int, 请求最小间隔(ms)
+    }
+    """
+
+    name = None
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        清空控制器状态, 扫描目标变化时调用
+        """
+        pass
+
+    def update(self, cr, ri, stats, boundary):
+        """
+        根据统计数据计算新的并发数和请求间隔
+
+        Parameters:
+            cr - int, 当前最大并发数
+            ri - int, 当前请求间隔(ms)
+            stats - dict, 统计数据
+            boundary - dict, 边界值
+
+        Returns:
+            int, int - 新的最大并发数, 新的请求间隔(ms)
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _clamp(cr, ri, boundary):
+        """
+        将并发数和请求间隔限制在边界值内
+        """
+        cr = int(min(max(cr, 1), boundary["max_concurrent_request"]))
+        ri = int(min(max(ri, boundary["min_request_interval"]), boundary["max_request_interval"]))
+        return cr, ri
+
+    @staticmethod
+    def _increase_interval(ri):
+        """
+        并发数已降至1时翻倍请求间隔
+        """
+        if ri < 16:
+            return 16
+        return ri * 2
+
+
+class StepController(RateControllerBase):
+    """
+    按固定步长调整速率, 仅依据请求失败和cpu使用率, 拥塞后会保持一段时间不再提速
+    """
+
+    name = "step"
+
+    def reset(self):
+        self.cr_maintain_times = 0
+        self.cr_maintain_times_amplitude = 5
+        self.last_schedule_decrease = False
+        self.max_performance = False
+
+    def update(self, cr, ri, stats, boundary):
+        cr_max = boundary["max_concurrent_request"]
+        ri_max = boundary["max_request_interval"]
+        ri_min = boundary["min_request_interval"]
+        if cr > cr_max:
+            cr = cr_max
+        if ri > ri_max or ri < ri_min:
+            ri = ri_min
+
+        if stats["congested"]:
+            self.max_performance = False
+            if self.last_schedule_decrease:
+                self.cr_maintain_times_amplitude += 1
+            else:
+                self.last_schedule_decrease = True
+                self.cr_maintain_times_amplitude = 2
+
+            self.cr_maintain_times += self.cr_maintain_times_amplitude
+            if self.cr_maintain_times > 100:
+                self.cr_maintain_times = 100
+
+            if ri < 128 and ri_max >= 128:
+                if ri == 0:
+                    ri = 16
+                else:
+                    ri *= 2
+            elif cr > 1:
+                cr -= 1
+            else:
+                ri += int((ri_max - ri_min) / 10)
+
+            if ri > ri_max:
+                ri = ri_max
+
+        elif stats["full_concurrency"] and stats["cpu_idle"] and not self.max_performance:
+            self.last_schedule_decrease = False
+            if self.cr_maintain_times > 0:
+                self.cr_maintain_times -= 1
+            else:
+                if ri > 128:
+                    ri -= int((ri_max - ri_min) / 10)
+                    if ri < 128:
+                        ri = 128
+                elif cr < cr_max:
+                    cr += 1
+                else:
+                    ri /= 2
+                    ri = int(ri)
+
+                if ri <= ri_min:
+                    ri = ri_min
+                    if cr == cr_max:
+                        self.max_performance = True
+
+        return cr, ri
+
+
+class AimdController(RateControllerBase):
+    """
+    加性增/乘性减控制器
+
+    以扫描过程中观测到的最小响应时间中位数和最小95分位响应时间作为目标空载延迟, 任一分位的响应时间
+    超过其空载值的 latency_tolerance 倍视为到达吞吐拐点; 首次拥塞前并发数按倍数增长(慢启动), 之后每周期加1,
+    拥塞时并发数乘以 decrease_factor, 并发数为1时再增加请求间隔
+    """
+
+    name = "aimd"
+
+    latency_tolerance = 2.0
+    decrease_factor = 0.7
+    # 每个周期至少需要的请求数, 低于该值时不依据延迟判断拥塞
+    min_sample_num = 5
+
+    def reset(self):
+        # 各分位的空载延迟, key为stats中的分位名称
+        self.base_latency = {"latency_p50": 0, "latency_p95": 0}
+        self.slow_start = True
+
+    def _is_latency_congested(self, stats):
+        if stats["sample_num"] < self.min_sample_num:
+            return False
+        congested = False
+        for key, base in self.base_latency.items():
+            latency = stats[key]
+            if latency <= 0:
+                continue
+            if base == 0 or latency < base:
+                self.base_latency[key] = latency
+            elif latency > base * self.latency_tolerance:
+                congested = True
+        return congested
+
+    def update(self, cr, ri, stats, boundary):
+        cr, ri = self._clamp(cr, ri, boundary)
+        if stats["congested"] or self._is_latency_congested(stats):
+            self.slow_start = False
+            if cr > 1:
+                cr = math.floor(cr * self.decrease_factor)
+            else:
+                ri = self._increase_interval(ri)
+        elif stats["full_concurrency"] and stats["cpu_idle"]:
+            if ri > boundary["min_request_interval"]:
+                ri = ri // 2
+            elif self.slow_start:
+                cr *= 2
+            else:
+                cr += 1
+        return self._clamp(cr, ri, boundary)
+
+
+class GradientController(RateControllerBase):
+    """
+    基于延迟梯度的控制器
+
+    梯度 = 空载延迟 / 当前延迟中位数, 取值范围[0.5, 1], 新并发数 = 当前并发数 * 梯度 + sqrt(当前并发数),
+    延迟未上升时并发数按sqrt(cr)增长, 延迟上升时按比例收缩, 收敛于延迟开始上升的拐点;
+    新值与旧值按 smoothing 加权平滑, 空载延迟每 probe_interval 个周期重新测量一次以适应目标变化
+    """
+
+    name = "gradient"
+
+    smoothing = 0.5
+    probe_interval = 60
+    min_sample_num = 5
+
+    def reset(self):
+        self.limit = 0
+        self.base_latency = 0
+        self.update_times = 0
+
+    def update(self, cr, ri, stats, boundary):
+        cr, ri = self._clamp(cr, ri, boundary)
+        if self.limit == 0:
+            self.limit = cr
+
+        if stats["congested"]:
+            self.limit = max(1, self.limit / 2)
+            if cr == 1:
+                ri = self._increase_interval(ri)
+            return self._clamp(self.limit, ri, boundary)
+
+        latency = stats["latency_p50"]
+        if stats["sample_num"] < self.min_sample_num or latency <= 0:
+            if stats["full_concurrency"] and stats["cpu_idle"]:
+                ri = ri // 2
+            return self._clamp(self.limit, ri, boundary)
+
+        self.update_times += 1
+        if self.update_times % self.probe_interval == 0:
+            self.base_latency = latency
+        elif self.base_latency == 0 or latency < self.base_latency:
+            self.base_latency = latency
+
+        gradient = min(max(self.base_latency / latency, 0.5), 1.0)
+        if gradient < 1.0 and cr == 1:
+            ri = self._increase_interval(ri)
+        elif stats["cpu_idle"]:
+            ri = ri // 2
+
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        if not stats["cpu_idle"]:
+            new_limit = min(new_limit, self.limit)
+        self.limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+        self.limit = min(max(self.limit, 1), boundary["max_concurrent_request"])
+        return self._clamp(self.limit, ri, boundary)
+
+
+_controllers = {
+    StepController.name: StepController,
+    AimdController.name: AimdController,
+    GradientController.name: GradientController
+}
+
+
+def get_controller_names():
+    """
+    获取所有可用的速率控制器名称
+
+    Returns:
+        list, item为str
+    """
+    return list(_controllers.keys())
+
+
+def get_controller(name):
+    """
+    创建指定名称的速率控制器
+
+    Parameters:
+        name - str, 控制器名称
+
+    Returns:
+        RateControllerBase的子类实例
+
+    Raises:
+        exceptions.UnknownRateController - 控制器不存在引发此异常
+    """
+    try:
+        return _controllers[name]()
+    except KeyError:
+        raise exceptions.UnknownRateController
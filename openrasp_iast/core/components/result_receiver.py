@@ -19,9 +19,9 @@ limitations under the License.
 
 import time
 import asyncio
-import collections
 
 from core.components import exceptions
+from core.components import rasp_result
 from core.components.logger import Logger
 from core.components.config import Config
 from core.components.communicator import Communicator
@@ -40,7 +40,9 @@ class RaspResultReceiver(object):
             cls.instance = super(RaspResultReceiver, cls).__new__(cls)
             # 以 request_id 为key ,每个item为一个list，结构为: [获取到result的event, 过期时间, 获取到的结果(未获取前为None)]
             # 例如 {scan_request_id_1: [event_1, expire_time1, result_dict_1] , scan_request_id_2:[event_2, expire_time2, None] ...}
-            cls.instance.rasp_result_collection = collections.OrderedDict()
+            cls.instance.rasp_result_collection = {}
+            # 过期时间轮, 以过期时间的整数秒为key, value为该秒内过期的request_id集合
+            cls.instance.expire_wheel = {}
             cls.instance.timeout = Config().get_config("scanner.request_timeout") * \
                 (Config().get_config("scanner.retry_times") + 1)
         return cls.instance
@@ -52,41 +54,84 @@ class RaspResultReceiver(object):
         Parameters:
             req_id - 结果的scan_request_id
         """
+        self._remove_result(req_id)
         expire_time = time.time() + (self.timeout * 2)
         self.rasp_result_collection[req_id] = [
             asyncio.Event(), expire_time, None]
+        slot = int(expire_time)
+        if slot not in self.expire_wheel:
+            self.expire_wheel[slot] = set()
+        self.expire_wheel[slot].add(req_id)
 
-    def add_result(self, rasp_result):
+    def _remove_result(self, req_id):
         """
-        添加一个RaspResult实例到缓存队列并触发对应的数据到达事件, 同时清空缓存中过期的实例
-        若RaspResult实例的id未通过register_result方法注册，则直接丢弃
+        移除已注册的结果id及其过期时间
 
         Parameters:
-            rasp_result - 待添加的RaspResult实例
+            req_id - 结果的scan_request_id
+
+        Returns:
+            移除的item, 不存在时返回None
         """
-        scan_request_id = rasp_result.get_scan_request_id()
-        try:
-            self.rasp_result_collection[scan_request_id][2] = rasp_result
-            self.rasp_result_collection[scan_request_id][0].set()
-        except KeyError:
+        item = self.rasp_result_collection.pop(req_id, None)
+        if item is not None:
+            slot = int(item[1])
+            bucket = self.expire_wheel.get(slot)
+            if bucket is not None:
+                bucket.discard(req_id)
+                if len(bucket) == 0:
+                    del self.expire_wheel[slot]
+        return item
+
+    def add_result(self, scan_request_id, data, compressed=False):
+        """
+        添加一个扫描请求结果到缓存队列并触发对应的数据到达事件
+        若scan_request_id未通过register_result方法注册，则直接丢弃, 不解析数据
+
+        Parameters:
+            scan_request_id - str, 结果的scan_request_id
+            data - bytes, 已校验的rasp_result json数据
+            compressed - bool, data是否为zlib压缩的数据
+        """
+        item = self.rasp_result_collection.get(scan_request_id)
+        if item is None:
             Communicator().increase_value("dropped_rasp_result")
-            Logger().warning("Drop no registered rasp result data: {}".format(str(rasp_result)))
+            Logger().warning("Drop no registered rasp result data with scan-request-id: {}".format(scan_request_id))
+        else:
+            item[2] = rasp_result.LazyRaspResult(data, compressed)
+            item[0].set()
+
+    def clean_expired(self):
+        """
+        清除缓存中已过期的结果id, 包括注册后未等待和结果未被获取的id
 
+        Returns:
+            int, 清除的数量
+        """
+        current_slot = int(time.time())
+        expired_slots = [slot for slot in self.expire_wheel if slot < current_slot]
+        count = 0
+        for slot in expired_slots:
+            for req_id in self.expire_wheel.pop(slot):
+                self.rasp_result_collection.pop(req_id, None)
+                Logger().debug("Rasp result with id: {} timeout, dropped".format(req_id))
+                count += 1
+        return count
+
+    async def run_reaper(self, interval=1):
+        """
+        定期清除过期结果id的协程
+
+        Parameters:
+            interval - float, 清除间隔(s)
+        """
         while True:
-            try:
-                key = next(iter(self.rasp_result_collection))
-            except StopIteration:
-                break
-            if self.rasp_result_collection[key][1] < time.time():
-                if type(self.rasp_result_collection[key][0]) is not dict:
-                    Logger().debug("Rasp result with id: {} timeout, dropped".format(key))
-                self.rasp_result_collection.popitem(False)
-            else:
-                break
+            await asyncio.sleep(interval)
+            self.clean_expired()
 
     async def wait_result(self, req_id):
         """
-        异步等待一个扫描请求的RaspResult结果
+        异步等待一个扫描请求的RaspResult结果, 获取到结果或超时后移除该结果id
 
         Parameters:
             req_id - str, 等待请求的scan_request_id
@@ -105,19 +150,21 @@ class RaspResultReceiver(object):
             Logger().warning("Try to wait not exist result with request id " + req_id)
             raise exceptions.GetRaspResultFailed
         else:
-            if type(event) == dict:
-                return event
             timeout = expire_time - time.time()
             timeout = timeout if timeout > 0 else 0.01
         try:
             Logger().debug("Start waiting rasp result, id: " + req_id)
             await asyncio.wait_for(event.wait(), timeout=timeout)
         except asyncio.TimeoutError:
+            self._remove_result(req_id)
             Logger().warning("Timeout when wait rasp result, id: " + req_id)
             Communicator().increase_value("rasp_result_timeout")
             raise exceptions.GetRaspResultFailed
+        except asyncio.CancelledError as e:
+            self._remove_result(req_id)
+            raise e
         else:
-            result = self.rasp_result_collection.get(
-                req_id, (None, None, None))[2]
+            result = self._remove_result(req_id)
+            result = None if result is None else result[2]
             Logger().debug("Got rasp result, scan-request-id: {}".format(req_id, str(result)))
             return result
@@ -36,6 +36,7 @@ from core.components.communicator import Communicator
 from core.model.base_model import BaseModel
 from core.model.report_model import ReportModel
 from core.model.config_model import ConfigModel
+from core.model.target_stats_model import TargetStatsModel
 from core.model.new_request_model import NewRequestModel
 
 
@@ -104,6 +105,9 @@ class ScannerManager(object):
         # 记录扫描器id相关信息
         self._scanner_info.set_scanner_info(idle_scanner, pid, host, port)
 
+        # 应用目标配置的速率范围和速率控制器
+        self._config.set_scan_rate(idle_scanner, host_port)
+
     def kill_scanner(self, scanner_id):
         """
         强制结束一个扫描进程进程
@@ -186,6 +190,10 @@ class ScannerManager(object):
                 "dropped_rasp_result": 0, // 收到的无效rasp-agent结果数量
                 "send_request": 0,  // 已发送测试请求
                 "failed_request": 0, // 发生错误的测试请求
+                "latency_p50": 12000, // 最近测试请求响应时间中位数(us)
+                "latency_p95": 30000, // 最近测试请求响应时间95分位数(us)
+                "conn_pool_hit": 0, // 复用已有连接的测试请求
+                "conn_pool_miss": 0, // 新建连接的测试请求
                 "total": 5, // 当前url总数
                 "failed": 1, // 扫描失败的url数量
                 "scanned": 2, // 扫描的url数量
@@ -235,22 +243,18 @@ class ScannerManager(object):
                 info.update(runtime_info)
             result[host_port] = info
 
-        # 获取扫描目标进度信息
-        scan_count_info = BaseModel.get_scan_count(result.keys())
-        for host_port in scan_count_info:
-            result[host_port].update(scan_count_info[host_port])
-
-        # 获取扫描信息上次更新时间
-        scan_time_info = BaseModel.get_last_time(result.keys())
-        for host_port in scan_time_info:
-            result[host_port].update(scan_time_info[host_port])
+        # 获取扫描目标进度信息及上次更新时间
+        stats_model = TargetStatsModel(table_prefix="", use_async=True, create_table=True, multiplexing_conn=True)
+        stats_info = stats_model.get_list(list(result.keys()))
+        for host_port in stats_info:
+            result[host_port].update(stats_info[host_port])
 
         # 转换为列表
         result_list = list(result.values())
 
         return result_list, total_target
 
-    async def get_report(self, host_port, page, perpage):
+    async def get_report(self, host_port, page, perpage, last_id=None):
         """
         获取扫描结果
 
@@ -258,9 +262,10 @@ class ScannerManager(object):
             host_port - str, 获取的目标主机的 host + "_" + str(port) 组成
             page - int, 获取的页码
             perpage - int, 每页条数
+            last_id - int, 上一页最后一条数据的id, 不为None时忽略page参数
 
         Returns:
-            {"total":数据总条数, "data":[ RaspResult的json字符串, ...]}
+            {"total":数据总条数, "data":[ RaspResult的json字符串, ...], "last_id": 最后一条数据的id}
 
         Raises:
             exceptions.DatabaseError - 数据库错误引发此异常
@@ -269,9 +274,9 @@ class ScannerManager(object):
             model = ReportModel(
                 host_port, create_table=False, multiplexing_conn=True)
         except exceptions.TableNotExist:
-            data = {"total": 0, "data": []}
+            data = {"total": 0, "data": [], "last_id": None}
         else:
-            data = await model.get(page, perpage)
+            data = await model.get(page, perpage, last_id)
         return data
 
     def get_auto_start(self):
@@ -300,13 +305,14 @@ class ScannerManager(object):
         else:
             Communicator().set_value("auto_start", 0, "Monitor")
 
-    def get_urls(self, host_port, page=0, status=0):
+    def get_urls(self, host_port, page=0, status=0, last_id=None):
         """
         获取指定状态的的url列表
 
         Parameters:
             page - int, 获取的页数，每页10条
             status - int, url的状态 未扫描：0, 已扫描：1, 正在扫描：2, 扫描中出现错误: 3
+            last_id - int, 上一页最后一条url的id, 不为None时忽略page参数
 
         Returns:
             total, urls - total为数据总数, int类型，urls为已扫描的url, list类型, item形式为tuple (url对应id, url字符串)
@@ -317,7 +323,7 @@ class ScannerManager(object):
         except exceptions.TableNotExist as e:
             raise e
 
-        return model.get_urls(page, status)
+        return model.get_urls(page, status, last_id)
 
     def get_config(self, module_params):
         """
@@ -528,7 +534,8 @@ class ScannerConfig(object):
             "scan_rate": {
                 "max_concurrent_request": Config().get_config("scanner.max_concurrent_request"),
                 "max_request_interval": Config().get_config("scanner.max_request_interval"),
-                "min_request_interval": Config().get_config("scanner.min_request_interval")
+                "min_request_interval": Config().get_config("scanner.min_request_interval"),
+                "rate_controller": Config().get_config("monitor.rate_controller")
             },
             "white_url_reg": "",
             "scan_proxy": "",
@@ -561,7 +568,8 @@ class ScannerConfig(object):
             {
                 "max_concurrent_request": 10,
                 "max_request_interval": 1000,
-                "min_request_interval: 0
+                "min_request_interval: 0,
+                "rate_controller": "step"
             }
 
         Raises:
@@ -577,6 +585,21 @@ class ScannerConfig(object):
         ri_max = boundary["max_request_interval"]
         ri_min = boundary["min_request_interval"]
         scheduler.set_boundary_value(cr_max, ri_max, ri_min)
+        scheduler.set_rate_controller(
+            boundary.get("rate_controller", self._default_config["scan_rate"]["rate_controller"]))
+
+    def set_scan_rate(self, scanner_id, host_port):
+        """
+        将扫描目标配置中的速率范围和速率控制器应用到指定scanner
+
+        Parameters:
+            scanner_id - int, 扫描目标对应的scanner的id
+            host_port - str, 目标主机host_port
+
+        Raises:
+            exceptions.InvalidScannerId - 目标id不存在引发此异常
+        """
+        self._set_boundary_value(scanner_id, self.get_config(host_port)["scan_rate"])
 
     def _incremental_update_config(self, host_port, config):
         """
@@ -604,7 +627,9 @@ class ScannerConfig(object):
 
         if "scan_rate" in config:
             for key in config["scan_rate"]:
-                if config["scan_rate"][key] >= 0:
+                if key == "rate_controller":
+                    origin_config["scan_rate"][key] = config["scan_rate"][key]
+                elif config["scan_rate"][key] >= 0:
                     origin_config["scan_rate"][key] = config["scan_rate"][key]
             if origin_config["scan_rate"]["min_request_interval"] > origin_config["scan_rate"]["max_request_interval"]:
                 origin_config["scan_rate"]["max_request_interval"] = origin_config["scan_rate"]["min_request_interval"]
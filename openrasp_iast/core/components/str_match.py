@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import re
+
+# 单词字符: 字母、数字、下划线以及码位大于0xff的字符, 其余为符号字符
+_word_run_reg = re.compile(r"[a-zA-Z0-9_\u0100-\U0010ffff]+|[^a-zA-Z0-9_\u0100-\U0010ffff]+")
+
+
+def split_word(input_str):
+    """
+    按照单词和符号分割字符串, 连续的单词字符或连续的符号字符为一段, 最后一段长度小于3时丢弃
+
+    Parameters:
+        input_str - str, 待分割字符串
+
+    Returns:
+        list - 分割后的字符串
+    """
+    runs = _word_run_reg.findall(input_str)
+    if len(runs) > 0 and len(runs[-1]) < 3:
+        runs.pop()
+    return runs
+
+
+def get_ngrams(input_str, n):
+    """
+    获取字符串中所有长度为n的子串
+
+    Parameters:
+        input_str - str
+        n - int, 子串长度
+
+    Returns:
+        set, item为str
+    """
+    return {input_str[i:i + n] for i in range(len(input_str) - n + 1)}
+
+
+def has_common_substr(s1, s2, min_len):
+    """
+    判断s1 s2是否存在长度不小于min_len的公共子串, 与 len(common.lcs(s1, s2)) >= min_len 等价
+
+    存在长度不小于min_len的公共子串时, 必然存在长度恰为min_len的公共子串,
+    因此只需以哈希集合比较两个字符串的min_len长子串, 时间复杂度O(len(s1) + len(s2))
+
+    Parameters:
+        s1 - str
+        s2 - str
+        min_len - int, 公共子串的最小长度
+
+    Returns:
+        boolean
+    """
+    if len(s1) < min_len or len(s2) < min_len:
+        return False
+    if len(s1) > len(s2):
+        s1, s2 = s2, s1
+    ngrams = get_ngrams(s1, min_len)
+    for i in range(len(s2) - min_len + 1):
+        if s2[i:i + min_len] in ngrams:
+            return True
+    return False
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import asyncio
+import collections
+
+from core.components import exceptions
+
+
+class TaskBus(object):
+    """
+    扫描任务总线, 按任务包含的hook点类型将扫描任务分发给订阅的扫描插件, 并统计插件确认完成的任务
+    需要在事件循环内初始化
+    """
+
+    def __init__(self):
+        """
+        初始化
+        """
+        # 以订阅者名称为key, value为该订阅者的任务队列
+        self._queues = {}
+        # 路由表, 以hook点类型为key, value为关注该类型的订阅者名称集合
+        self._routes = {}
+        # 未声明hook点类型的订阅者, 接收所有任务
+        self._wildcard = set()
+        # 以任务id为key, value为尚未确认完成该任务的订阅者名称集合
+        self._pending = {}
+        # 按发布顺序排列的未完成任务id
+        self._task_ids = collections.deque()
+        # 已被所有订阅者确认完成的最大连续任务id
+        self._watermark = 0
+        # 已被所有订阅者确认完成的任务数量
+        self._finished_count = 0
+        self._finish_event = asyncio.Event()
+
+    def subscribe(self, name, hook_types=None):
+        """
+        注册一个订阅者
+
+        Parameters:
+            name - str, 订阅者名称
+            hook_types - list/tuple/None, 订阅者关注的hook点类型, 仅接收包含其中任一类型的任务, 为None时接收所有任务
+
+        Returns:
+            asyncio.Queue, 订阅者的任务队列, item为发布的任务
+        """
+        if name not in self._queues:
+            self._queues[name] = asyncio.Queue()
+            if hook_types is None:
+                self._wildcard.add(name)
+            else:
+                for hook_type in hook_types:
+                    self._routes.setdefault(hook_type, set()).add(name)
+        return self._queues[name]
+
+    def _route(self, rasp_result_ins):
+        """
+        获取需要接收任务的订阅者
+
+        Parameters:
+            rasp_result_ins - RaspResult实例
+
+        Returns:
+            set, item为订阅者名称
+        """
+        subscribers = set(self._wildcard)
+        for hook_type in rasp_result_ins.get_hook_types():
+            subscribers.update(self._routes.get(hook_type, ()))
+        return subscribers
+
+    def publish(self, task):
+        """
+        向关注任务所含hook点类型的订阅者发布任务, 任务id需按发布顺序递增
+        没有订阅者关注的任务直接视为完成
+
+        Parameters:
+            task - dict, 格式: {"id": 任务在数据库中的id, "data": RaspResult实例}
+        """
+        task_id = task["id"]
+        subscribers = self._route(task["data"])
+        if len(subscribers) == 0:
+            self._finished_count += 1
+            if len(self._task_ids) == 0:
+                self._watermark = max(self._watermark, task_id)
+            else:
+                # 前序任务尚未完成, 由ack推进水位线
+                self._task_ids.append(task_id)
+            self._finish_event.set()
+            return
+        self._pending[task_id] = subscribers
+        self._task_ids.append(task_id)
+        for name in subscribers:
+            self._queues[name].put_nowait(task)
+
+    def ack(self, name, task_id):
+        """
+        订阅者确认完成一个任务, 所有订阅者均确认后唤醒等待任务完成的协程
+
+        Parameters:
+            name - str, 订阅者名称
+            task_id - int, 完成的任务id
+
+        Raises:
+            exceptions.TaskNotExist - 任务不存在或已被确认
+        """
+        try:
+            subscribers = self._pending[task_id]
+            subscribers.remove(name)
+        except KeyError:
+            raise exceptions.TaskNotExist
+
+        if len(subscribers) > 0:
+            return
+
+        del self._pending[task_id]
+        self._finished_count += 1
+        while len(self._task_ids) > 0 and self._task_ids[0] not in self._pending:
+            self._watermark = self._task_ids.popleft()
+        self._finish_event.set()
+
+    async def wait_finish(self):
+        """
+        等待至少一个任务被所有订阅者确认完成
+        """
+        self._finish_event.clear()
+        await self._finish_event.wait()
+
+    def get_watermark(self):
+        """
+        获取已完成任务的低水位线，小于等于该id的任务均已被所有订阅者确认完成
+
+        Returns:
+            int, 任务id
+        """
+        return self._watermark
+
+    def get_remaining(self):
+        """
+        获取尚未被所有订阅者确认完成的任务数量
+
+        Returns:
+            int
+        """
+        return len(self._pending)
+
+    def get_finished_count(self):
+        """
+        获取已被所有订阅者确认完成的任务数量
+
+        Returns:
+            int
+        """
+        return self._finished_count
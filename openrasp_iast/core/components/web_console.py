@@ -31,6 +31,7 @@ import tornado.httpserver
 
 from core import modules
 from core.components import exceptions
+from core.components import rate_controller
 from core.components.logger import Logger
 from core.components.config import Config
 from core.components.scanner_manager import ScannerManager
@@ -206,6 +207,10 @@ class ApiHandlerBase(tornado.web.RequestHandler):
                     "min_request_interval": {
                         "type": "integer",
                         "minimum": 0
+                    },
+                    "rate_controller": {
+                        "type": "string",
+                        "enum": rate_controller.get_controller_names()
                     }
                 }
             },
@@ -329,7 +334,8 @@ class ScanConfigHandler(ApiHandlerBase):
                 "scan_rate": {
                     "max_concurrent_request": 20,
                     "max_request_interval": 1000,
-                    "min_request_interval": 0
+                    "min_request_interval": 0,
+                    "rate_controller": "step"
                 },
                 "white_url_reg": "^/logout",
                 "scan_proxy": "http://127.0.0.1:8080"
@@ -395,7 +401,8 @@ class GetConfigHandler(ApiHandlerBase):
             "scan_rate": {
                 "max_concurrent_request": 20,
                 "max_request_interval": 1000,
-                "min_request_interval": 0
+                "min_request_interval": 0,
+                "rate_controller": "step"
             }
         }
         """
@@ -527,7 +534,8 @@ class GetUrlInfoHandler(ApiHandlerBase):
             "host":"1.2.3.4",
             "port": 80,
             "page": 1,
-            "status": 0 // 未扫描：0, 已扫描：1, 正在扫描：2, 扫描中出现错误: 3
+            "status": 0, // 未扫描：0, 已扫描：1, 正在扫描：2, 扫描中出现错误: 3
+            "last_id": 23 // 可选, 上一页最后一条url的id, 设置时忽略page
         }
         """
 
@@ -536,7 +544,10 @@ class GetUrlInfoHandler(ApiHandlerBase):
             port = data.get("port", 80)
             page = data.get("page", 1)
             status = int(data["status"])
-        except (KeyError, TypeError):
+            last_id = data.get("last_id", None)
+            if last_id is not None:
+                last_id = int(last_id)
+        except (KeyError, TypeError, ValueError):
             ret = {
                 "status": 1,
                 "description": "请求json格式非法!"
@@ -544,7 +555,7 @@ class GetUrlInfoHandler(ApiHandlerBase):
         else:
             host_port = host + "_" + str(port)
             try:
-                total, urls = await ScannerManager().get_urls(host_port, page, status)
+                total, urls = await ScannerManager().get_urls(host_port, page, status, last_id)
             except exceptions.TableNotExist:
                 ret = {
                     "status": 2,
@@ -605,7 +616,8 @@ class GetReportHandler(ApiHandlerBase):
             "host":"1.2.3.4",
             "port": 80,
             "page": 1,
-            "perpage": 10
+            "perpage": 10,
+            "last_id": 5 // 可选, 上一页最后一条数据的id, 设置时忽略page
         }
         """
         try:
@@ -613,19 +625,22 @@ class GetReportHandler(ApiHandlerBase):
             port = data.get("port", 80)
             page = data["page"]
             perpage = data["perpage"]
-        except (KeyError, TypeError):
+            last_id = data.get("last_id", None)
+            if last_id is not None:
+                last_id = int(last_id)
+        except (KeyError, TypeError, ValueError):
             ret = {
                 "status": 1,
                 "description": "请求json格式非法!"
             }
         else:
             host_port = host + "_" + str(port)
-            data = await ScannerManager().get_report(host_port, page, perpage)
+            data = await ScannerManager().get_report(host_port, page, perpage, last_id)
 
             ret = {
                 "status": 0,
                 "description": "ok",
-                # {"total":123, "data":["json_str_1", "json_str2" ...]}
+                # {"total":123, "data":["json_str_1", "json_str2" ...], "last_id": 5}
                 "data": data
             }
         return ret
@@ -24,6 +24,8 @@ import pymysql
 import peewee_async
 import threading
 
+from playhouse.migrate import MySQLMigrator, migrate
+
 from core.components import exceptions
 from core.components.logger import Logger
 from core.components.config import Config
@@ -33,6 +35,8 @@ from core.components.communicator import Communicator
 class BaseModel(object):
 
     mul_lock = threading.Lock()
+    # 当前进程中已检查过表结构的数据表名
+    migrated_tables = set()
 
     class LongTextField(peewee.TextField):
         """
@@ -40,6 +44,12 @@ class BaseModel(object):
         """
         field_type = 'LONGTEXT'
 
+    class LongBlobField(peewee.BlobField):
+        """
+        支持mysql longblob字段
+        """
+        field_type = 'LONGBLOB'
+
     def __new__(cls, table_prefix=None, use_async=True, create_table=True, multiplexing_conn=False):
         """
         初始化数据库连接，构造peewee model实例
@@ -157,12 +167,54 @@ class BaseModel(object):
         except Exception as e:
             self._handle_exception("Mysql Connection Fail!", e)
 
+        if table_prefix is not None:
+            self._migrate_table()
+
     def _create_model(self, db, table_prefix):
         """
         子类实现此方法，构建对应数据表的peewee.Model类
         """
         raise NotImplementedError
 
+    def _migrate_table(self):
+        """
+        为旧版本创建的数据表添加缺失的列和索引, 每个进程中每张表仅检查一次
+
+        Raises:
+            exceptions.DatabaseError - 数据库出错时引发此异常
+        """
+        table_name = self._model._meta.table_name
+        if table_name in BaseModel.migrated_tables:
+            return
+
+        try:
+            migrator = MySQLMigrator(self.database)
+            operations = []
+
+            columns = [column.name for column in self.database.get_columns(table_name)]
+            for field in self._model._meta.sorted_fields:
+                if field.column_name not in columns:
+                    operations.append(migrator.add_column(table_name, field.column_name, field))
+
+            indexes = [tuple(index.columns) for index in self.database.get_indexes(table_name)]
+            for index_columns, unique in self._model._meta.indexes:
+                if tuple(index_columns) not in indexes:
+                    operations.append(migrator.add_index(table_name, index_columns, unique))
+
+            for operation in operations:
+                try:
+                    migrate(operation)
+                except (peewee.InternalError, peewee.OperationalError) as e:
+                    # 1060: Duplicate column name, 1061: Duplicate key name, 其他进程已完成修改
+                    if e.args[0] not in (1060, 1061):
+                        raise e
+            if len(operations) > 0:
+                Logger().info("Migrate table {} with {} operations.".format(table_name, len(operations)))
+        except Exception as e:
+            self._handle_exception("DB error in method _migrate_table!", e)
+
+        BaseModel.migrated_tables.add(table_name)
+
     def drop_table(self):
         """
         删除当前实例对应的数据库表
@@ -215,128 +267,3 @@ class BaseModel(object):
             msg = "Mysql connection limit exceeded, try to increase max_connections to solve this problem."
         Logger().error(msg, exc_info=e)
         raise exceptions.DatabaseError
-
-    @staticmethod
-    def _creat_conn():
-        """
-        创建mysql连接
-        """
-        if not hasattr(BaseModel, "pymysql_conn") or \
-           time.time() > BaseModel.pymysql_conn_timeout or \
-           not BaseModel.pymysql_conn.open:
-            if hasattr(BaseModel, "pymysql_conn"):
-                try:
-                    BaseModel.pymysql_conn.close()
-                except Exception:
-                    pass
-            BaseModel.pymysql_conn = pymysql.connect(
-                port=Config().config_dict["database.port"],
-                host=Config().config_dict["database.host"],
-                user=Config().config_dict["database.username"],
-                passwd=Config().config_dict["database.password"],
-                database=Config().config_dict["database.db_name"]
-            )
-            BaseModel.pymysql_conn_timeout = time.time() + 60
-
-    @staticmethod
-    def get_scan_count(target_list):
-        """
-        获取扫描进度信息
-
-        Parameters:
-            target_list - list, item为要获取的主机的host_port
-
-        Returns:
-            dict, item形式如下
-            {
-                "targethost.com_8080":{
-                    "total": 10,
-                    "scanned": 3,
-                    "failed": 5,
-                    "last_time": 1571217144
-                },
-                ...
-            }
-
-        Raises:
-            exceptions.DatabaseError - 数据库出错时引发此异常
-        """
-        try:
-            BaseModel._creat_conn()
-            conn = BaseModel.pymysql_conn
-            if len(target_list) == 0:
-                return {}
-
-            result = {}
-            sql = ""
-            for target in target_list:
-                result[target] = {
-                    "total": 0,
-                    "scanned": 0,
-                    "failed": 0
-                }
-                sql += "union all ( SELECT '{target}', scan_status, count(*) FROM `{target}_ResultList` group by scan_status) ".format(target=target)
-            sql = sql[10:]
-            cursor = conn.cursor()
-            cursor._defer_warnings = True
-            cursor.execute(sql)
-            re = cursor.fetchall()
-            conn.commit()
-
-            for item in re:
-                result[item[0]]["total"] += item[2]
-                if item[1] == 1:
-                    result[item[0]]["scanned"] = item[2]
-                elif item[1] == 3:
-                    result[item[0]]["failed"] = item[2]
-
-            return result
-        except Exception as e:
-            BaseModel._handle_exception("DB error in method get_scan_count!", e)
-
-    @staticmethod
-    def get_last_time(target_list):
-        """
-        获取扫描目标最近一条记录的时间戳, 无记录时返回0
-
-        Parameters:
-            target_list - list, item为要获取的主机的host_port
-
-        Returns:
-            dict, item形式如下
-            {
-                "targethost.com_8080":{
-                    "last_time": 1571217144
-                },
-                ...
-            }
-
-        Raises:
-            exceptions.DatabaseError - 数据库出错时引发此异常
-        """
-        try:
-            BaseModel._creat_conn()
-            conn = BaseModel.pymysql_conn
-            if len(target_list) == 0:
-                return {}
-
-            sql = ""
-            result = {}
-            for target in target_list:
-                result[target] = {
-                    "last_time": 0
-                }
-                sql += "union all ( SELECT '{target}', time FROM `{target}_ResultList` order by id desc limit 1) ".format(target=target)
-            sql = sql[10:]
-            cursor = conn.cursor()
-            cursor._defer_warnings = True
-            cursor.execute(sql)
-            re = cursor.fetchall()
-            conn.commit()
-
-            for item in re:
-                result[item[0]]["last_time"] = item[1]
-
-            return result
-        except Exception as e:
-            BaseModel._handle_exception("DB error in method get_last_time!", e)
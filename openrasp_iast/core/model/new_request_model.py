@@ -24,6 +24,7 @@ import asyncio
 import peewee_async
 
 from core.model import base_model
+from core.model.target_stats_model import TargetStatsModel
 from core.components import common
 from core.components import exceptions
 from core.components import rasp_result
@@ -34,26 +35,47 @@ from core.components.communicator import Communicator
 
 class NewRequestModel(base_model.BaseModel):
 
+    # 当前进程中已初始化统计数据的扫描目标
+    stats_initialized = set()
+
     def __init__(self, *args, **kwargs):
         """
         初始化
         """
         super(NewRequestModel, self).__init__(*args, **kwargs)
+        self.compress_data = Config().get_config("database.compress_data")
         self._init_start_id()
+        self._init_target_stats()
 
     def _create_model(self, db, table_prefix):
         """
         创建数据model
         """
+        self.host_port = table_prefix
+        self.host_port_hash = TargetStatsModel.get_host_port_hash(table_prefix)
+        self.TargetStats = TargetStatsModel.build_model(db)
+
         meta_dict = {
             "database": db,
-            "table_name": table_prefix + "_" + "ResultList"
+            "table_name": table_prefix + "_" + "ResultList",
+            # 获取任务、统计及分页查询使用(scan_status, id)索引, 初始化统计数据时获取最近记录时间使用(time)索引
+            "indexes": (
+                (("scan_status", "id"), False),
+                (("time", ), False)
+            )
         }
 
         meta = type("Meta", (object, ), meta_dict)
         model_dict = {
             "id": peewee.AutoField(),
+            # 未压缩存储的请求数据json, 压缩存储时为空字符串
             "data": self.LongTextField(),
+            # zlib压缩存储的请求数据json, 未压缩存储时为NULL
+            "payload": self.LongBlobField(null=True),
+            # 列表展示使用的请求信息, 无需解析请求数据
+            "url": peewee.TextField(null=True),
+            "method": peewee.CharField(null=True, max_length=16),
+            "hook_types": peewee.CharField(null=True, max_length=255),
             # utf8mb4 编码下 1 char = 4 bytes，会导致peewee创建过长的列导致MariaDB产生 1071, Specified key was too long; 错误, max_length不使用255
             "data_hash": peewee.CharField(unique=True, max_length=63),
             # scan_status含义： 未扫描：0, 已扫描：1, 正在扫描：2, 扫描中出现错误: 3
@@ -64,6 +86,121 @@ class NewRequestModel(base_model.BaseModel):
         self.ResultList = type("ResultList", (peewee.Model, ), model_dict)
         return self.ResultList
 
+    def _init_target_stats(self):
+        """
+        初始化扫描目标的统计数据, 统计数据不存在时(旧版本创建的扫描目标)从数据表统计
+
+        Raises:
+            exceptions.DatabaseError - 数据库错误引发此异常
+        """
+        if self.host_port in NewRequestModel.stats_initialized:
+            return
+
+        try:
+            self.database.create_tables([self.TargetStats], safe=True)
+            exists = self.TargetStats.select().where(
+                self.TargetStats.host_port_hash == self.host_port_hash
+            ).exists()
+
+            if not exists:
+                data = {
+                    "host_port_hash": self.host_port_hash,
+                    "host_port": self.host_port,
+                    "total": 0,
+                    "scanned": 0,
+                    "failed": 0
+                }
+                query = self.ResultList.select(
+                    self.ResultList.scan_status,
+                    peewee.fn.COUNT(self.ResultList.id)
+                ).group_by(
+                    self.ResultList.scan_status
+                ).tuples()
+                for scan_status, count in query.execute():
+                    data["total"] += count
+                    if scan_status == 1:
+                        data["scanned"] = count
+                    elif scan_status == 3:
+                        data["failed"] = count
+
+                last_time = self.ResultList.select(peewee.fn.MAX(self.ResultList.time)).scalar()
+                data["last_time"] = 0 if last_time is None else last_time
+                self.TargetStats.insert(**data).on_conflict_ignore().execute()
+        except Exception as e:
+            self._handle_exception("DB error in method _init_target_stats!", e)
+
+        NewRequestModel.stats_initialized.add(self.host_port)
+
+    def _update_stats_query(self, total=0, scanned=0, failed=0, last_time=None):
+        """
+        生成累加扫描目标统计数据的query, 统计数据不存在时插入
+
+        Parameters:
+            total - int, 新增的url数量
+            scanned - int, 新增的已扫描url数量
+            failed - int, 新增的扫描失败url数量
+            last_time - int, 最近一次获取到新url的时间, 为None时不更新
+
+        Returns:
+            peewee insert query
+        """
+        data = {
+            "host_port_hash": self.host_port_hash,
+            "host_port": self.host_port,
+            "total": total,
+            "scanned": scanned,
+            "failed": failed,
+            "last_time": 0 if last_time is None else last_time
+        }
+        update = {
+            self.TargetStats.total: self.TargetStats.total + total,
+            self.TargetStats.scanned: self.TargetStats.scanned + scanned,
+            self.TargetStats.failed: self.TargetStats.failed + failed
+        }
+        if last_time is not None:
+            update[self.TargetStats.last_time] = last_time
+        return self.TargetStats.insert(**data).on_conflict(update=update)
+
+    def _get_row_data(self, rasp_result_ins):
+        """
+        生成rasp_result_ins对应的数据行
+
+        Parameters:
+            rasp_result_ins - RaspResult实例
+
+        Returns:
+            dict, key为列名
+        """
+        data = {
+            "data": "",
+            "payload": None,
+            "data_hash": rasp_result_ins.get_hash(),
+            "url": rasp_result_ins.get_url(),
+            "method": rasp_result_ins.get_method(),
+            "hook_types": ",".join(rasp_result_ins.get_hook_types())
+        }
+        if self.compress_data:
+            data["payload"] = rasp_result_ins.dump_compressed()
+        else:
+            data["data"] = rasp_result_ins.dump()
+        return data
+
+    @staticmethod
+    def _load_rasp_result(line):
+        """
+        从数据行构造延迟解析的RaspResult实例
+
+        Parameters:
+            line - ResultList实例
+
+        Returns:
+            rasp_result.LazyRaspResult实例
+        """
+        if line.payload is not None:
+            return rasp_result.LazyRaspResult(line.payload, compressed=True)
+        else:
+            return rasp_result.LazyRaspResult(line.data)
+
     def _init_start_id(self):
         """
         初始化start_id为未扫描的最小id，未扫描时，值为0
@@ -91,8 +228,18 @@ class NewRequestModel(base_model.BaseModel):
             exceptions.DatabaseError - 数据库错误引发此异常
         """
         try:
-            self.ResultList.update(scan_status=0).where(
-                self.ResultList.scan_status > 1).execute()
+            with self.database.atomic():
+                # 失败的记录重置后将重新扫描, 从统计数据中扣除
+                failed_count = self.ResultList.select().where(
+                    self.ResultList.scan_status == 3).count()
+                self.ResultList.update(scan_status=0).where(
+                    self.ResultList.scan_status > 1).execute()
+                if failed_count > 0:
+                    self.TargetStats.update({
+                        self.TargetStats.failed: self.TargetStats.failed - failed_count
+                    }).where(
+                        self.TargetStats.host_port_hash == self.host_port_hash
+                    ).execute()
         except Exception as e:
             Logger().critical("DB error in method reset_unscanned_item!", exc_info=e)
 
@@ -116,11 +263,10 @@ class NewRequestModel(base_model.BaseModel):
             exceptions.DatabaseError - 数据库错误引发此异常
         """
         try:
-            data = {
-                "data": rasp_result_ins.dump(),
-                "data_hash": rasp_result_ins.get_hash()
-            }
-            await peewee_async.create_object(self.ResultList, **data)
+            data = self._get_row_data(rasp_result_ins)
+            async with self.database.atomic_async():
+                await peewee_async.create_object(self.ResultList, **data)
+                await peewee_async.execute(self._update_stats_query(total=1, last_time=common.get_timestamp()))
         except peewee.IntegrityError as e:
             return False
         except asyncio.CancelledError as e:
@@ -130,9 +276,92 @@ class NewRequestModel(base_model.BaseModel):
         else:
             return True
 
+    async def put_batch(self, rasp_result_list):
+        """
+        将多个rasp_result_ins序列化, 使用一条 INSERT IGNORE 语句批量插入数据表
+
+        Parameters:
+            rasp_result_list - list, item为RaspResult实例
+
+        Returns:
+            list, 与rasp_result_list一一对应, item为boolean, 插入成功为True, 重复(包括插入时被忽略的)为False
+
+        Raises:
+            exceptions.DatabaseError - 数据库错误引发此异常
+        """
+        result = [False] * len(rasp_result_list)
+        rows = {}
+        for index, rasp_result_ins in enumerate(rasp_result_list):
+            data_hash = rasp_result_ins.get_hash()
+            # 同一批次中hash重复的请求仅保留第一条
+            if data_hash not in rows:
+                rows[data_hash] = (index, rasp_result_ins)
+
+        if len(rows) == 0:
+            return result
+
+        try:
+            # 查询已存在的hash, 用于区分新请求和重复请求
+            query = self.ResultList.select(self.ResultList.data_hash).where(
+                self.ResultList.data_hash << list(rows.keys())
+            )
+            exist_data = await peewee_async.execute(query)
+            for line in exist_data:
+                rows.pop(line.data_hash, None)
+
+            if len(rows) == 0:
+                return result
+
+            insert_data = [self._get_row_data(rasp_result_ins) for index, rasp_result_ins in rows.values()]
+
+            query = self.ResultList.insert_many(insert_data).on_conflict_ignore()
+            async with self.database.atomic_async():
+                inserted_count, first_id = await self._execute_insert(query)
+                if inserted_count == len(insert_data):
+                    inserted_hashes = rows.keys()
+                elif inserted_count == 0:
+                    inserted_hashes = ()
+                else:
+                    # 查询与插入之间其他进程可能已插入相同hash的数据, 被忽略的行id小于本次插入的第一个id
+                    query = self.ResultList.select(self.ResultList.data_hash).where(
+                        (self.ResultList.data_hash << list(rows.keys())) & (
+                            self.ResultList.id >= first_id)
+                    )
+                    inserted_hashes = [line.data_hash for line in await peewee_async.execute(query)]
+                if inserted_count > 0:
+                    await peewee_async.execute(
+                        self._update_stats_query(total=inserted_count, last_time=common.get_timestamp()))
+
+            for data_hash in inserted_hashes:
+                result[rows[data_hash][0]] = True
+        except asyncio.CancelledError as e:
+            raise e
+        except Exception as e:
+            self._handle_exception("DB error in method put_batch!", e)
+        return result
+
+    async def _execute_insert(self, query):
+        """
+        执行insert query, 获取实际插入的行数
+
+        Parameters:
+            query - peewee insert query
+
+        Returns:
+            int, int - 实际插入的行数(INSERT IGNORE忽略的行不计入), 本次插入的第一行的id
+        """
+        cursor = await self.database.cursor_async()
+        try:
+            await cursor.execute(*query.sql())
+            return cursor.rowcount, cursor.lastrowid
+        finally:
+            await cursor.release()
+
     async def get_new_scan(self, count=1):
         """
-        获取多条未扫描的请求数据
+        获取多条未扫描的请求数据, 并将其标记为扫描中
+
+        每个扫描目标仅由一个扫描进程获取任务, 因此先按id顺序查询未扫描记录, 再按主键批量标记, 两次查询即可完成获取
 
         Parameters:
             count - 最大获取条数，默认为1
@@ -145,44 +374,32 @@ class NewRequestModel(base_model.BaseModel):
         """
         result = []
         try:
-            # 获取未扫描的最小id
-            query = self.ResultList.select(peewee.fn.MIN(self.ResultList.id)).where((
+            # 获取未扫描的记录
+            query = self.ResultList.select().where((
                 self.ResultList.id > self.start_id) & (
                 self.ResultList.scan_status == 0)
-            )
-            fetch_star_id = await peewee_async.scalar(query)
-            if fetch_star_id is None:
-                return []
-
-            # 将要获取的记录标记为扫描中
-            query = self.ResultList.update(
-                {self.ResultList.scan_status: 2}
-            ).where((
-                self.ResultList.scan_status == 0) & (
-                self.ResultList.id > self.start_id)
             ).order_by(
                 self.ResultList.id
             ).limit(count)
 
-            row_count = await peewee_async.execute(query)
-            if (row_count == 0):
-                return result
-
-            # 获取标记的记录
-            query = self.ResultList.select().where((
-                self.ResultList.id >= fetch_star_id) & (
-                self.ResultList.scan_status == 2)
-            ).order_by(
-                self.ResultList.id
-            ).limit(row_count)
-
             data = await peewee_async.execute(query)
-
+            id_list = []
             for line in data:
+                id_list.append(line.id)
                 result.append({
                     "id": line.id,
-                    "data": rasp_result.RaspResult(line.data)
+                    "data": self._load_rasp_result(line)
                 })
+            if len(id_list) == 0:
+                return result
+
+            # 将获取的记录标记为扫描中
+            query = self.ResultList.update(
+                {self.ResultList.scan_status: 2}
+            ).where(
+                self.ResultList.id << id_list
+            )
+            await peewee_async.execute(query)
             return result
 
         except asyncio.CancelledError as e:
@@ -195,124 +412,52 @@ class NewRequestModel(base_model.BaseModel):
         将id 小于等于 last_id的result标记为已扫描，更新star_id, 将failed_list中的id标记为失败
 
         Parameters:
-            last_id - 已扫描的最大id
+            last_id - 已扫描的最大id, 小于等于该id的任务均已扫描完成
             failed_list - 扫描中出现连接失败的url
 
         Raises:
             exceptions.DatabaseError - 数据库错误引发此异常
         """
         if last_id > self.start_id:
-            try:
+            if len(failed_list) > 0:
+                scan_status = peewee.Case(None, [(self.ResultList.id << failed_list, 3)], 1)
+            else:
+                scan_status = 1
 
-                # 标记失败的扫描记录
-                query = self.ResultList.update({self.ResultList.scan_status: 3}).where((
-                    self.ResultList.id <= last_id) & (
-                    self.ResultList.id > self.start_id) & (
-                    self.ResultList.id << failed_list)
-                )
-                await peewee_async.execute(query)
+            # 失败的任务均为扫描中的记录, 与已扫描记录一同更新
+            failed_count = 0
+            for task_id in failed_list:
+                if self.start_id < task_id <= last_id:
+                    failed_count += 1
 
-                # 标记已扫描的记录
-                query = self.ResultList.update({self.ResultList.scan_status: 1}).where((
+            try:
+                # 标记已扫描和失败的扫描记录, 并更新统计数据
+                query = self.ResultList.update({self.ResultList.scan_status: scan_status}).where((
                     self.ResultList.id <= last_id) & (
                     self.ResultList.id > self.start_id) & (
                     self.ResultList.scan_status == 2)
                 )
-                await peewee_async.execute(query)
-
-                # 更新start_id
-                query = self.ResultList.select(peewee.fn.MAX(self.ResultList.id)).where((
-                    self.ResultList.id > self.start_id) & (
-                    self.ResultList.scan_status == 1)
-                )
-
-                result = await peewee_async.scalar(query)
+                async with self.database.atomic_async():
+                    row_count = await peewee_async.execute(query)
+                    if row_count > 0:
+                        failed_count = min(failed_count, row_count)
+                        await peewee_async.execute(self._update_stats_query(
+                            scanned=row_count - failed_count, failed=failed_count))
             except asyncio.CancelledError as e:
                 raise e
             except Exception as e:
                 self._handle_exception("DB error in method mark_result!", e)
 
-            if result is not None:
-                self.start_id = result
-
-    async def get_scan_count(self):
-        """
-        获取扫描进度
-
-        Returns:
-            total, count 均为int类型，total为数据总数，count为已扫描条数
+            self.start_id = last_id
 
-        Raises:
-            exceptions.DatabaseError - 数据库错误引发此异常
-        """
-        try:
-            query = self.ResultList.select(
-                peewee.fn.COUNT(self.ResultList.id)).where(
-                self.ResultList.scan_status == 1)
-
-            result = await peewee_async.scalar(query)
-            if result is None:
-                scanned = 0
-            else:
-                scanned = result
-
-            query = self.ResultList.select(
-                peewee.fn.COUNT(self.ResultList.id)).where(
-                self.ResultList.scan_status == 3)
-
-            result = await peewee_async.scalar(query)
-            if result is None:
-                failed = 0
-            else:
-                failed = result
-
-            query = self.ResultList.select(
-                peewee.fn.COUNT(self.ResultList.id))
-
-            result = await peewee_async.scalar(query)
-            if result is None:
-                total = 0
-            else:
-                total = result
-        except asyncio.CancelledError as e:
-            raise e
-        except Exception as e:
-            self._handle_exception("DB error in method get_scan_count!", e)
-
-        return total, scanned, failed
-
-    async def get_last_time(self):
-        """
-        获取最近一条记录的时间戳, 无记录时返回0
-
-        Returns:
-            int, 时间戳
-
-        Raises:
-            exceptions.DatabaseError - 数据库错误引发此异常
-        """
-        query = self.ResultList.select().order_by(self.ResultList.time.desc()).limit(1)
-
-        try:
-            result = await peewee_async.execute(query)
-            data = await peewee_async.execute(query)
-        except asyncio.CancelledError as e:
-            raise e
-        except Exception as e:
-            self._handle_exception("DB error in method get_last_time!", e)
-
-        if len(data) == 0:
-            return 0
-        else:
-            return data[0].time
-
-    async def get_urls(self, page=1, status=0):
+    async def get_urls(self, page=1, status=0, last_id=None):
         """
         获取指定状态的的url列表
 
         Parameters:
             page - int, 获取的页数，每页10条
             status - int, url的状态 未扫描：0, 已扫描：1, 正在扫描：2, 扫描中出现错误: 3
+            last_id - int, 上一页最后一条url的id, 不为None时获取id大于last_id的10条url, 忽略page参数
 
         Returns:
             total, urls - total为数据总数, int类型，urls为已扫描的url, list类型, item形式为tuple (url对应id, url字符串)
@@ -333,20 +478,42 @@ class NewRequestModel(base_model.BaseModel):
             else:
                 total = result
 
-            query = self.ResultList.select().where(
-                self.ResultList.scan_status == status
+            # 仅查询列表使用的列, 不读取data列
+            query = self.ResultList.select(
+                self.ResultList.id, self.ResultList.url, self.ResultList.method
             ).order_by(
                 self.ResultList.id
-            ).offset((page - 1) * 10).limit(10)
+            ).limit(10)
+            if last_id is None:
+                query = query.where(
+                    self.ResultList.scan_status == status
+                ).offset((page - 1) * 10)
+            else:
+                query = query.where((
+                    self.ResultList.scan_status == status) & (
+                    self.ResultList.id > last_id)
+                )
 
             data = await peewee_async.execute(query)
-            urls = []
 
+            # 旧版本写入的数据url列为空, 仅对这些记录查询data列并解析获取url
+            legacy_ids = [line.id for line in data if line.url is None]
+            legacy_urls = {}
+            if len(legacy_ids) > 0:
+                query = self.ResultList.select(
+                    self.ResultList.id, self.ResultList.data
+                ).where(
+                    self.ResultList.id << legacy_ids
+                )
+                for line in await peewee_async.execute(query):
+                    legacy_urls[line.id] = rasp_result.RaspResult(line.data, validate=False).get_url()
+
+            urls = []
             for line in data:
-                url_id = line.id
-                rasp_result_ins = rasp_result.RaspResult(line.data)
-                url = rasp_result_ins.get_url()
-                urls.append((url_id, url))
+                url = line.url
+                if url is None:
+                    url = legacy_urls.get(line.id)
+                urls.append((line.id, url))
             return total, urls
 
         except asyncio.CancelledError as e:
@@ -354,9 +521,38 @@ class NewRequestModel(base_model.BaseModel):
         except Exception as e:
             self._handle_exception("DB error in method get_urls!", e)
 
+    def truncate_table(self):
+        """
+        清空表时重置统计数据
+
+        Raises:
+            exceptions.DatabaseError - 数据库出错时引发此异常
+        """
+        super().truncate_table()
+        try:
+            self.TargetStats.update({
+                self.TargetStats.total: 0,
+                self.TargetStats.scanned: 0,
+                self.TargetStats.failed: 0
+            }).where(
+                self.TargetStats.host_port_hash == self.host_port_hash
+            ).execute()
+        except Exception as e:
+            self._handle_exception("DB error in method truncate_table!", e)
+
     def drop_table(self):
         """
-        删除表时更新表状态
+        删除表时更新表状态, 删除统计数据
+
+        Raises:
+            exceptions.DatabaseError - 数据库出错时引发此异常
         """
         super().drop_table()
+        try:
+            self.TargetStats.delete().where(
+                self.TargetStats.host_port_hash == self.host_port_hash
+            ).execute()
+        except Exception as e:
+            self._handle_exception("DB error in method drop_table!", e)
+        NewRequestModel.stats_initialized.discard(self.host_port)
         Communicator().update_target_list_status()
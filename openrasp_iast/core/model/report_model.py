@@ -45,7 +45,11 @@ class ReportModel(base_model.BaseModel):
         """
         meta_dict = {
             "database": db,
-            "table_name": table_prefix + "_" + "Report"
+            "table_name": table_prefix + "_" + "Report",
+            # 获取待上传报警使用(upload, id)索引
+            "indexes": (
+                (("upload", "id"), False),
+            )
         }
         meta = type("Meta", (object, ), meta_dict)
         model_dict = {
@@ -100,16 +104,17 @@ class ReportModel(base_model.BaseModel):
         else:
             return True
 
-    async def get(self, page=1, perpage=10):
+    async def get(self, page=1, perpage=10, last_id=None):
         """
         获取数据
 
         Parameters:
             page - int, 获取的页码
             perpage - int, 每页的数据条数
+            last_id - int, 上一页最后一条数据的id, 不为None时获取id大于last_id的数据, 忽略page参数
 
         Returns:
-            {"total":数据总条数, "data":[ RaspResult组成的list的json字符串, ...]}
+            {"total":数据总条数, "data":[ RaspResult组成的list的json字符串, ...], "last_id": 最后一条数据的id, 无数据时为None}
 
         Raises:
             exceptions.DatabaseError - 数据库错误引发此异常
@@ -121,12 +126,18 @@ class ReportModel(base_model.BaseModel):
         result = {}
 
         try:
-            query = self.Report.select().offset((page - 1) * perpage).limit(perpage)
+            query = self.Report.select().order_by(self.Report.id).limit(perpage)
+            if last_id is None:
+                query = query.offset((page - 1) * perpage)
+            else:
+                query = query.where(self.Report.id > last_id)
             data = await peewee_async.execute(query)
             result["total"] = len(data)
             result["data"] = []
+            result["last_id"] = None
             for line in data:
                 result["data"].append(line.rasp_result_list)
+                result["last_id"] = line.id
             return result
 
         except asyncio.CancelledError as e:
@@ -160,7 +171,11 @@ class ReportModel(base_model.BaseModel):
         result = []
 
         try:
-            query = self.Report.select().where(self.Report.upload != 1).limit(count)
+            query = self.Report.select().where(
+                self.Report.upload == 0
+            ).order_by(
+                self.Report.id
+            ).limit(count)
             data = query.execute()
 
             for line in data:
@@ -193,8 +208,12 @@ class ReportModel(base_model.BaseModel):
             count = 20
 
         try:
+            # 与get_upload_report使用相同的(upload, id)顺序, 保证标记的是已获取的数据
             query = self.Report.update({self.Report.upload: 1}).where(
-                self.Report.upload != 1).limit(count)
+                self.Report.upload == 0
+            ).order_by(
+                self.Report.id
+            ).limit(count)
             query.execute()
 
         except Exception as e:
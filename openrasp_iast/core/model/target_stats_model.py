@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import peewee
+import hashlib
+
+from core.model import base_model
+
+
+class TargetStatsModel(base_model.BaseModel):
+    """
+    扫描目标的url统计数据, 由NewRequestModel在写入和标记url时更新
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        初始化
+        """
+        super(TargetStatsModel, self).__init__(*args, **kwargs)
+
+    def _create_model(self, db, table_prefix):
+        """
+        创建数据model
+        """
+        self.TargetStats = self.build_model(db)
+        return self.TargetStats
+
+    @staticmethod
+    def build_model(db):
+        """
+        构建绑定到指定数据库连接的TargetStats peewee.Model类
+
+        Parameters:
+            db - peewee数据库实例
+
+        Returns:
+            peewee.Model的子类
+        """
+        meta_dict = {
+            "database": db,
+            "table_name": "TargetStats"
+        }
+        meta = type("Meta", (object, ), meta_dict)
+        model_dict = {
+            "host_port_hash": peewee.CharField(primary_key=True, max_length=63),
+            "host_port": peewee.TextField(),
+            "total": peewee.IntegerField(default=0),
+            "scanned": peewee.IntegerField(default=0),
+            "failed": peewee.IntegerField(default=0),
+            "last_time": peewee.IntegerField(default=0),
+            "Meta": meta
+        }
+        return type("TargetStats", (peewee.Model, ), model_dict)
+
+    @staticmethod
+    def get_host_port_hash(host_port):
+        """
+        获取host_port对应的主键
+
+        Parameters:
+            host_port - str, 扫描目标的 host + "_" + str(port)
+
+        Returns:
+            str
+        """
+        return hashlib.md5(host_port.encode("utf-8")).hexdigest()
+
+    def get_list(self, host_port_list):
+        """
+        获取指定主机列表的统计数据
+
+        Parameters:
+            host_port_list - list, item为目标主机的host_port格式的str
+
+        Returns:
+            dict, host_port为key, 不存在统计数据的主机各项均为0, 格式如下
+            {
+                "targethost.com_8080":{
+                    "total": 10,
+                    "scanned": 3,
+                    "failed": 5,
+                    "last_time": 1571217144
+                },
+                ...
+            }
+
+        Raises:
+            exceptions.DatabaseError - 数据库错误引发此异常
+        """
+        result = {}
+        for host_port in host_port_list:
+            result[host_port] = {
+                "total": 0,
+                "scanned": 0,
+                "failed": 0,
+                "last_time": 0
+            }
+        if len(result) == 0:
+            return result
+
+        hash_list = [self.get_host_port_hash(host_port) for host_port in result]
+        try:
+            data = self.TargetStats.select().where(
+                self.TargetStats.host_port_hash << hash_list
+            ).execute()
+
+            for item in data:
+                result[item.host_port] = {
+                    "total": item.total,
+                    "scanned": item.scanned,
+                    "failed": item.failed,
+                    "last_time": item.last_time
+                }
+            return result
+
+        except Exception as e:
+            self._handle_exception("DB error in method get_list!", e)
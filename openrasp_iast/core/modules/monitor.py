@@ -26,6 +26,7 @@ import threading
 
 from core.modules import base
 from core.components import common
+from core.components import rate_controller
 from core.components.logger import Logger
 from core.components.config import Config
 from core.components.cloud_api import CloudApi
@@ -45,13 +46,11 @@ class ScannerScheduler(object):
         self.module_name = module_name
         self.lock = threading.Lock()
 
-        self.cr_maintain_times = 0
-        self.cr_maintain_times_amplitude = 5
-        self.last_schedule_decrease = False
-        self.max_performance = False
         self.cr_max = Config().get_config("scanner.max_concurrent_request")
         self.ri_max = Config().get_config("scanner.max_request_interval")
         self.ri_min = Config().get_config("scanner.min_request_interval")
+        self.controller = rate_controller.get_controller(Config().get_config("monitor.rate_controller"))
+        self.scanner_pid = 0
 
         self.rrt_last = 0
         self.fr_last = 0
@@ -59,16 +58,29 @@ class ScannerScheduler(object):
 
     def do_schedule(self):
         """
-        出现失败的扫描请求或cpu使用率过高会降低扫描速度
+        依据请求失败、cpu使用率和目标响应延迟, 由速率控制器调整扫描速度
         """
-        if self._get_runtime_value("pid") == 0:
+        pid = self._get_runtime_value("pid")
+        if pid == 0:
             return
 
+        with self.lock:
+            if pid != self.scanner_pid:
+                # 扫描进程变化, 之前目标的延迟数据不再适用
+                self.scanner_pid = pid
+                self.controller.reset()
+
         cpu_overused, cpu_idle = self._is_cpu_overused()
-        if self._is_fail_increasing() or cpu_overused:
-            self._schedule_cr(decrease=True)
-        elif self._is_full_concurrency() and cpu_idle:
-            self._schedule_cr(decrease=False)
+        sample_num, full_concurrency = self._get_send_stats()
+        stats = {
+            "congested": self._is_fail_increasing() or cpu_overused,
+            "cpu_idle": cpu_idle,
+            "full_concurrency": full_concurrency,
+            "sample_num": sample_num,
+            "latency_p50": self._get_runtime_value("latency_p50"),
+            "latency_p95": self._get_runtime_value("latency_p95")
+        }
+        self._schedule_cr(stats)
 
     def get_boundary_value(self):
         """
@@ -94,6 +106,20 @@ class ScannerScheduler(object):
             self.ri_max = ri_max if ri_max < 100000 and ri_max > 0 else 1000
             self.ri_min = ri_min if ri_min >= 0 and ri_min < ri_max else 0
 
+    def set_rate_controller(self, name):
+        """
+        配置使用的速率控制器, 与当前控制器相同时保留其状态
+
+        Parameters:
+            name - str, 控制器名称, 可选值见rate_controller.get_controller_names
+
+        Raises:
+            exceptions.UnknownRateController - 控制器不存在引发此异常
+        """
+        with self.lock:
+            if self.controller.name != name:
+                self.controller = rate_controller.get_controller(name)
+
     def _is_cpu_overused(self):
         """
         判断cpu是否负载过高
@@ -140,12 +166,12 @@ class ScannerScheduler(object):
         else:
             return False
 
-    def _is_full_concurrency(self):
+    def _get_send_stats(self):
         """
-        判断当前并发速率是否已达到最大
+        获取自上次调用本函数的时间段内发送的请求数, 并判断当前并发速率是否已达到最大
 
         Returns:
-            boolean
+            int, boolean - 发送的请求数, 是否已达到最大并发速率
         """
         si = Config().get_config("monitor.schedule_interval")
         sr = self._get_runtime_value("send_request")
@@ -155,79 +181,32 @@ class ScannerScheduler(object):
         self.sr_last = sr
         if ri < 1000:
             ri = 1000
-        if request_send / si * ri / 1000 >= max_cr:
-            return True
-        else:
-            return False
+        return request_send, request_send / si * ri / 1000 >= max_cr
 
-    def _schedule_cr(self, decrease=False):
+    def _schedule_cr(self, stats):
         """
         执行调度
 
         Parameters:
-            decrease - boolean, 为True时执行减少并发，False时执行增加并发
+            stats - dict, 本周期的统计数据, 格式见rate_controller.RateControllerBase
 
         """
-        if not decrease and self.max_performance:
-            return
         cr = Communicator().get_value("max_concurrent_request", self.module_name)
         ri = Communicator().get_value("request_interval", self.module_name)
         with self.lock:
-            if cr > self.cr_max:
-                cr = self.cr_max
-            if ri > self.ri_max or ri < self.ri_min:
-                ri = self.ri_min
-
-            if decrease:
-                self.max_performance = False
-                if self.last_schedule_decrease:
-                    self.cr_maintain_times_amplitude += 1
-                else:
-                    self.last_schedule_decrease = True
-                    self.cr_maintain_times_amplitude = 2
-
-                self.cr_maintain_times += self.cr_maintain_times_amplitude
-                if self.cr_maintain_times > 100:
-                    self.cr_maintain_times = 100
-
-                if ri < 128 and self.ri_max >= 128:
-                    if ri == 0:
-                        ri = 16
-                    else:
-                        ri *= 2
-                elif cr > 1:
-                    cr -= 1
-                else:
-                    ri += int((self.ri_max - self.ri_min) / 10)
-
-                if ri > self.ri_max:
-                    ri = self.ri_max
-
-            else:
-                self.last_schedule_decrease = False
-                if self.cr_maintain_times > 0:
-                    self.cr_maintain_times -= 1
-                    return
-                else:
-                    if ri > 128:
-                        ri -= int((self.ri_max - self.ri_min) / 10)
-                        if ri < 128:
-                            ri = 128
-                    elif cr < self.cr_max:
-                        cr += 1
-                    else:
-                        ri /= 2
-                        ri = int(ri)
-
-                    if ri <= self.ri_min:
-                        ri = self.ri_min
-                        if cr == self.cr_max:
-                            self.max_performance = True
-
-        Communicator().set_value("max_concurrent_request", cr, self.module_name)
-        Communicator().set_value("request_interval", ri, self.module_name)
-        Logger().debug("[{}]max_concurrent_request is set to {}, request_interval is set to {}ms".format(
-            self.module_name, str(cr), str(ri)))
+            boundary = {
+                "max_concurrent_request": self.cr_max,
+                "max_request_interval": self.ri_max,
+                "min_request_interval": self.ri_min
+            }
+            new_cr, new_ri = self.controller.update(cr, ri, stats, boundary)
+
+        if new_cr == cr and new_ri == ri:
+            return
+        Communicator().set_value("max_concurrent_request", new_cr, self.module_name)
+        Communicator().set_value("request_interval", new_ri, self.module_name)
+        Logger().debug("[{}]max_concurrent_request is set to {}, request_interval is set to {}ms ({} controller)".format(
+            self.module_name, str(new_cr), str(new_ri), self.controller.name))
 
 
 class Monitor(base.BaseModule):
@@ -18,11 +18,11 @@ limitations under the License.
 """
 
 import os
-import lru
 import sys
 import zlib
 import time
 import asyncio
+import hashlib
 import logging
 import aiohttp
 import tornado.web
@@ -56,8 +56,12 @@ class Preprocessor(base.BaseModule):
         except Exception as e:
             Logger().warning("Dedupulicate plugin {} init fail!".format(plugin_name), exc_info=e)
 
-        self.dedup_lru = DedupLru(Config().get_config("preprocessor.request_lru_size"))
-        self.new_request_storage = ResultStorage(self.dedup_lru)
+        # 去重LRU存储于共享内存，需要在http server进程fork前初始化
+        self.dedup_lru = DedupLru(
+            Config().get_config("preprocessor.request_lru_size"),
+            Config().get_config("preprocessor.request_lru_target_num")
+        )
+        self.new_request_storage = ResultStorage()
         self.app = tornado.web.Application([
             tornado.web.url(
                 Config().get_config("preprocessor.api_path"),
@@ -139,7 +143,11 @@ class jsonHandler(tornado.web.RequestHandler):
             rasp_result_ins = rasp_result.RaspResult(data)
             Logger().info("Received request data: " + str(rasp_result_ins))
             if rasp_result_ins.is_scan_result():
-                self.send_data(rasp_result_ins)
+                # 压缩传输的数据直接转发原始body, 由扫描进程按需解压
+                if content_encoding == "deflate":
+                    self.send_data(rasp_result_ins, self.request.body, True)
+                else:
+                    self.send_data(rasp_result_ins, data, False)
             else:
                 await self.dedup_data(rasp_result_ins)
             self.write('{"status": 0, "msg":"ok"}\n')
@@ -194,19 +202,27 @@ class jsonHandler(tornado.web.RequestHandler):
                             rasp_result_ins.get_request_id()))
                         Communicator().increase_value("duplicate_request")
 
-    def send_data(self, rasp_result_ins):
+    def send_data(self, rasp_result_ins, raw_data, compressed):
         """
-        向rasp_result_queue发送RaspResult实例
+        向rasp_result_queue发送扫描请求的原始json数据, 以scan_request_id作为key
 
         Parameters:
-            rasp_result_ins - 待发送的RaspResult实例
+            rasp_result_ins - 待发送数据对应的RaspResult实例
+            raw_data - bytes, 已校验的原始json数据
+            compressed - bool, raw_data是否为zlib压缩的数据
         """
         queue_name = "rasp_result_queue_" + \
             str(rasp_result_ins.get_result_queue_id())
         Logger().info("Send scan request data with id:{} to queue:{}".format(
             rasp_result_ins.get_request_id(), queue_name))
-        Communicator().send_data(queue_name, rasp_result_ins)
-        Communicator().increase_value("rasp_result_request")
+        try:
+            # flag为1表示数据经过zlib压缩
+            Communicator().send_data(queue_name, rasp_result_ins.get_scan_request_id(), raw_data, int(compressed))
+        except exceptions.QueueFull:
+            Logger().warning("Queue {} is full, drop scan request data with id:{}".format(
+                queue_name, rasp_result_ins.get_request_id()))
+        else:
+            Communicator().increase_value("rasp_result_request")
 
     def update_setting(self):
         """
@@ -222,12 +238,17 @@ class jsonHandler(tornado.web.RequestHandler):
 
 class ResultStorage(object):
 
-    def __init__(self, dedup_lru):
+    def __init__(self):
         """
         初始化
         """
         self.models = {}
-        self.dedup_lru = dedup_lru
+        # 以 host_port 为key, 每个item为一个list, 结构为: [(RaspResult实例, 等待写入结果的future), ...]
+        self.write_buffers = {}
+        # 以 host_port 为key, 每个item为到达时间阈值后触发写入的定时器
+        self.flush_handles = {}
+        self.batch_size = Config().get_config("preprocessor.batch_size")
+        self.batch_interval = Config().get_config("preprocessor.batch_interval")
 
     def _get_model(self, host_port):
         """
@@ -249,7 +270,6 @@ class ResultStorage(object):
 
             for host_port_item in del_host:
                 del self.models[host_port_item]
-                self.dedup_lru.clean_lru(host_port_item)
 
             self.models[host_port] = [
                 new_request_model.NewRequestModel(host_port, multiplexing_conn=False),
@@ -260,7 +280,7 @@ class ResultStorage(object):
 
     def reset(self, host_port):
         """
-        清除缓存的NewRequestModel实例
+        清除缓存的NewRequestModel实例, 丢弃写入缓冲区中尚未写入的数据
 
         Parameters:
             host_port - host + "_" + str(port) 组成的字符串, 指定清除的实例的表名
@@ -268,29 +288,186 @@ class ResultStorage(object):
         if host_port in self.models:
             del self.models[host_port]
 
+        handle = self.flush_handles.pop(host_port, None)
+        if handle is not None:
+            handle.cancel()
+        # 目标数据已被清空, 缓冲区中的数据不再写入, 按重复请求通知等待的handler
+        for _, future in self.write_buffers.pop(host_port, []):
+            if not future.done():
+                future.set_result(False)
+
     async def put(self, rasp_result_ins):
         """
-        将RaspResult实例插入对应的数据表
+        将RaspResult实例加入对应扫描目标的写入缓冲区, 缓冲区达到batch_size或等待超过batch_interval时批量插入数据表
 
         Parameters:
             rasp_result_ins - 插入的RaspResult实例
+
+        Returns:
+            插入成功返回True, 重复返回False
+
+        Raises:
+            exceptions.DatabaseError - 插入数据失败抛出此异常
         """
         host_port = rasp_result_ins.get_host_port()
-        model = self._get_model(host_port)
-        return await model.put(rasp_result_ins)
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        buffer = self.write_buffers.setdefault(host_port, [])
+        buffer.append((rasp_result_ins, future))
+        if len(buffer) >= self.batch_size:
+            self._flush(host_port)
+        elif host_port not in self.flush_handles:
+            self.flush_handles[host_port] = loop.call_later(
+                self.batch_interval, self._flush, host_port)
+
+        return await future
+
+    def _flush(self, host_port):
+        """
+        取出host_port对应写入缓冲区中的全部数据，启动批量写入任务
+
+        Parameters:
+            host_port - host + "_" + str(port) 组成的字符串, 指定写入的缓冲区
+        """
+        handle = self.flush_handles.pop(host_port, None)
+        if handle is not None:
+            handle.cancel()
+        batch = self.write_buffers.pop(host_port, [])
+        if len(batch) > 0:
+            asyncio.ensure_future(self._write_batch(host_port, batch))
+
+    async def _write_batch(self, host_port, batch):
+        """
+        批量插入数据，并将每条数据的插入结果通知对应的future
+
+        Parameters:
+            host_port - host + "_" + str(port) 组成的字符串, 指定插入的表名
+            batch - list, 结构同write_buffers中的item
+        """
+        try:
+            model = self._get_model(host_port)
+            stored_list = await model.put_batch([item[0] for item in batch])
+        except Exception as e:
+            if not isinstance(e, exceptions.DatabaseError):
+                Logger().error("Unexpected error occured when write batch data!", exc_info=e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exceptions.DatabaseError())
+        else:
+            for (_, future), data_stored in zip(batch, stored_list):
+                if not future.done():
+                    future.set_result(data_stored)
 
 
 class DedupLru(object):
     """
-    非扫描请求入库前的去重LRU集合
+    非扫描请求入库前的去重LRU集合, 存储于共享内存中, 由preprocessor的所有http server进程共用
+
+    每个扫描目标占用一个固定大小的区域, 区域内使用组相联的hash表存储key的指纹, 表满时使用clock算法淘汰,
+    扫描目标数量超出区域数量时，淘汰最久未访问的扫描目标的区域
     """
 
-    def __init__(self, max_size):
+    # 每个key可存放的槽位数量
+    probe_size = 8
+
+    def __init__(self, max_size, max_target):
         """
-        初始化
+        初始化, 必须在http server进程fork前调用
+
+        Parameters:
+            max_size - int, 每个扫描目标缓存的key数量
+            max_target - int, 同时缓存的扫描目标数量
+        """
+        self.max_size = max_size if max_size > 0 else 1
+        self.max_target = max_target if max_target > 0 else 1
+        self.window = min(self.probe_size, self.max_size)
+        self.lock = multiprocessing.Lock()
+        # 区域目录, 记录每个区域对应的扫描目标指纹(0为未使用)、最近访问时间、clock指针
+        self.region_keys = multiprocessing.RawArray("q", self.max_target)
+        self.region_time = multiprocessing.RawArray("d", self.max_target)
+        self.region_hand = multiprocessing.RawArray("l", self.max_target)
+        # 各区域的槽位, 记录key的指纹(0为空)和clock访问位
+        self.slots = multiprocessing.RawArray("q", self.max_target * self.max_size)
+        self.refs = multiprocessing.RawArray("b", self.max_target * self.max_size)
+
+    @staticmethod
+    def _fingerprint(value):
+        """
+        计算字符串的非0指纹
+
+        Parameters:
+            value - str
+
+        Returns:
+            int, 60bit正整数
+        """
+        return int(hashlib.md5(value.encode("utf-8")).hexdigest()[:15], 16) + 1
+
+    def _find_region(self, host_fp):
+        """
+        查找扫描目标对应的区域
+
+        Parameters:
+            host_fp - int, 扫描目标的指纹
+
+        Returns:
+            int, 区域下标, 不存在返回None
+        """
+        for region in range(self.max_target):
+            if self.region_keys[region] == host_fp:
+                return region
+        return None
+
+    def _alloc_region(self, host_fp):
+        """
+        为扫描目标分配区域, 优先使用未使用的区域, 否则淘汰最久未访问的区域
+
+        Parameters:
+            host_fp - int, 扫描目标的指纹
+
+        Returns:
+            int, 区域下标
+        """
+        target = 0
+        for region in range(self.max_target):
+            if self.region_keys[region] == 0:
+                target = region
+                break
+            if self.region_time[region] < self.region_time[target]:
+                target = region
+        self._reset_region(target)
+        self.region_keys[target] = host_fp
+        return target
+
+    def _reset_region(self, region):
+        """
+        清空区域内的全部槽位
+
+        Parameters:
+            region - int, 区域下标
+        """
+        base = region * self.max_size
+        for index in range(base, base + self.max_size):
+            self.slots[index] = 0
+            self.refs[index] = 0
+        self.region_keys[region] = 0
+        self.region_hand[region] = 0
+
+    def _get_positions(self, region, key_fp):
+        """
+        获取key在区域中可存放的槽位下标
+
+        Parameters:
+            region - int, 区域下标
+            key_fp - int, key的指纹
+
+        Returns:
+            list, item为int类型的槽位下标
         """
-        self.lru_dict = {}
-        self.max_size = max_size
+        base = region * self.max_size
+        start = key_fp % self.max_size
+        return [base + (start + i) % self.max_size for i in range(self.window)]
 
     def check(self, host_port, key):
         """
@@ -303,18 +480,37 @@ class DedupLru(object):
         Raises:
             KeyError - key不存在于LRU中
         """
-        try:
-            target_lru = self.lru_dict[host_port]
-        except KeyError:
-            self.lru_dict[host_port] = lru.LRU(self.max_size)
-            self.lru_dict[host_port][key] = None
-            raise KeyError
-
-        try:
-            target_lru[key]
-        except KeyError:
-            target_lru[key] = None
-            raise KeyError
+        host_fp = self._fingerprint(host_port)
+        key_fp = self._fingerprint(key)
+        with self.lock:
+            region = self._find_region(host_fp)
+            if region is None:
+                region = self._alloc_region(host_fp)
+            self.region_time[region] = time.time()
+
+            positions = self._get_positions(region, key_fp)
+            empty_index = None
+            for index in positions:
+                if self.slots[index] == key_fp:
+                    self.refs[index] = 1
+                    return
+                if self.slots[index] == 0 and empty_index is None:
+                    empty_index = index
+
+            if empty_index is None:
+                # clock淘汰, 跳过并清除访问位为1的槽位, 最多循环两圈
+                hand = self.region_hand[region]
+                for i in range(self.window * 2):
+                    index = positions[(hand + i) % self.window]
+                    if self.refs[index] == 0:
+                        empty_index = index
+                        self.region_hand[region] = (hand + i + 1) % self.window
+                        break
+                    self.refs[index] = 0
+
+            self.slots[empty_index] = key_fp
+            self.refs[empty_index] = 1
+        raise KeyError
 
     def delete_key(self, host_port, key):
         """
@@ -325,11 +521,16 @@ class DedupLru(object):
             key - 在LRU中删除的key
 
         """
-        try:
-            target_lru = self.lru_dict[host_port]
-            del target_lru[key]
-        except KeyError:
-            pass
+        host_fp = self._fingerprint(host_port)
+        key_fp = self._fingerprint(key)
+        with self.lock:
+            region = self._find_region(host_fp)
+            if region is None:
+                return
+            for index in self._get_positions(region, key_fp):
+                if self.slots[index] == key_fp:
+                    self.slots[index] = 0
+                    self.refs[index] = 0
 
     def clean_lru(self, host_port):
         """
@@ -338,4 +539,8 @@ class DedupLru(object):
         Parameters:
             host_port - host + "_" + str(port) 组成的字符串，指定清空的LRU
         """
-        self.lru_dict.pop(host_port, None)
+        host_fp = self._fingerprint(host_port)
+        with self.lock:
+            region = self._find_region(host_fp)
+            if region is not None:
+                self._reset_region(region)
@@ -24,9 +24,11 @@ import queue
 import signal
 import asyncio
 import functools
+import collections
 import multiprocessing
 
 from core.modules import base
+from core.components import task_bus
 from core.components import exceptions
 from core.components import authorizer
 from core.components import audit_tools
@@ -175,21 +177,26 @@ class Scanner(base.BaseModule):
         # 初始化context
         await audit_tools.context.Context().async_init()
 
-        # 启动插件
+        # 初始化任务总线, 启动插件
+        self.task_bus = task_bus.TaskBus()
         plugin_tasks = []
         for plugin_name in self.plugin_loaded:
+            self.plugin_loaded[plugin_name].set_task_bus(self.task_bus)
             plugin_tasks.append(loop.create_task(
                 self.plugin_loaded[plugin_name].async_run()))
 
-        # 启动获取扫描结果队列的协程
+        # 启动获取扫描结果队列的协程和清除过期结果的协程
         task_fetch_rasp_result = loop.create_task(self._fetch_from_queue())
+        task_clean_rasp_result = loop.create_task(
+            result_receiver.RaspResultReceiver().run_reaper())
 
         # 执行获取新扫描任务
         await self._fetch_new_scan()
 
         # 结束所有协程任务，reset共享内存
         task_fetch_rasp_result.cancel()
-        await asyncio.wait({task_fetch_rasp_result})
+        task_clean_rasp_result.cancel()
+        await asyncio.wait({task_fetch_rasp_result, task_clean_rasp_result})
         for task in plugin_tasks:
             task.cancel()
         await asyncio.wait(set(plugin_tasks), return_when=asyncio.ALL_COMPLETED)
@@ -200,133 +207,149 @@ class Scanner(base.BaseModule):
         获取扫描请求的RaspResult, 并分发给扫描插件
         """
         queue_name = "rasp_result_queue_" + self.module_id
-        sleep_interval = 0.1
-        continuously_sleep = 0
+        # 队列无数据时, 检查配置更新的最大间隔
+        config_check_interval = 1
         Logger().debug("Fetch task is running, use queue: " + queue_name)
 
-        while True:
-            if Communicator().get_value("config_version") > self.scan_config["version"]:
-                self._update_scan_config()
-            try:
-                data = Communicator().get_data_nowait(queue_name)
-                Logger().debug("From rasp_result_queue got data: " + str(data))
-                result_receiver.RaspResultReceiver().add_result(data)
-                Logger().debug("Send data to rasp_result receiver: {}".format(
-                    data.get_request_id()))
-                continuously_sleep = 0
-            except exceptions.QueueEmpty:
-                if continuously_sleep < 10:
-                    continuously_sleep += 1
-                await asyncio.sleep(sleep_interval * continuously_sleep)
+        loop = asyncio.get_event_loop()
+        queue_ready = asyncio.Event()
+        queue_fd = Communicator().get_queue_fd(queue_name)
+        loop.add_reader(queue_fd, queue_ready.set)
+        # 启动前队列中可能已有数据
+        queue_ready.set()
+
+        try:
+            while True:
+                if Communicator().get_value("config_version") > self.scan_config["version"]:
+                    self._update_scan_config()
+                try:
+                    await asyncio.wait_for(queue_ready.wait(), timeout=config_check_interval)
+                except asyncio.TimeoutError:
+                    continue
+                queue_ready.clear()
+
+                data_list = Communicator().get_many_data(queue_name)
+                Logger().debug("From rasp_result_queue got {} data.".format(len(data_list)))
+                for scan_request_id, data, flag in data_list:
+                    Logger().debug("From rasp_result_queue got data with scan-request-id: " + scan_request_id)
+                    # flag为1表示数据经过zlib压缩
+                    result_receiver.RaspResultReceiver().add_result(scan_request_id, data, flag == 1)
+        finally:
+            loop.remove_reader(queue_fd)
 
     async def _fetch_new_scan(self):
         """
         获取非扫描请求（新扫描任务），并分发给插件
         """
         # 扫描插件任务队列最大值
-        scan_queue_max = 300
-        # 已扫描的任务数量
-        self.scan_num = 0
-        # 扫描队列数量
-        self.scan_queue_remaining = 0
+        self.scan_queue_max = 300
         # 下次获取任务数量
         self.fetch_count = 20
-        # 待标记的已扫描的最大id
-        self.mark_id = 0
+        # 后台预取的扫描任务缓冲区
+        self.prefetch_buffer = collections.deque()
+        self._prefetch_ready = asyncio.Event()
+        self._prefetch_wakeup = asyncio.Event()
+        prefetch_task = asyncio.get_event_loop().create_task(self._prefetch_task_from_db())
 
-        while True:
-            try:
-                await self._fetch_task_from_db()
-            except exceptions.DatabaseError as e:
-                Logger().error("Database error occured when fetch scan task.", exc_info=e)
-            except asyncio.CancelledError as e:
-                raise e
-            except Exception as e:
-                Logger().error("Unexpected error occured when fetch scan task.", exc_info=e)
-            if self.scan_queue_remaining == 0:
-                continue
-
-            await self._check_scan_progress()
-
-            # 调整每次获取的扫描任务数
-            if self.scan_queue_remaining + self.fetch_count > scan_queue_max:
-                self.fetch_count = scan_queue_max - self.scan_queue_remaining
-            elif self.fetch_count < 5:
-                self.fetch_count = 5
-
-    async def _fetch_task_from_db(self):
+        try:
+            while True:
+                try:
+                    await self._fetch_task_from_db()
+                except exceptions.DatabaseError as e:
+                    Logger().error("Database error occured when fetch scan task.", exc_info=e)
+                except asyncio.CancelledError as e:
+                    raise e
+                except Exception as e:
+                    Logger().error("Unexpected error occured when fetch scan task.", exc_info=e)
+                if self.task_bus.get_remaining() == 0:
+                    continue
+
+                await self._check_scan_progress()
+        finally:
+            prefetch_task.cancel()
+
+    async def _prefetch_task_from_db(self):
         """
-        从数据库中获取当前扫描目标的非扫描请求（新扫描任务）
+        后台从数据库获取新扫描任务, 保持缓冲区中有fetch_count个任务, 使分发任务时无需等待数据库查询
         """
-
-        await self.new_scan_model.mark_result(self.mark_id, list(self.failed_task_set))
-        self.failed_task_set.clear()
-
         sleep_interval = 1
         continuously_sleep = 0
 
         while True:
-            data_list = await self.new_scan_model.get_new_scan(self.fetch_count)
-            data_count = len(data_list)
-            Logger().debug("Fetch {} task from db.".format(data_count))
-            if data_count > 0 or self.scan_queue_remaining > 0:
-                for item in data_list:
-                    for plugin_name in self.plugin_loaded:
-                        # item 格式: {"id": id, "data":rasp_result_json}
-                        self.plugin_loaded[plugin_name].add_task(item)
-                    Logger().debug(
-                        "Send task with id: {} to plugins.".format(item["id"]))
-                self.scan_queue_remaining += data_count
-                return
+            prefetch_count = self.fetch_count - len(self.prefetch_buffer)
+            if prefetch_count <= 0:
+                self._prefetch_wakeup.clear()
+                await self._prefetch_wakeup.wait()
+                continue
+
+            try:
+                data_list = await self.new_scan_model.get_new_scan(prefetch_count)
+            except exceptions.DatabaseError as e:
+                Logger().error("Database error occured when prefetch scan task.", exc_info=e)
+                data_list = []
+
+            Logger().debug("Prefetch {} task from db.".format(len(data_list)))
+            if len(data_list) > 0:
+                self.prefetch_buffer.extend(data_list)
+                self._prefetch_ready.set()
+                continuously_sleep = 0
             else:
-                Logger().debug("No url need scan, fetch task sleep {}s".format(
-                    sleep_interval * continuously_sleep))
                 if continuously_sleep < 10:
                     continuously_sleep += 1
+                Logger().debug("No url need scan, prefetch task sleep {}s".format(
+                    sleep_interval * continuously_sleep))
                 await asyncio.sleep(sleep_interval * continuously_sleep)
 
+    async def _fetch_task_from_db(self):
+        """
+        标记已完成的任务, 从预取缓冲区获取当前扫描目标的非扫描请求（新扫描任务）并分发给插件
+        """
+        # 小于等于低水位线的任务均已被所有插件扫描完成
+        mark_id = self.task_bus.get_watermark()
+        failed_list = [task_id for task_id in self.failed_task_set if task_id <= mark_id]
+        await self.new_scan_model.mark_result(mark_id, failed_list)
+        self.failed_task_set.difference_update(failed_list)
+
+        while len(self.prefetch_buffer) == 0:
+            if self.task_bus.get_remaining() > 0:
+                return
+            self._prefetch_ready.clear()
+            await self._prefetch_ready.wait()
+
+        data_count = min(self.fetch_count, len(self.prefetch_buffer))
+        Logger().debug("Fetch {} task from prefetch buffer.".format(data_count))
+        for i in range(data_count):
+            # item 格式: {"id": id, "data":rasp_result_json}
+            item = self.prefetch_buffer.popleft()
+            self.task_bus.publish(item)
+            Logger().debug(
+                "Send task with id: {} to plugins.".format(item["id"]))
+        self._prefetch_wakeup.set()
+
     async def _check_scan_progress(self):
         """
-        监测扫描进度，给出下次获取的任务量
+        等待插件确认完成任务, 剩余任务量降至一半以下时, 根据完成速率给出下次获取的任务量
         """
-        sleep_interval = 1
-        sleep_count = 0
-        while True:
-            await asyncio.sleep(sleep_interval)
-            sleep_count += 1
-            scan_num_list = []
-            scan_id_list = []
-
-            for plugin_name in self.plugin_loaded:
-                plugin_ins = self.plugin_loaded[plugin_name]
-                plugin_scan_num, plugin_last_id = plugin_ins.get_scan_progress()
-                scan_num_list.append(plugin_scan_num)
-                scan_id_list.append(plugin_last_id)
-
-            plugin_scan_min_num = min(scan_num_list)
-            plugin_scan_min_id = min(scan_id_list)
-            finish_count = plugin_scan_min_num - self.scan_num
-
-            if sleep_count > 20:
-                # 20个sleep内未扫描完成，每次最大获取任务量减半
-                self.scan_queue_remaining -= finish_count
-                self.scan_num = plugin_scan_min_num
-                sleep_count = 0
-                Logger().debug("Finish scan num: {}, remain task: {}, max scanned id: {}, decrease task fetch_count.".format(
-                    finish_count, self.scan_queue_remaining, plugin_scan_min_id))
-            elif sleep_count > 10:
-                # 10-20个sleep内完成一半以上，每次最大获取任务量不变
-                if self.scan_queue_remaining < finish_count * 2:
-                    self.fetch_count = finish_count
-                    break
-            elif self.scan_queue_remaining == finish_count:
-                # 10个sleep内完成，每次最大获取任务量加倍
-                self.fetch_count = self.scan_queue_remaining * 2
-                break
-
-        self.scan_queue_remaining -= finish_count
-        self.scan_num = plugin_scan_min_num
-        self.mark_id = plugin_scan_min_id
-
-        Logger().debug("Finish scan num: {}, remain task: {}, max scanned id: {}".format(
-            finish_count, self.scan_queue_remaining, plugin_scan_min_id))
+        # 按完成速率计算的每次获取任务量, 约为该时长(秒)内能够完成的任务数
+        fetch_period = 10
+        start_time = time.time()
+        start_count = self.task_bus.get_finished_count()
+        low_water = self.task_bus.get_remaining() // 2
+
+        while self.task_bus.get_remaining() > low_water:
+            await self.task_bus.wait_finish()
+
+        finish_count = self.task_bus.get_finished_count() - start_count
+        remaining = self.task_bus.get_remaining()
+        cost_time = max(time.time() - start_time, 0.001)
+
+        # 调整每次获取的扫描任务数
+        self.fetch_count = int(finish_count / cost_time * fetch_period)
+        if self.fetch_count > self.scan_queue_max - remaining:
+            self.fetch_count = self.scan_queue_max - remaining
+        if self.fetch_count < 5:
+            self.fetch_count = 5
+        self._prefetch_wakeup.set()
+
+        Logger().debug("Finish scan num: {} in {:.2f}s, remain task: {}, max scanned id: {}, next fetch count: {}".format(
+            finish_count, cost_time, remaining, self.task_bus.get_watermark(), self.fetch_count))
@@ -28,6 +28,8 @@ class ScanPlugin(scan_plugin_base.ScanPluginBase):
         "description": "基础命令注入漏洞检测插件"
     }
 
+    hook_types = ("command", )
+
     def mutant(self, rasp_result_ins):
         """
         测试向量生成
@@ -28,6 +28,8 @@ class ScanPlugin(scan_plugin_base.ScanPluginBase):
         "description": "PHP eval代码执行漏洞检测插件"
     }
 
+    hook_types = ("eval", )
+
     def mutant(self, rasp_result_ins):
         """
         测试向量生成
@@ -28,6 +28,8 @@ class ScanPlugin(scan_plugin_base.ScanPluginBase):
         "description": "基础文件包含漏洞检测插件",
     }
 
+    hook_types = ("include", )
+
     def mutant(self, rasp_result_ins):
         """
         测试向量生成
@@ -28,6 +28,8 @@ class ScanPlugin(scan_plugin_base.ScanPluginBase):
         "description": "基础任意文件写入漏洞检测插件"
     }
 
+    hook_types = ("writeFile", )
+
     def mutant(self, rasp_result_ins):
         """
         测试向量生成
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# 扫描任务获取性能测试, 使用sqlite内存数据库代替MySQL, 每次查询附加模拟的网络往返延迟
+# 对比优化前(get_new_scan 3次查询 + mark_result 3次查询, 获取与扫描串行)与当前实现(2次查询获取 + 1次查询标记, 后台预取)的每秒任务处理量
+# 用法:
+#     python3 test/benchmark/bench_new_scan.py [任务总数] [每批任务数] [查询往返延迟(ms)] [每批扫描耗时(ms)]
+
+import sys
+import time
+import asyncio
+import sqlite3
+import collections
+
+
+class StandInDB(object):
+    """
+    模拟ResultList表的sqlite数据库, 每次查询等待rtt秒模拟网络往返
+    """
+
+    def __init__(self, row_num, rtt):
+        self.rtt = rtt
+        self.start_id = 0
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute(
+            "CREATE TABLE ResultList (id INTEGER PRIMARY KEY, data TEXT, scan_status INTEGER DEFAULT 0)")
+        self.conn.executemany(
+            "INSERT INTO ResultList (data) VALUES (?)", [("x" * 1024, )] * row_num)
+
+    async def query(self, sql, params=()):
+        await asyncio.sleep(self.rtt)
+        return self.conn.execute(sql, params).fetchall()
+
+    async def origin_get_new_scan(self, count):
+        result = await self.query(
+            "SELECT MIN(id) FROM ResultList WHERE id > ? AND scan_status = 0", (self.start_id, ))
+        fetch_start_id = result[0][0]
+        if fetch_start_id is None:
+            return []
+        # sqlite默认不支持 UPDATE ... ORDER BY ... LIMIT, 使用子查询代替
+        await self.query(
+            "UPDATE ResultList SET scan_status = 2 WHERE id IN "
+            "(SELECT id FROM ResultList WHERE scan_status = 0 AND id > ? ORDER BY id LIMIT ?)",
+            (self.start_id, count))
+        rows = await self.query(
+            "SELECT id, data FROM ResultList WHERE id >= ? AND scan_status = 2 ORDER BY id LIMIT ?",
+            (fetch_start_id, count))
+        return [row[0] for row in rows]
+
+    async def origin_mark_result(self, last_id, failed_list):
+        marks = ",".join("?" * len(failed_list))
+        await self.query(
+            "UPDATE ResultList SET scan_status = 3 WHERE id <= ? AND id > ? AND id IN ({})".format(marks),
+            [last_id, self.start_id] + failed_list)
+        await self.query(
+            "UPDATE ResultList SET scan_status = 1 WHERE id <= ? AND id > ? AND scan_status = 2",
+            (last_id, self.start_id))
+        result = await self.query(
+            "SELECT MAX(id) FROM ResultList WHERE id > ? AND scan_status = 1", (self.start_id, ))
+        if result[0][0] is not None:
+            self.start_id = result[0][0]
+
+    async def current_get_new_scan(self, count):
+        rows = await self.query(
+            "SELECT id, data FROM ResultList WHERE id > ? AND scan_status = 0 ORDER BY id LIMIT ?",
+            (self.start_id, count))
+        id_list = [row[0] for row in rows]
+        if len(id_list) > 0:
+            await self.query(
+                "UPDATE ResultList SET scan_status = 2 WHERE id IN ({})".format(",".join("?" * len(id_list))),
+                id_list)
+        return id_list
+
+    async def current_mark_result(self, last_id, failed_list):
+        marks = ",".join("?" * len(failed_list))
+        await self.query(
+            "UPDATE ResultList SET scan_status = CASE WHEN id IN ({}) THEN 3 ELSE 1 END "
+            "WHERE id <= ? AND id > ? AND scan_status = 2".format(marks),
+            failed_list + [last_id, self.start_id])
+        self.start_id = last_id
+
+
+async def origin_run(db, batch_size, scan_time):
+    """
+    优化前: 标记、获取、扫描依次执行
+    """
+    last_id = 0
+    while True:
+        await db.origin_mark_result(last_id, [])
+        id_list = await db.origin_get_new_scan(batch_size)
+        if len(id_list) == 0:
+            return
+        await asyncio.sleep(scan_time)
+        last_id = id_list[-1]
+
+
+async def current_run(db, batch_size, scan_time):
+    """
+    当前实现: 后台预取任务, 扫描时同时获取下一批
+    """
+    buffer = collections.deque()
+    ready = asyncio.Event()
+    wakeup = asyncio.Event()
+    finished = False
+
+    async def prefetch():
+        nonlocal finished
+        while True:
+            if len(buffer) >= batch_size:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            id_list = await db.current_get_new_scan(batch_size - len(buffer))
+            buffer.extend(id_list)
+            if len(id_list) == 0:
+                finished = True
+            ready.set()
+            if finished:
+                return
+
+    prefetch_task = asyncio.ensure_future(prefetch())
+    last_id = 0
+    while True:
+        await db.current_mark_result(last_id, [])
+        while len(buffer) == 0 and not finished:
+            ready.clear()
+            await ready.wait()
+        if len(buffer) == 0:
+            break
+        id_list = [buffer.popleft() for i in range(min(batch_size, len(buffer)))]
+        wakeup.set()
+        await asyncio.sleep(scan_time)
+        last_id = id_list[-1]
+    await prefetch_task
+
+
+def bench(run_func, row_num, batch_size, rtt, scan_time):
+    """
+    返回run_func每秒处理的任务数
+    """
+    db = StandInDB(row_num, rtt)
+    loop = asyncio.get_event_loop()
+    start = time.perf_counter()
+    loop.run_until_complete(run_func(db, batch_size, scan_time))
+    cost = time.perf_counter() - start
+    left = db.conn.execute("SELECT COUNT(*) FROM ResultList WHERE scan_status != 1").fetchone()[0]
+    assert left == 0, "{} rows not marked".format(left)
+    return row_num / cost
+
+
+def main():
+    row_num = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rtt = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.001
+    scan_time = float(sys.argv[4]) / 1000 if len(sys.argv) > 4 else 0.005
+
+    print("rows: {}, batch size: {}, rtt: {:.1f}ms, scan time per batch: {:.1f}ms".format(
+        row_num, batch_size, rtt * 1000, scan_time * 1000))
+    origin_rps = bench(origin_run, row_num, batch_size, rtt, scan_time)
+    current_rps = bench(current_run, row_num, batch_size, rtt, scan_time)
+    print("origin fetch:  {:.0f} rows/s".format(origin_rps))
+    print("current fetch: {:.0f} rows/s ({:.2f}x)".format(current_rps, current_rps / origin_rps))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# RaspResult 解析校验性能测试, 对比 json + jsonschema 与当前实现的每秒处理量
+# 用法(在openrasp_iast目录下执行):
+#     python3 test/benchmark/bench_rasp_result.py [hook数量] [执行次数]
+
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + "/../../")
+
+from core.components import rasp_result
+
+
+def gen_rasp_result_json(hook_num):
+    """
+    生成包含hook_num个sql hook点的rasp_result json字符串
+    """
+    hook_info = []
+    for i in range(hook_num):
+        hook_info.append({
+            "hook_type": "sql",
+            "query": "SELECT * FROM users WHERE id = '{}'".format(i),
+            "tokens": [{"start": 0, "stop": 6, "text": "SELECT"}],
+            "stack": ["com.example.Dao.query(Dao.java:{})".format(i)] * 20
+        })
+    data = {
+        "web_server": {"host": "127.0.0.1", "port": 8005},
+        "context": {
+            "requestId": "bench",
+            "json": {},
+            "server": {"language": "php", "name": "PHP", "version": "7.2.19", "os": "Linux"},
+            "body": "",
+            "appBasePath": "/var/www/html",
+            "remoteAddr": "172.17.0.1",
+            "protocol": "http",
+            "method": "get",
+            "querystring": "id=1",
+            "path": "/index.php",
+            "parameter": {"id": ["1"]},
+            "header": {"host": "127.0.0.1:8005"},
+            "url": "http://127.0.0.1:8005/index.php?id=1",
+            "nic": [{"name": "eth0", "ip": "172.17.0.2"}],
+            "hostname": "server_host_name"
+        },
+        "hook_info": hook_info
+    }
+    return json.dumps(data).encode("utf-8")
+
+
+def origin_parse(data):
+    """
+    优化前的解析校验方式
+    """
+    result = json.loads(data)
+    rasp_result.RaspResult.rasp_result_validtor.validate(result)
+    return result
+
+
+def current_parse(data):
+    """
+    当前的解析校验方式
+    """
+    return rasp_result.RaspResult(data)
+
+
+def bench(func, data, times):
+    """
+    返回func每秒执行次数
+    """
+    start = time.perf_counter()
+    for i in range(times):
+        func(data)
+    return times / (time.perf_counter() - start)
+
+
+def main():
+    hook_num = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    times = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    data = gen_rasp_result_json(hook_num)
+
+    print("json backend: {}".format("orjson" if rasp_result.orjson is not None else "json"))
+    print("payload size: {} bytes, hook num: {}, times: {}".format(len(data), hook_num, times))
+    origin_ops = bench(origin_parse, data, times)
+    current_ops = bench(current_parse, data, times)
+    print("json + jsonschema: {:.0f} ops/s".format(origin_ops))
+    print("RaspResult:        {:.0f} ops/s ({:.2f}x)".format(current_ops, current_ops / origin_ops))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# 参数拼接判断性能测试, 对比 逐字符正则分割 + common.lcs 动态规划 与当前实现(str_match)的每秒判断次数, 并校验两者结果一致
+# 使用sql hook的tokens格式: 对生成的SQL语句按单词/符号切分为token
+# 用法(在openrasp_iast目录下执行):
+#     python3 test/benchmark/bench_str_match.py [SQL条件数量] [参数数量] [执行次数]
+
+import os
+import re
+import sys
+import time
+import random
+import string
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + "/../../")
+
+from core.components import common
+from core.components.audit_tools.request_data import RequestData
+
+token_reg = re.compile(r"'[^']*'|\w+|[^\w\s]")
+
+
+def gen_sql_tokens(cond_num):
+    """
+    生成包含cond_num个条件的SQL语句的tokens
+    """
+    conds = []
+    for i in range(cond_num):
+        conds.append("t.col_{} = '{}'".format(i, "".join(random.choices(string.ascii_letters + string.digits, k=random.randint(4, 40)))))
+    query = "SELECT t.id, t.name, t.create_time FROM user_info t LEFT JOIN orders o ON o.uid = t.id WHERE {} ORDER BY t.id DESC LIMIT 20".format(
+        " AND ".join(conds))
+    tokens = []
+    for match in token_reg.finditer(query):
+        tokens.append({"start": match.start(), "stop": match.end(), "text": match.group()})
+    return tokens
+
+
+def gen_params(tokens, param_num):
+    """
+    生成参数值, 一半为与token无关的随机值, 一半包含某个token的一部分
+    """
+    params = []
+    for i in range(param_num):
+        value = "".join(random.choices(string.ascii_letters + string.digits + "-_./ ", k=random.randint(5, 60)))
+        if i % 2 == 1:
+            text = random.choice(tokens)["text"]
+            start = random.randint(0, max(len(text) - 5, 0))
+            value = value[:10] + text[start:start + 5] + value[10:]
+        params.append(value)
+    return params
+
+
+def origin_split_str_word(input_str):
+    """
+    优化前的分割方式
+    """
+    split_value = []
+    char = input_str[0]
+    if char > '\xff' or re.search(r'[a-zA-Z0-9_]', char):
+        word = True
+    else:
+        word = False
+    start = 0
+    index = 0
+    for char in input_str:
+        if char > '\xff' or re.search(r'[a-zA-Z0-9_]', char):
+            word_char = True
+        else:
+            word_char = False
+
+        if word != word_char:
+            split_value.append(input_str[start:index])
+            word = not word
+            start = index
+        index += 1
+    if index - start >= 3:
+        split_value.append(input_str[start:])
+
+    return split_value
+
+
+def origin_is_token_concat(param_value, tokens):
+    """
+    优化前的判断方式
+    """
+    param_value = param_value.strip()
+    for token in tokens:
+        if len(token["text"]) >= len(param_value) and token["text"].find(param_value) != -1:
+            return True
+
+    split_value = origin_split_str_word(param_value)
+    if len(param_value) > 3:
+        for token in tokens:
+            for item in split_value:
+                if len(token["text"]) * len(item) < 10000:
+                    if len(token["text"]) <= 3:
+                        if param_value.find(token["text"]) != -1:
+                            return True
+                    else:
+                        cs = common.lcs(token["text"], item)
+                        if len(cs) > 3:
+                            return True
+                elif len(token["text"]) >= len(item) and token["text"].find(item) != -1:
+                    return True
+    return False
+
+
+# _is_token_concat不依赖请求数据, 使用未初始化的实例调用
+request_data_ins = RequestData.__new__(RequestData)
+
+
+def current_is_token_concat(param_value, tokens):
+    """
+    当前的判断方式
+    """
+    return request_data_ins._is_token_concat(param_value, tokens)
+
+
+def bench(func, params, tokens, times):
+    """
+    返回func每秒判断次数和判断结果
+    """
+    result = []
+    start = time.perf_counter()
+    for i in range(times):
+        result = [func(value, tokens) for value in params]
+    return times * len(params) / (time.perf_counter() - start), result
+
+
+def main():
+    cond_num = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    param_num = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    times = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    random.seed(0)
+    tokens = gen_sql_tokens(cond_num)
+    params = gen_params(tokens, param_num)
+
+    print("token num: {}, param num: {}, times: {}".format(len(tokens), param_num, times))
+    origin_ops, origin_result = bench(origin_is_token_concat, params, tokens, times)
+    current_ops, current_result = bench(current_is_token_concat, params, tokens, times)
+    assert origin_result == current_result, "result mismatch"
+    print("concat params: {}/{}".format(sum(current_result), len(current_result)))
+    print("split + lcs: {:.0f} checks/s".format(origin_ops))
+    print("str_match:   {:.0f} checks/s ({:.2f}x)".format(current_ops, current_ops / origin_ops))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import time
+import select
+import pytest
+import threading
+import multiprocessing
+
+from core.components import exceptions
+from core.components.communicator import OriRingQueue, SharedMem
+
+
+def test_ring_queue_put_get():
+    queue = OriRingQueue(1024)
+    queue.put("0-abc", b"data1")
+    queue.put("0-def", b"data2", 1)
+    assert queue.get_nowait() == ("0-abc", b"data1", 0)
+    assert queue.get_nowait() == ("0-def", b"data2", 1)
+    with pytest.raises(exceptions.QueueEmpty):
+        queue.get_nowait()
+
+
+def test_ring_queue_wrap_around():
+    """
+    测试记录跨越缓冲区末尾时的读写
+    """
+    queue = OriRingQueue(64)
+    for i in range(20):
+        data = bytes([i]) * (i % 7 + 10)
+        queue.put("k" + str(i), data, i)
+        assert queue.get_nowait() == ("k" + str(i), data, i)
+
+
+def test_ring_queue_full():
+    queue = OriRingQueue(64)
+    record_size = OriRingQueue.header_format.size + 1 + 20
+    for i in range(64 // record_size):
+        queue.put("k", b"x" * 20)
+    with pytest.raises(exceptions.QueueFull):
+        queue.put("k", b"x" * 20)
+    queue.get_nowait()
+    queue.put("k", b"x" * 20)
+    with pytest.raises(exceptions.QueueValueError):
+        queue.put("k", b"x" * 64)
+
+
+def test_ring_queue_notify():
+    queue = OriRingQueue(1024)
+    readable, _, _ = select.select([queue.fileno()], [], [], 0)
+    assert len(readable) == 0
+    queue.put("a", b"1")
+    queue.put("b", b"2")
+    readable, _, _ = select.select([queue.fileno()], [], [], 0)
+    assert len(readable) == 1
+    assert queue.get_many() == [("a", b"1", 0), ("b", b"2", 0)]
+    readable, _, _ = select.select([queue.fileno()], [], [], 0)
+    assert len(readable) == 0
+    assert queue.get_many() == []
+
+
+def _put_records(queue, prefix, count):
+    for i in range(count):
+        queue.put(prefix + str(i), str(i).encode("utf-8"))
+
+
+def test_ring_queue_multi_process_writer():
+    queue = OriRingQueue(65536)
+    procs = []
+    for name in ("a", "b"):
+        proc = multiprocessing.Process(target=_put_records, args=(queue, name, 200))
+        proc.start()
+        procs.append(proc)
+    for proc in procs:
+        proc.join(10)
+
+    result = queue.get_many()
+    assert len(result) == 400
+    for name in ("a", "b"):
+        keys = [key for key, data, flag in result if key.startswith(name)]
+        assert keys == [name + str(i) for i in range(200)]
+    for key, data, flag in result:
+        assert key[1:] == data.decode("utf-8")
+
+
+def _add_values(shared_mem, count):
+    for i in range(count):
+        shared_mem.add_value("Scanner_0", "send_request")
+
+
+def test_shared_mem_sharded_add():
+    """
+    测试多个进程各自写入分片后的求和, 以及写入进程多于分片槽位时的加锁写入
+    """
+    shared_mem = SharedMem({"Scanner_0": {"send_request": None, "failed_request": None}}, 2)
+    procs = []
+    for i in range(4):
+        proc = multiprocessing.Process(target=_add_values, args=(shared_mem, 1000))
+        proc.start()
+        procs.append(proc)
+    for proc in procs:
+        proc.join(10)
+    _add_values(shared_mem, 10)
+
+    assert shared_mem.get_value("Scanner_0", "send_request") == 4010
+    assert shared_mem.get_all_value("Scanner_0") == {"send_request": 4010, "failed_request": 0}
+
+
+class YieldingArray(list):
+    """
+    读取后让出GIL的数组, 使线程在累加的读写之间切换
+    """
+
+    def __getitem__(self, index):
+        value = super().__getitem__(index)
+        time.sleep(0)
+        return value
+
+
+def test_shared_mem_multi_thread_add():
+    """
+    测试同一进程的多个线程共用槽位时计数不丢失
+    """
+    shared_mem = SharedMem({"Scanner_0": {"send_request": None}}, 2)
+    shared_mem.shared_array = YieldingArray(shared_mem.shared_array)
+    threads = [threading.Thread(target=_add_values, args=(shared_mem, 1000)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert shared_mem.get_value("Scanner_0", "send_request") == 8000
+
+
+def test_shared_mem_set_and_reset():
+    shared_mem = SharedMem({"Scanner_0": {"send_request": None}}, 2)
+    _add_values(shared_mem, 5)
+    shared_mem.set_value("Scanner_0", "send_request", 100)
+    assert shared_mem.get_value("Scanner_0", "send_request") == 100
+    _add_values(shared_mem, 5)
+    assert shared_mem.get_value("Scanner_0", "send_request") == 105
+    shared_mem.reset_all_value("Scanner_0")
+    assert shared_mem.get_value("Scanner_0", "send_request") == 0
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import re
+import helper
+
+from core.components.audit_tools.request_data import RequestData
+from core.components.audit_tools.param_hook_index import ParamHookIndex
+
+token_reg = re.compile(r"'[^']*'|\w+|[^\w\s]")
+
+
+def new_tokens(code):
+    return [{"start": m.start(), "stop": m.end(), "text": m.group()} for m in token_reg.finditer(code)]
+
+
+def new_rasp_result():
+    query = "SELECT name FROM user_info WHERE id = 'abc12345' AND type = 1"
+    hook_info = [
+        {"hook_type": "sql", "query": query, "tokens": new_tokens(query)},
+        {"hook_type": "command", "command": "cat /tmp/upload_dir", "tokens": new_tokens("cat /tmp/upload_dir"), "env": ["LANG=zh_CN.UTF-8"]},
+        {"hook_type": "ssrf", "url": "http://internal.example.com/api/v1?key=value", "hostname": "internal.example.com"},
+        {"hook_type": "readFile", "path": "/var/www/html/uploads/report_2020.txt", "realpath": "/var/www/html/uploads/report_2020.txt"},
+        {"hook_type": "eval", "code": "echo 'hello world';"},
+        {"hook_type": "callable", "function": "system"}
+    ]
+    return helper.new_rasp_result(hook_info=hook_info)
+
+
+def test_token_concat():
+    index = ParamHookIndex(new_rasp_result())
+    assert index.is_concat("sql", "abc12345")
+    assert index.is_concat("sql", "xxabc12yy")
+    assert index.is_concat("sql", "user_info")
+    assert not index.is_concat("sql", "nothing")
+    assert index.is_concat("command", "upload_dir")
+    # env中的值被参数包含
+    assert index.is_concat("command", "aaLANGbb")
+    assert not index.is_concat("command", "nothing")
+
+
+def test_url_concat():
+    index = ParamHookIndex(new_rasp_result())
+    assert index.is_concat("ssrf", "internal.example.com")
+    assert index.is_concat("ssrf", "http://internal.example.com/")
+    assert not index.is_concat("ssrf", "nothing")
+    assert index.is_concat("readFile", "uploads")
+    assert index.is_concat("readFile", "../report_2020")
+    assert not index.is_concat("readFile", "nothing")
+
+
+def test_item_concat():
+    index = ParamHookIndex(new_rasp_result())
+    assert index.is_concat("eval", "hello")
+    assert not index.is_concat("eval", "nothing")
+
+
+def test_not_concat():
+    index = ParamHookIndex(new_rasp_result())
+    assert not index.is_concat("sql", "")
+    # 不存在或不支持的hook类型
+    assert not index.is_concat("xxe", "abc12345")
+    assert not index.is_concat("callable", "system")
+
+
+def test_get_concat_hook_types():
+    index = ParamHookIndex(new_rasp_result())
+    assert index.get_concat_hook_types("abc12345") == {"sql"}
+    assert index.get_concat_hook_types("hello world") == {"eval"}
+    assert index.get_concat_hook_types("nothing") == set()
+
+
+def test_result_cache():
+    index = ParamHookIndex(new_rasp_result())
+    assert index.is_concat("sql", "abc12345")
+    assert index._result_cache[("sql", "abc12345")] is True
+    index._hooks["sql"] = []
+    assert index.is_concat("sql", "abc12345")
+
+
+def test_shared_by_request_data():
+    rasp_result_ins = new_rasp_result()
+    request_a = RequestData(rasp_result_ins)
+    request_b = RequestData(rasp_result_ins)
+    assert request_a.is_param_concat_in_hook("sql", "abc12345")
+    assert not request_b.is_param_concat_in_hook("ssrf", "abc12345")
+    index = rasp_result_ins.get_cached("param_hook_index", ParamHookIndex)
+    assert ("sql", "abc12345") in index._result_cache
+    assert ("ssrf", "abc12345") in index._result_cache
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import pytest
+
+from core.components import exceptions
+from core.components import rate_controller
+
+boundary = {
+    "max_concurrent_request": 20,
+    "max_request_interval": 1000,
+    "min_request_interval": 0
+}
+
+
+def new_stats(congested=False, p50=10000, p95=35000):
+    return {
+        "congested": congested,
+        "cpu_idle": True,
+        "full_concurrency": True,
+        "sample_num": 50,
+        "latency_p50": p50,
+        "latency_p95": p95
+    }
+
+
+def run_controller(controller, cr, ri, stats, times):
+    for i in range(times):
+        cr, ri = controller.update(cr, ri, stats, boundary)
+    return cr, ri
+
+
+def test_get_controller():
+    assert set(rate_controller.get_controller_names()) == {"step", "aimd", "gradient"}
+    for name in rate_controller.get_controller_names():
+        assert rate_controller.get_controller(name).name == name
+    with pytest.raises(exceptions.UnknownRateController):
+        rate_controller.get_controller("not_exist")
+
+
+@pytest.mark.parametrize("name", ["step", "aimd", "gradient"])
+def test_increase_to_max(name):
+    """
+    延迟平稳(中位数与95分位差距较大但不变化)时, 速率应提升至上限
+    """
+    controller = rate_controller.get_controller(name)
+    cr, ri = run_controller(controller, 1, 1000, new_stats(), 300)
+    assert cr == boundary["max_concurrent_request"]
+    assert ri == boundary["min_request_interval"]
+
+
+@pytest.mark.parametrize("name", ["step", "aimd", "gradient"])
+def test_decrease_on_congestion(name):
+    controller = rate_controller.get_controller(name)
+    cr, ri = run_controller(controller, 1, 1000, new_stats(), 300)
+    new_cr, new_ri = run_controller(controller, cr, ri, new_stats(congested=True), 5)
+    assert new_cr < cr or new_ri > ri
+
+
+@pytest.mark.parametrize("name", ["step", "aimd", "gradient"])
+def test_within_boundary(name):
+    controller = rate_controller.get_controller(name)
+    for congested in (True, False):
+        cr, ri = run_controller(controller, 50, 5000, new_stats(congested=congested), 100)
+        assert 1 <= cr <= boundary["max_concurrent_request"]
+        assert boundary["min_request_interval"] <= ri <= boundary["max_request_interval"]
+
+
+@pytest.mark.parametrize("name", ["aimd", "gradient"])
+def test_decrease_on_latency_increase(name):
+    controller = rate_controller.get_controller(name)
+    cr, ri = run_controller(controller, 1, 1000, new_stats(), 300)
+    new_cr, new_ri = run_controller(controller, cr, ri, new_stats(p50=40000, p95=140000), 5)
+    assert new_cr < cr
+
+
+def test_aimd_tail_latency_increase():
+    controller = rate_controller.get_controller("aimd")
+    cr, ri = run_controller(controller, 1, 1000, new_stats(), 300)
+    new_cr, new_ri = run_controller(controller, cr, ri, new_stats(p95=100000), 1)
+    assert new_cr < cr
+
+
+def test_reset():
+    controller = rate_controller.get_controller("aimd")
+    run_controller(controller, 1, 1000, new_stats(p50=1000, p95=2000), 10)
+    controller.reset()
+    # 重置后以新目标的延迟作为空载延迟
+    cr, ri = run_controller(controller, 1, 1000, new_stats(), 300)
+    assert cr == boundary["max_concurrent_request"]
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import copy
+import helper
+
+from core.components.audit_tools.request_data import RequestData
+
+
+def new_rasp_result(content_type, json_data=None, hook_info=None):
+    context = {
+        "json": json_data if json_data is not None else {},
+        "method": "post",
+        "querystring": "a=1",
+        "parameter": {
+            "a": ["1"],
+            "b": ["2"]
+        },
+        "header": {
+            "host": "127.0.0.1:8005",
+            "content-type": content_type,
+            "cookie": "c=3"
+        },
+        "url": "http://127.0.0.1:8005/test.php?a=1"
+    }
+    return helper.new_rasp_result(context, hook_info)
+
+
+def test_share_base_data():
+    rasp_result_ins = new_rasp_result("application/x-www-form-urlencoded")
+    request_a = RequestData(rasp_result_ins)
+    request_b = RequestData(rasp_result_ins)
+    assert request_a.get_param("get", "a") == "1"
+    assert request_a.get_param("post", "b") == "2"
+    assert request_a.get_param("cookies", "c") == "3"
+    for key in ("headers", "params", "data", "cookies"):
+        assert request_a.http_data[key] is request_b.http_data[key]
+
+
+def test_copy_on_write():
+    rasp_result_ins = new_rasp_result("application/x-www-form-urlencoded")
+    request_a = RequestData(rasp_result_ins)
+    request_b = RequestData(rasp_result_ins)
+
+    request_a.set_param("get", "a", "payload")
+    request_a.set_param("post", "new", "payload")
+    request_a.set_param("headers", "x-test", "payload")
+    request_a.delete_param("cookies", "c")
+    request_a.gen_scan_request_id()
+
+    assert request_a.get_param("get", "a") == "payload"
+    assert request_a.get_param("post", "new") == "payload"
+    assert request_a.get_param("headers", "x-test") == "payload"
+    assert request_a.get_param("cookies", "c") is None
+
+    assert request_b.get_param("get", "a") == "1"
+    assert request_b.get_param("post", "new") is None
+    assert request_b.get_param("headers", "x-test") is None
+    assert request_b.get_param("headers", "scan-request-id") is None
+    assert request_b.get_param("cookies", "c") == "3"
+    assert RequestData(rasp_result_ins).get_param("get", "a") == "1"
+    assert "scan-request-id" not in rasp_result_ins.get_headers()
+
+
+def test_json_copy_on_write():
+    json_data = {
+        "a": {"b": "1", "c": {"d": "2"}},
+        "e": [{"f": "3"}, "4"]
+    }
+    origin_json = copy.deepcopy(json_data)
+    rasp_result_ins = new_rasp_result("application/json", json_data)
+    request_a = RequestData(rasp_result_ins)
+    request_b = RequestData(rasp_result_ins)
+
+    request_a.set_param("json", ["a", "b"], "payload")
+    request_a.set_param("json", ["e", 0, "f"], "payload")
+    request_a.set_param("json", ["g", "h"], "payload")
+
+    assert request_a.get_param("json", ["a", "b"]) == "payload"
+    assert request_a.get_param("json", ["e", 0, "f"]) == "payload"
+    assert request_a.get_param("json", ["g", "h"]) == "payload"
+    assert request_a.get_param("json", ["a", "c", "d"]) == "2"
+    # 未经过json path的节点与原始数据共享
+    assert request_a.http_data["json"]["a"]["c"] is request_b.http_data["json"]["a"]["c"]
+
+    assert request_b.http_data["json"] == origin_json
+    assert rasp_result_ins.get_json() == origin_json
+
+
+def test_files_copy_on_write():
+    hook_info = [{
+        "hook_type": "fileUpload",
+        "name": "file",
+        "filename": "a.txt",
+        "content": "content",
+        "dest_realpath": "/var/www/html/a.txt"
+    }]
+    rasp_result_ins = new_rasp_result("multipart/form-data; boundary=xxx", hook_info=hook_info)
+    request_a = RequestData(rasp_result_ins)
+    request_b = RequestData(rasp_result_ins)
+
+    request_a.set_param("files", [0, "filename"], "a.php")
+    assert request_a.get_param("files", [0, "filename"]) == "a.php"
+    assert request_b.get_param("files", [0, "filename"]) == "a.txt"
+    assert rasp_result_ins.get_upload_files()[0]["filename"] == "a.txt"
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import random
+
+from core.components import common
+from core.components import str_match
+
+
+def test_split_word():
+    assert str_match.split_word("abc_1'; drop---") == ["abc_1", "'; ", "drop", "---"]
+    # 最后一段长度小于3时丢弃
+    assert str_match.split_word("abc_1'; drop--") == ["abc_1", "'; ", "drop"]
+    assert str_match.split_word("abc.d") == ["abc", "."]
+    assert str_match.split_word("中文abc=1234") == ["中文abc", "=", "1234"]
+    # 码位不大于0xff的非字母数字字符为符号字符
+    assert str_match.split_word("é=1") == ["é="]
+    assert str_match.split_word("") == []
+
+
+def test_get_ngrams():
+    assert str_match.get_ngrams("abcde", 4) == {"abcd", "bcde"}
+    assert str_match.get_ngrams("abc", 4) == set()
+
+
+def test_has_common_substr():
+    assert str_match.has_common_substr("select password", "xxpasswyy", 4)
+    assert not str_match.has_common_substr("select password", "xxpasyy", 4)
+    assert not str_match.has_common_substr("abc", "abc", 4)
+    assert str_match.has_common_substr("abcd", "abcd", 4)
+
+
+def test_has_common_substr_same_as_lcs():
+    random.seed(0)
+    for i in range(500):
+        s1 = "".join(random.choices("abcd", k=random.randint(0, 20)))
+        s2 = "".join(random.choices("abcd", k=random.randint(0, 20)))
+        for min_len in (1, 3, 4):
+            assert str_match.has_common_substr(s1, s2, min_len) == (len(common.lcs(s1, s2)) >= min_len)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import pytest
+import helper
+import asyncio
+
+from core.components import exceptions
+from core.components.task_bus import TaskBus
+
+
+def new_task(task_id, hook_types=()):
+    hook_info = [{"hook_type": hook_type} for hook_type in hook_types]
+    return {"id": task_id, "data": helper.new_rasp_result(hook_info=hook_info)}
+
+
+def test_publish_to_all_subscribers():
+    async def run():
+        bus = TaskBus()
+        queue_a = bus.subscribe("a")
+        queue_b = bus.subscribe("b")
+        bus.publish(new_task(1))
+        assert queue_a.get_nowait()["id"] == 1
+        assert queue_b.get_nowait()["id"] == 1
+        assert bus.get_remaining() == 1
+    asyncio.run(run())
+
+
+def test_watermark_contiguous():
+    """
+    测试低水位线只推进到连续完成的任务id
+    """
+    async def run():
+        bus = TaskBus()
+        bus.subscribe("a")
+        bus.subscribe("b")
+        for task_id in (1, 2, 3):
+            bus.publish(new_task(task_id))
+
+        bus.ack("a", 2)
+        bus.ack("b", 2)
+        assert bus.get_watermark() == 0
+        assert bus.get_finished_count() == 1
+
+        bus.ack("a", 1)
+        assert bus.get_watermark() == 0
+        bus.ack("b", 1)
+        assert bus.get_watermark() == 2
+        assert bus.get_remaining() == 1
+
+        bus.ack("b", 3)
+        bus.ack("a", 3)
+        assert bus.get_watermark() == 3
+        assert bus.get_remaining() == 0
+        assert bus.get_finished_count() == 3
+    asyncio.run(run())
+
+
+def test_ack_unknown_task():
+    async def run():
+        bus = TaskBus()
+        bus.subscribe("a")
+        bus.publish(new_task(1))
+        bus.ack("a", 1)
+        with pytest.raises(exceptions.TaskNotExist):
+            bus.ack("a", 1)
+        with pytest.raises(exceptions.TaskNotExist):
+            bus.ack("a", 2)
+    asyncio.run(run())
+
+
+def test_wait_finish():
+    async def run():
+        bus = TaskBus()
+        bus.subscribe("a")
+        bus.publish(new_task(1))
+        waiter = asyncio.ensure_future(bus.wait_finish())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        bus.ack("a", 1)
+        await asyncio.wait_for(waiter, 1)
+    asyncio.run(run())
+
+
+def test_no_subscriber():
+    async def run():
+        bus = TaskBus()
+        bus.publish(new_task(5))
+        assert bus.get_watermark() == 5
+        assert bus.get_remaining() == 0
+        assert bus.get_finished_count() == 1
+    asyncio.run(run())
+
+
+def test_route_by_hook_type():
+    async def run():
+        bus = TaskBus()
+        queue_sql = bus.subscribe("sql", ("sql", ))
+        queue_file = bus.subscribe("file", ("readFile", "writeFile"))
+        queue_all = bus.subscribe("all")
+        bus.publish(new_task(1, ["sql"]))
+        bus.publish(new_task(2, ["writeFile", "sql"]))
+        bus.publish(new_task(3, ["xxe"]))
+
+        assert [queue_sql.get_nowait()["id"] for i in range(queue_sql.qsize())] == [1, 2]
+        assert [queue_file.get_nowait()["id"] for i in range(queue_file.qsize())] == [2]
+        assert [queue_all.get_nowait()["id"] for i in range(queue_all.qsize())] == [1, 2, 3]
+
+        bus.ack("sql", 1)
+        bus.ack("all", 1)
+        assert bus.get_watermark() == 1
+    asyncio.run(run())
+
+
+def test_skip_unrouted_task():
+    """
+    测试没有订阅者关注的任务直接完成, 且水位线按发布顺序推进
+    """
+    async def run():
+        bus = TaskBus()
+        queue = bus.subscribe("sql", ("sql", ))
+        bus.publish(new_task(1, ["sql"]))
+        bus.publish(new_task(2, ["ssrf"]))
+        bus.publish(new_task(3))
+        assert queue.qsize() == 1
+        assert bus.get_remaining() == 1
+        assert bus.get_finished_count() == 2
+        assert bus.get_watermark() == 0
+
+        bus.ack("sql", 1)
+        assert bus.get_watermark() == 3
+
+        bus.publish(new_task(4, ["ssrf"]))
+        assert bus.get_watermark() == 4
+    asyncio.run(run())
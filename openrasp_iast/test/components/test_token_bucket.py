@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import pytest
+import asyncio
+
+from core.components.audit_tools.context import TokenBucket
+
+
+def run_with_clock(func):
+    """
+    使用可手动推进的时钟运行func(bucket所在事件循环的时钟)
+    """
+    async def run():
+        clock = [100.0]
+        asyncio.get_event_loop().time = lambda: clock[0]
+        func(clock)
+    asyncio.run(run())
+
+
+def test_unlimited():
+    def check(clock):
+        bucket = TokenBucket()
+        for i in range(100):
+            assert bucket.reserve() == 0
+    run_with_clock(check)
+
+
+def test_burst_and_rate():
+    def check(clock):
+        bucket = TokenBucket(10, 3)
+        for i in range(3):
+            assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.1)
+        assert bucket.reserve() == pytest.approx(0.2)
+
+        # 令牌消耗完后, 经过足够时间重新积累burst个令牌
+        clock[0] += 1
+        for i in range(3):
+            assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.1)
+    run_with_clock(check)
+
+
+def test_set_rate():
+    def check(clock):
+        bucket = TokenBucket(10, 1)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.1)
+        bucket.set_rate(0, 1)
+        assert bucket.reserve() == 0
+        bucket.set_rate(2, 0)
+        assert bucket.burst == 1
+    run_with_clock(check)
+
+
+def test_acquire_wait():
+    async def run():
+        bucket = TokenBucket(50, 1)
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        await asyncio.gather(*[bucket.acquire() for i in range(6)])
+        assert loop.time() - start >= 0.09
+    asyncio.run(run())
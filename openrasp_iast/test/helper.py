@@ -23,6 +23,8 @@ import json
 import pymysql
 import requests
 
+from core.components import rasp_result
+
 db_config = {
     "host": "localhost",
     "port": 3306,
@@ -69,6 +71,44 @@ def execute_sql(sql):
     result = _query(sql)
 
 
+def new_rasp_result(context=None, hook_info=None):
+    # 生成测试用的RaspResult实例, context中的字段覆盖默认请求的同名字段
+    rasp_result_dict = {
+        "web_server": {
+            "host": "127.0.0.1",
+            "port": 8005
+        },
+        "context": {
+            "requestId": "php1",
+            "json": {},
+            "server": {
+                "language": "php",
+                "name": "PHP",
+                "version": "7.2.19",
+                "os": "Linux"
+            },
+            "body": "",
+            "appBasePath": "/var/www/html",
+            "remoteAddr": "172.17.0.1",
+            "protocol": "http",
+            "method": "get",
+            "querystring": "",
+            "path": "/test.php",
+            "parameter": {},
+            "header": {
+                "host": "127.0.0.1:8005"
+            },
+            "url": "http://127.0.0.1:8005/test.php",
+            "nic": [],
+            "hostname": "server_host_name"
+        },
+        "hook_info": hook_info if hook_info is not None else []
+    }
+    if context is not None:
+        rasp_result_dict["context"].update(context)
+    return rasp_result.RaspResult(rasp_result_dict)
+
+
 class HttpSender(object):
 
     def __init__(self, host, port):
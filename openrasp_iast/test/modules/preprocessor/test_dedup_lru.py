@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: UTF-8 -*-
+
+"""
+Copyright 2017-2020 Baidu Inc.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import multiprocessing
+
+from core.modules.preprocessor import DedupLru
+
+
+def is_new(lru, host_port, key):
+    try:
+        lru.check(host_port, key)
+    except KeyError:
+        return True
+    else:
+        return False
+
+
+def test_check():
+    lru = DedupLru(16, 2)
+    assert is_new(lru, "a.com_80", "key1")
+    assert not is_new(lru, "a.com_80", "key1")
+    # 不同扫描目标的key相互独立
+    assert is_new(lru, "b.com_80", "key1")
+    assert not is_new(lru, "b.com_80", "key1")
+
+
+def test_delete_and_clean():
+    lru = DedupLru(16, 2)
+    is_new(lru, "a.com_80", "key1")
+    is_new(lru, "a.com_80", "key2")
+    lru.delete_key("a.com_80", "key1")
+    assert is_new(lru, "a.com_80", "key1")
+    assert not is_new(lru, "a.com_80", "key2")
+
+    lru.clean_lru("a.com_80")
+    assert is_new(lru, "a.com_80", "key2")
+    lru.delete_key("not_exist_80", "key1")
+    lru.clean_lru("not_exist_80")
+
+
+def test_evict_key():
+    """
+    测试区域存满后使用clock算法淘汰key, 区域内的key数量不超过max_size
+    """
+    lru = DedupLru(8, 1)
+    for i in range(8):
+        assert is_new(lru, "a.com_80", "key" + str(i))
+    for i in range(8):
+        assert not is_new(lru, "a.com_80", "key" + str(i))
+
+    for i in range(8, 100):
+        assert is_new(lru, "a.com_80", "key" + str(i))
+        assert not is_new(lru, "a.com_80", "key" + str(i))
+        assert len([slot for slot in lru.slots if slot != 0]) == 8
+
+
+def test_evict_target():
+    """
+    测试扫描目标超出区域数量时淘汰最久未访问的扫描目标
+    """
+    lru = DedupLru(16, 2)
+    is_new(lru, "a.com_80", "key")
+    is_new(lru, "b.com_80", "key")
+    assert not is_new(lru, "a.com_80", "key")
+    is_new(lru, "c.com_80", "key")
+    assert not is_new(lru, "a.com_80", "key")
+    assert not is_new(lru, "c.com_80", "key")
+    assert is_new(lru, "b.com_80", "key")
+
+
+def _check_keys(lru, start, count):
+    for i in range(start, start + count):
+        is_new(lru, "a.com_80", "key" + str(i))
+
+
+def test_shared_between_process():
+    lru = DedupLru(1024, 2)
+    proc = multiprocessing.Process(target=_check_keys, args=(lru, 0, 100))
+    proc.start()
+    proc.join(10)
+    for i in range(100):
+        assert not is_new(lru, "a.com_80", "key" + str(i))
+    assert is_new(lru, "a.com_80", "key100")
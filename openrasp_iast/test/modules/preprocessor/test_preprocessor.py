@@ -184,7 +184,13 @@ def test_send_rasp_result_data(preprocessor_fixture):
                 data = Communicator().get_data_nowait("rasp_result_queue_0")
             except Exception:
                 time.sleep(1)
-        assert data.get_request_id() == json_data["context"]["requestId"]
+            else:
+                break
+        assert data is not None
+        key, payload, flag = data
+        assert key == json_data["context"]["header"]["scan-request-id"]
+        assert flag == 0
+        assert json.loads(payload)["context"]["requestId"] == json_data["context"]["requestId"]
 
 
 def test_send_new_request_data(preprocessor_fixture):